@@ -1,4 +1,13 @@
 """Agents package initialization."""
-from .supervisor import SupervisorAgent, get_agent
+from .supervisor import SupervisorAgent
+from .registry import AgentRegistry, get_agent, get_agent_registry
+from .checkpointer import BoundedMemorySaver, get_checkpointer
 
-__all__ = ["SupervisorAgent", "get_agent"]
+__all__ = [
+    "SupervisorAgent",
+    "AgentRegistry",
+    "get_agent",
+    "get_agent_registry",
+    "BoundedMemorySaver",
+    "get_checkpointer",
+]
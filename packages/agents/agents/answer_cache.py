@@ -0,0 +1,66 @@
+"""
+Answer Cache
+
+This module provides an exact-match cache for agent answers, so repeated
+questions about the same resource can be answered without running the
+agent graph again.
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Optional
+from config import get_settings
+from services.cache import TTLCache
+
+
+def normalize_question(message: str) -> str:
+    """Normalize a question for exact matching (case and whitespace insensitive)"""
+    return " ".join(message.split()).casefold()
+
+
+def answer_cache_key(
+    message: str,
+    context: Optional[Dict[str, Any]],
+    provider: str,
+    model_name: str
+) -> str:
+    """
+    Build the cache key for a question
+
+    Args:
+        message: User message
+        context: Optional context information
+        provider: LLM provider answering the question
+        model_name: LLM model answering the question
+
+    Returns:
+        Hex digest identifying the question, context and model
+    """
+    payload = json.dumps(
+        [provider, model_name, normalize_question(message), context or {}],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# Global answer cache shared by all agents (keys include the model)
+_answer_cache: Optional[TTLCache] = None
+
+
+def get_answer_cache() -> TTLCache:
+    """
+    Get or create the global answer cache
+
+    Returns:
+        TTLCache configured from settings
+    """
+    global _answer_cache
+    if _answer_cache is None:
+        settings = get_settings()
+        _answer_cache = TTLCache(
+            max_size=settings.ANSWER_CACHE_MAX_SIZE,
+            default_ttl=settings.ANSWER_CACHE_TTL
+        )
+    return _answer_cache
@@ -0,0 +1,138 @@
+"""
+Model Cascade
+
+This module holds the escalation checks and statistics for the tiered model
+cascade: a small, fast model answers first and the turn is escalated to a
+larger model when one of the checks fails.
+"""
+
+import threading
+from typing import Any, Dict, Optional, Sequence
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from services.metrics import Histogram
+from services.tokens import content_text
+
+SMALL = "small"
+LARGE = "large"
+
+# Escalation reasons
+TOOL_DEPTH = "tool_depth"
+UNCERTAIN = "uncertain"
+EMPTY_TOOL_RESULT = "empty_tool_result"
+
+
+def parse_markers(value: str) -> list[str]:
+    """Parse a comma-separated list of markers into lowercase phrases"""
+    return [marker.strip().lower() for marker in value.split(",") if marker.strip()]
+
+
+def current_turn(messages: Sequence[BaseMessage]) -> Sequence[BaseMessage]:
+    """Messages after the latest user message"""
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            return messages[index + 1:]
+    return messages
+
+
+def tool_rounds(messages: Sequence[BaseMessage]) -> int:
+    """Number of tool-calling model steps in the current turn"""
+    return sum(
+        1 for message in current_turn(messages)
+        if isinstance(message, AIMessage) and message.tool_calls
+    )
+
+
+def has_empty_tool_result(messages: Sequence[BaseMessage], markers: Sequence[str]) -> bool:
+    """
+    Check whether the latest tool round returned an empty result
+
+    Args:
+        messages: Conversation messages
+        markers: Lowercase prefixes identifying "nothing found" results
+
+    Returns:
+        True if any result of the latest tool round is blank or starts with a marker
+    """
+    for message in reversed(messages):
+        if not isinstance(message, ToolMessage):
+            break
+        text = content_text(message.content).strip().lower()
+        if not text or any(text.startswith(marker) for marker in markers):
+            return True
+    return False
+
+
+def is_uncertain(message: BaseMessage, markers: Sequence[str]) -> bool:
+    """Check whether a final answer contains a self-reported uncertainty marker"""
+    text = content_text(message.content).lower()
+    return any(marker in text for marker in markers)
+
+
+class CascadeStats:
+    """Per-tier outcome counters and latency for the model cascade"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.answered = {SMALL: 0, LARGE: 0}
+        self.escalations: Dict[str, int] = {}
+        # Model call latency per tier
+        self.call_latency = {SMALL: Histogram(), LARGE: Histogram()}
+        # End-to-end turn latency by the tier that produced the answer
+        self.turn_latency = {SMALL: Histogram(), LARGE: Histogram()}
+        # Small-model calls made in turns the small model answered
+        self.small_answer_calls = 0
+
+    def record_call(self, tier: str, seconds: float) -> None:
+        """Record the latency of one model call"""
+        self.call_latency[tier].observe(seconds)
+
+    def record_escalation(self, reason: str) -> None:
+        """Count an escalation from the small to the large model"""
+        with self._lock:
+            self.escalations[reason] = self.escalations.get(reason, 0) + 1
+
+    def record_turn(self, tier: str, seconds: float, small_calls: int = 0) -> None:
+        """
+        Record a completed turn
+
+        Args:
+            tier: Tier that produced the final answer
+            seconds: End-to-end latency of the turn
+            small_calls: Small-model calls made in the turn
+        """
+        with self._lock:
+            self.answered[tier] += 1
+            if tier == SMALL:
+                self.small_answer_calls += small_calls
+        self.turn_latency[tier].observe(seconds)
+
+    def estimated_savings(self) -> Optional[float]:
+        """Estimated seconds saved by answering turns with the small model"""
+        small, large = self.call_latency[SMALL], self.call_latency[LARGE]
+        if not small.count or not large.count:
+            return None
+        per_call = large.total / large.count - small.total / small.count
+        return round(max(0.0, per_call) * self.small_answer_calls, 3)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cascade statistics
+
+        Returns:
+            Dictionary with per-tier hit rates, escalation reasons, latency and estimated savings
+        """
+        total = self.answered[SMALL] + self.answered[LARGE]
+        return {
+            "turns": total,
+            "tiers": {
+                tier: {
+                    "answered": self.answered[tier],
+                    "hit_rate": round(self.answered[tier] / total, 4) if total else 0.0,
+                    "call_latency": self.call_latency[tier].get_stats(),
+                    "turn_latency": self.turn_latency[tier].get_stats(),
+                }
+                for tier in (SMALL, LARGE)
+            },
+            "escalations": dict(self.escalations),
+            "estimated_savings_seconds": self.estimated_savings(),
+        }
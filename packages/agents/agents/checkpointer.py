@@ -0,0 +1,472 @@
+"""
+Bounded Session Checkpointer
+
+This module provides a LangGraph checkpointer that keeps recently used
+sessions in memory and spills idle or least recently used sessions to a
+local SQLite file, reloading them transparently when they are used again.
+"""
+
+import asyncio
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import InMemorySaver
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """
+    In-memory checkpointer with LRU/TTL eviction and SQLite spill.
+
+    Sessions (LangGraph threads) are evicted from memory when there are more
+    than max_sessions resident, when their serialized size exceeds max_bytes,
+    or when they have been idle longer than idle_ttl. Evicted sessions are
+    written to spill_path and loaded back on their next access. Without a
+    spill_path, evicted sessions are discarded.
+
+    Spill writes and reloads run on a single background thread, in the order
+    they were requested, so pickling and SQLite commits never block the event
+    loop; the async methods only wait when a spilled session is reloaded.
+
+    Listing checkpoints without a thread ID only covers resident sessions.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        max_bytes: int = 256 * 1024 * 1024,
+        idle_ttl: float = 1800.0,
+        spill_path: Optional[str] = None,
+        **kwargs: Any
+    ):
+        """
+        Initialize the checkpointer
+
+        Args:
+            max_sessions: Maximum number of sessions kept in memory
+            max_bytes: Memory ceiling for serialized session data
+            idle_ttl: Seconds of inactivity before a session is evicted (0 disables)
+            spill_path: SQLite file for evicted sessions (None discards them)
+        """
+        super().__init__(**kwargs)
+        self.max_sessions = max(1, max_sessions)
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.spill_path = spill_path
+
+        self._lock = threading.RLock()
+        # thread ID -> last access time, least recently used first
+        self._access: "OrderedDict[str, float]" = OrderedDict()
+        # Per-session serialized bytes, updated as items are added and removed
+        self._session_sizes: Dict[str, int] = {}
+        self._blob_keys: Dict[str, set] = {}
+        # thread ID -> (thread ID, checkpoint NS, checkpoint ID) -> serialized write bytes
+        self._write_bytes: Dict[str, Dict[Tuple[str, str, str], int]] = {}
+        self._resident_bytes = 0
+        # thread ID -> pickled size of spilled sessions (0 while the write is pending)
+        self._spilled: Dict[str, int] = {}
+
+        self.evictions = 0
+        self.reloads = 0
+        self.discarded = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._io: Optional[ThreadPoolExecutor] = None
+        if spill_path:
+            self._db = sqlite3.connect(spill_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "thread_id TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, spilled_at REAL NOT NULL)"
+            )
+            self._db.commit()
+            self._spilled = dict(self._db.execute("SELECT thread_id, size FROM sessions").fetchall())
+            # One worker keeps spill writes, reloads and deletes in order
+            self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-spill")
+
+    # Byte accounting
+
+    def _session_bytes(self, thread_id: str) -> int:
+        """Serialized size of a resident session"""
+        return self._session_sizes.get(thread_id, 0)
+
+    def _add_bytes(self, thread_id: str, delta: int) -> None:
+        self._session_sizes[thread_id] = self._session_sizes.get(thread_id, 0) + delta
+        self._resident_bytes += delta
+
+    def _touch(self, thread_id: str) -> None:
+        """Mark a session as most recently used"""
+        self._access[thread_id] = time.monotonic()
+        self._access.move_to_end(thread_id)
+
+    # Spill and reload
+
+    def _needs_reload(self, thread_id: str) -> bool:
+        with self._lock:
+            return thread_id not in self._access and thread_id in self._spilled
+
+    def _ensure_resident(self, thread_id: str) -> None:
+        """Reload a spilled session into memory before it is used"""
+        if self._needs_reload(thread_id):
+            self._io.submit(self._reload, thread_id).result()
+
+    async def _aensure_resident(self, thread_id: str) -> None:
+        """Reload a spilled session without blocking the event loop"""
+        if self._needs_reload(thread_id):
+            await asyncio.wrap_future(self._io.submit(self._reload, thread_id))
+
+    def _reload(self, thread_id: str) -> None:
+        """Load a spilled session back into memory (runs on the spill thread)"""
+        if not self._needs_reload(thread_id):
+            # Reloaded by an earlier request for the same session
+            return
+        row = self._db.execute("SELECT data FROM sessions WHERE thread_id = ?", (thread_id,)).fetchone()
+        self._db.execute("DELETE FROM sessions WHERE thread_id = ?", (thread_id,))
+        self._db.commit()
+        if row is None:
+            with self._lock:
+                self._spilled.pop(thread_id, None)
+            return
+        storage, writes, blobs = pickle.loads(row[0])
+
+        with self._lock:
+            self._spilled.pop(thread_id, None)
+            size = 0
+            for checkpoint_ns, checkpoints in storage.items():
+                self.storage[thread_id][checkpoint_ns].update(checkpoints)
+                size += sum(len(checkpoint[1]) + len(metadata[1]) for checkpoint, metadata, _ in checkpoints.values())
+            write_bytes = self._write_bytes.setdefault(thread_id, {})
+            for key, value in writes.items():
+                self.writes[key].update(value)
+                write_bytes[key] = sum(len(write[2][1]) for write in self.writes[key].values())
+                size += write_bytes[key]
+            self.blobs.update(blobs)
+            self._blob_keys.setdefault(thread_id, set()).update(blobs.keys())
+            size += sum(len(blob[1]) for blob in blobs.values())
+            self._add_bytes(thread_id, size)
+            self._touch(thread_id)
+            self.reloads += 1
+        logger.debug(f"Reloaded session {thread_id} from {self.spill_path}")
+
+    def _write_spill(self, thread_id: str, snapshot: Tuple[dict, dict, dict]) -> None:
+        """Pickle an evicted session and store it (runs on the spill thread)"""
+        try:
+            data = pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (thread_id, data, size, spilled_at) VALUES (?, ?, ?, ?)",
+                (thread_id, data, len(data), time.time())
+            )
+            self._db.commit()
+        except Exception as e:
+            logger.error(f"Failed to spill session {thread_id}: {e}")
+            with self._lock:
+                self._spilled.pop(thread_id, None)
+                self.discarded += 1
+            return
+        with self._lock:
+            if thread_id in self._spilled:
+                self._spilled[thread_id] = len(data)
+
+    def _delete_spilled(self, thread_id: str) -> None:
+        self._db.execute("DELETE FROM sessions WHERE thread_id = ?", (thread_id,))
+        self._db.commit()
+
+    def _evict(self, thread_id: str) -> None:
+        """Move a session out of memory, spilling it to disk when configured"""
+        if self._io is not None:
+            storage = {ns: dict(checkpoints) for ns, checkpoints in self.storage.get(thread_id, {}).items()}
+            writes = {key: dict(self.writes[key]) for key in self._write_bytes.get(thread_id, {})}
+            blobs = {key: self.blobs[key] for key in self._blob_keys.get(thread_id, ())}
+            # Marked spilled now, so a reload waits for the queued write instead of missing it
+            self._spilled[thread_id] = 0
+            self._io.submit(self._write_spill, thread_id, (storage, writes, blobs))
+        else:
+            self.discarded += 1
+
+        self._resident_bytes -= self._session_bytes(thread_id)
+        self._drop(thread_id)
+        self.evictions += 1
+
+    def _drop(self, thread_id: str) -> None:
+        """Remove a session's in-memory data and bookkeeping"""
+        for key in self._blob_keys.pop(thread_id, ()):
+            self.blobs.pop(key, None)
+        for key in self._write_bytes.pop(thread_id, {}):
+            self.writes.pop(key, None)
+        self.storage.pop(thread_id, None)
+        self._session_sizes.pop(thread_id, None)
+        self._access.pop(thread_id, None)
+
+    def _enforce_limits(self, keep: str) -> None:
+        """Evict idle and least recently used sessions until within limits"""
+        now = time.monotonic()
+        for thread_id, last_access in list(self._access.items()):
+            if thread_id == keep:
+                continue
+            over_capacity = len(self._access) > self.max_sessions or self._resident_bytes > self.max_bytes
+            idle = self.idle_ttl > 0 and now - last_access > self.idle_ttl
+            if not (over_capacity or idle):
+                break
+            self._evict(thread_id)
+
+    # Checkpointer interface
+
+    def _resident_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Look up a checkpoint of a session that needs no reload"""
+        thread_id = config["configurable"]["thread_id"]
+        if thread_id in self._access:
+            self._touch(thread_id)
+            return super().get_tuple(config)
+        # Unknown session: avoid the base class creating empty storage for it
+        result = super().get_tuple(config)
+        self.storage.pop(thread_id, None)
+        return result
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        while True:
+            self._ensure_resident(thread_id)
+            with self._lock:
+                # Evicted again while reloading: try once more
+                if not self._needs_reload(thread_id):
+                    return self._resident_tuple(config)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        while True:
+            await self._aensure_resident(thread_id)
+            with self._lock:
+                if not self._needs_reload(thread_id):
+                    return self._resident_tuple(config)
+
+    def _list_resident(
+        self,
+        config: Optional[RunnableConfig],
+        filter: Optional[Dict[str, Any]],
+        before: Optional[RunnableConfig],
+        limit: Optional[int]
+    ) -> List[CheckpointTuple]:
+        with self._lock:
+            thread_id = config["configurable"]["thread_id"] if config else None
+            items = list(super().list(config, filter=filter, before=before, limit=limit))
+            if thread_id is not None and thread_id not in self._access:
+                self.storage.pop(thread_id, None)
+            return items
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[CheckpointTuple]:
+        if config:
+            self._ensure_resident(config["configurable"]["thread_id"])
+        yield from self._list_resident(config, filter, before, limit)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[CheckpointTuple]:
+        if config:
+            await self._aensure_resident(config["configurable"]["thread_id"])
+        for item in self._list_resident(config, filter, before, limit):
+            yield item
+
+    def _put_resident(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            # Only the entries this put adds or replaces are measured
+            checkpoints = self.storage[thread_id][checkpoint_ns]
+            blob_keys = [(thread_id, checkpoint_ns, channel, version) for channel, version in new_versions.items()]
+            delta = -sum(len(self.blobs[key][1]) for key in blob_keys if key in self.blobs)
+            replaced = checkpoints.get(checkpoint["id"])
+            if replaced is not None:
+                delta -= len(replaced[0][1]) + len(replaced[1][1])
+
+            result = super().put(config, checkpoint, metadata, new_versions)
+
+            saved = checkpoints[checkpoint["id"]]
+            delta += len(saved[0][1]) + len(saved[1][1])
+            delta += sum(len(self.blobs[key][1]) for key in blob_keys)
+            self._blob_keys.setdefault(thread_id, set()).update(blob_keys)
+            self._add_bytes(thread_id, delta)
+            self._touch(thread_id)
+            self._enforce_limits(keep=thread_id)
+            return result
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        self._ensure_resident(config["configurable"]["thread_id"])
+        return self._put_resident(config, checkpoint, metadata, new_versions)
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        await self._aensure_resident(config["configurable"]["thread_id"])
+        return self._put_resident(config, checkpoint, metadata, new_versions)
+
+    def _put_writes_resident(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        key = (thread_id, config["configurable"].get("checkpoint_ns", ""), config["configurable"]["checkpoint_id"])
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+
+            write_bytes = self._write_bytes.setdefault(thread_id, {})
+            size = sum(len(write[2][1]) for write in self.writes[key].values())
+            self._add_bytes(thread_id, size - write_bytes.get(key, 0))
+            write_bytes[key] = size
+            self._touch(thread_id)
+            self._enforce_limits(keep=thread_id)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        self._ensure_resident(config["configurable"]["thread_id"])
+        self._put_writes_resident(config, writes, task_id, task_path)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        await self._aensure_resident(config["configurable"]["thread_id"])
+        self._put_writes_resident(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            if thread_id in self._access:
+                self._resident_bytes -= self._session_bytes(thread_id)
+            self._drop(thread_id)
+            super().delete_thread(thread_id)
+            if self._spilled.pop(thread_id, None) is not None:
+                # Queued behind any pending spill write of the session
+                self._io.submit(self._delete_spilled, thread_id)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
+
+    # Reporting
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get resident and spilled session statistics
+
+        Returns:
+            Dictionary with limits, counters and per-session byte footprints
+        """
+        with self._lock:
+            now = time.monotonic()
+            sessions: List[Dict[str, Any]] = [
+                {
+                    "session_id": thread_id,
+                    "bytes": self._session_bytes(thread_id),
+                    "idle_seconds": round(now - last_access, 1),
+                }
+                for thread_id, last_access in reversed(self._access.items())
+            ]
+
+            return {
+                "resident_count": len(sessions),
+                "resident_bytes": self._resident_bytes,
+                "spilled_count": len(self._spilled),
+                "spilled_bytes": sum(self._spilled.values()),
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "idle_ttl": self.idle_ttl,
+                "spill_path": self.spill_path,
+                "evictions": self.evictions,
+                "reloads": self.reloads,
+                "discarded": self.discarded,
+                "sessions": sessions,
+            }
+
+    def close(self) -> None:
+        """
+        Finish pending spill writes and close the spill database
+
+        Spilled sessions stay in the database for the next process. The saver
+        keeps working in memory afterwards, discarding instead of spilling.
+        """
+        if self._io is not None:
+            self._io.shutdown(wait=True)
+            self._io = None
+        with self._lock:
+            self._spilled.clear()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+# Global checkpointer shared by all agents
+_checkpointer: Optional[BoundedMemorySaver] = None
+
+
+def get_checkpointer() -> BoundedMemorySaver:
+    """
+    Get or create the global session checkpointer
+    
+    Returns:
+        BoundedMemorySaver configured from settings
+    """
+    global _checkpointer
+    if _checkpointer is None:
+        settings = get_settings()
+        _checkpointer = BoundedMemorySaver(
+            max_sessions=settings.SESSION_MAX_RESIDENT,
+            max_bytes=settings.SESSION_MAX_MEMORY_MB * 1024 * 1024,
+            idle_ttl=settings.SESSION_IDLE_TTL,
+            spill_path=settings.SESSION_SPILL_PATH or None
+        )
+    return _checkpointer
+
+
+async def close_checkpointer() -> None:
+    """
+    Flush and close the global checkpointer's spill database, if it was created
+    """
+    if _checkpointer is not None:
+        # Waits for queued spill writes
+        await asyncio.to_thread(_checkpointer.close)
@@ -0,0 +1,171 @@
+"""
+Conversation Compaction
+
+This module keeps the prompt sent to the LLM within a token budget by
+truncating bulky tool results and folding older turns into a running
+summary. Recent turns and tool call/response pairs are kept intact.
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, RemoveMessage, ToolMessage
+from services.tokens import CHARS_PER_TOKEN, content_text, count_tokens, estimate_tokens, message_tokens
+
+
+SUMMARY_OMITTED = "- (earlier turns omitted)"
+
+
+@dataclass
+class CompactionResult:
+    """Outcome of compacting a conversation"""
+    tokens_before: int
+    tokens_after: int
+    # Replacement and RemoveMessage updates for the messages channel
+    updates: List[BaseMessage] = field(default_factory=list)
+    # Older messages removed from the prompt, to be summarized
+    removed: List[BaseMessage] = field(default_factory=list)
+    truncated_tool_results: int = 0
+
+
+def _recent_boundary(messages: Sequence[BaseMessage], keep_turns: int) -> int:
+    """Index of the first message of the last keep_turns user turns"""
+    seen = 0
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            seen += 1
+            if seen >= keep_turns:
+                return index
+    return 0
+
+
+def _latest_tool_round(messages: Sequence[BaseMessage]) -> int:
+    """Index of the most recent AI message that issued tool calls"""
+    for index in range(len(messages) - 1, -1, -1):
+        message = messages[index]
+        if isinstance(message, AIMessage) and message.tool_calls:
+            return index
+    return len(messages)
+
+
+def _truncate_tool_message(message: ToolMessage, max_chars: int) -> ToolMessage:
+    """Shorten a tool result, keeping its ID so it replaces the original"""
+    text = content_text(message.content)
+    return message.model_copy(update={
+        "content": f"{text[:max_chars]}\n[... truncated {len(text) - max_chars} characters]"
+    })
+
+
+def compact_messages(
+    messages: Sequence[BaseMessage],
+    budget: int,
+    keep_turns: int = 2,
+    tool_result_chars: int = 600,
+    base_tokens: int = 0
+) -> Optional[CompactionResult]:
+    """
+    Plan the compaction of a conversation that exceeds its token budget
+
+    Tool results are truncated first, except those the model has not seen
+    yet. If the conversation is still over budget, every message before the
+    last keep_turns user turns is removed; cutting at a user message keeps
+    tool calls and their results together.
+
+    Args:
+        messages: Conversation messages (each with an ID)
+        budget: Maximum prompt tokens
+        keep_turns: Number of most recent user turns always kept
+        tool_result_chars: Length older tool results are truncated to
+        base_tokens: Tokens outside the messages (system prompt, summary)
+
+    Returns:
+        CompactionResult, or None if the conversation is within budget
+    """
+    tokens_before = base_tokens + count_tokens(messages)
+    if tokens_before <= budget:
+        return None
+
+    result = CompactionResult(tokens_before=tokens_before, tokens_after=tokens_before)
+    current = list(messages)
+
+    # Stage 1: truncate bulky tool results the model has already reasoned over
+    latest_round = _latest_tool_round(current)
+    for index, message in enumerate(current[:latest_round]):
+        if isinstance(message, ToolMessage) and len(content_text(message.content)) > tool_result_chars:
+            truncated = _truncate_tool_message(message, tool_result_chars)
+            result.tokens_after -= message_tokens(message) - message_tokens(truncated)
+            current[index] = truncated
+            result.updates.append(truncated)
+            result.truncated_tool_results += 1
+
+    # Stage 2: drop whole turns older than the recent window
+    if result.tokens_after > budget:
+        boundary = _recent_boundary(current, keep_turns)
+        result.removed = current[:boundary]
+        result.tokens_after -= count_tokens(result.removed)
+        removed_ids = {message.id for message in result.removed}
+        result.updates = [message for message in result.updates if message.id not in removed_ids]
+        result.updates.extend(RemoveMessage(id=message.id) for message in result.removed)
+
+    return result
+
+
+def summarize_extractive(messages: Sequence[BaseMessage], max_chars_per_message: int = 200) -> str:
+    """
+    Build a compact, model-free summary of removed messages
+
+    Args:
+        messages: Messages to summarize
+        max_chars_per_message: Characters kept from each message
+
+    Returns:
+        One line per message with its role and leading content
+    """
+    lines = []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            role = "User"
+        elif isinstance(message, ToolMessage):
+            role = f"Tool {message.name or 'result'}"
+        else:
+            role = "Assistant"
+
+        text = " ".join(content_text(message.content).split())
+        if isinstance(message, AIMessage) and message.tool_calls:
+            calls = ", ".join(call["name"] for call in message.tool_calls)
+            text = f"{text} [called {calls}]".strip()
+        if len(text) > max_chars_per_message:
+            text = text[:max_chars_per_message] + "..."
+        if text:
+            lines.append(f"- {role}: {text}")
+    return "\n".join(lines)
+
+
+def fit_summary(summary: str, max_tokens: int) -> str:
+    """
+    Trim a running summary to its token budget
+
+    The summary grows by one block per compaction, so the oldest lines are
+    dropped first and replaced by a marker.
+
+    Args:
+        summary: Running summary, one line per summarized message
+        max_tokens: Tokens the summary may use in the prompt
+
+    Returns:
+        The summary, or its most recent lines within max_tokens
+    """
+    if estimate_tokens(summary) <= max_tokens:
+        return summary
+    used = estimate_tokens(SUMMARY_OMITTED)
+    kept: List[str] = []
+    for line in reversed(summary.splitlines()):
+        # Each line also costs its newline
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    if not kept:
+        # Not even the latest line fits: keep its tail
+        return summary[-max(0, max_tokens) * CHARS_PER_TOKEN:] if max_tokens > 0 else ""
+    return "\n".join([SUMMARY_OMITTED, *reversed(kept)])
@@ -0,0 +1,171 @@
+"""
+Speculative RAG Prefetch
+
+This module starts documentation and incident searches on the user's
+question as soon as a turn begins, concurrently with the first model call.
+When the model then asks for the same search, the tool call is answered from
+the prefetched result instead of starting a new RAG round-trip.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Sequence
+from langchain_core.tools import BaseTool
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+
+
+def query_similarity(a: str, b: str) -> float:
+    """Jaccard similarity of the lowercase word sets of two queries"""
+    words_a = set(_WORD.findall(a.lower()))
+    words_b = set(_WORD.findall(b.lower()))
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+@dataclass
+class _Prefetch:
+    """A prefetched tool call and its timing"""
+    tool: BaseTool
+    query: str
+    task: asyncio.Task
+    started: float
+    finished: Optional[float] = None
+    used: bool = False
+
+
+@dataclass
+class _Turn:
+    """Prefetches started for one conversation turn"""
+    prefetches: Dict[str, _Prefetch] = field(default_factory=dict)
+
+
+class Prefetcher:
+    """
+    Starts speculative tool calls per turn and hands them to matching calls.
+
+    A prefetch is used when the model calls the same tool in the same turn
+    with a query similar enough to the user's question and default values for
+    the other arguments. Prefetches that are not used by the end of the turn
+    are cancelled and counted as wasted. Turns are keyed by their own id, so
+    concurrent turns of one session keep separate prefetches.
+    """
+
+    def __init__(self, tools: Sequence[BaseTool], match_threshold: float = 0.5):
+        """
+        Initialize the prefetcher
+
+        Args:
+            tools: Tools to prefetch; each is called with {"query": question}
+            match_threshold: Minimum query similarity for a tool call to use a prefetch
+        """
+        self.tools = list(tools)
+        self.match_threshold = match_threshold
+        self._turns: Dict[str, _Turn] = {}
+
+        self.started = 0
+        self.used = 0
+        self.wasted = 0
+        self.saved_seconds = 0.0
+
+    def start(self, turn_id: str, question: str) -> list[str]:
+        """
+        Start prefetching for a new turn
+
+        Args:
+            turn_id: Unique id of the turn
+            question: User question used as the search query
+
+        Returns:
+            Names of the tools being prefetched
+        """
+        self.finish(turn_id)
+        if not question.strip():
+            return []
+
+        turn = _Turn()
+        for tool in self.tools:
+            # Detached from the run's callbacks so speculative calls do not show up as tool events
+            task = asyncio.create_task(tool.ainvoke({"query": question}, config={"callbacks": []}))
+            prefetch = _Prefetch(tool=tool, query=question, task=task, started=time.perf_counter())
+            task.add_done_callback(lambda _, prefetch=prefetch: setattr(prefetch, "finished", time.perf_counter()))
+            turn.prefetches[tool.name] = prefetch
+            self.started += 1
+        self._turns[turn_id] = turn
+        return list(turn.prefetches)
+
+    def _matches(self, prefetch: _Prefetch, args: Dict[str, Any]) -> bool:
+        """Check whether tool call arguments are equivalent to a prefetch"""
+        if query_similarity(str(args.get("query", "")), prefetch.query) < self.match_threshold:
+            return False
+        fields = prefetch.tool.args_schema.model_fields if prefetch.tool.args_schema else {}
+        return all(
+            name in fields and value == fields[name].default
+            for name, value in args.items() if name != "query"
+        )
+
+    def claim(self, turn_id: str, name: str, args: Dict[str, Any]) -> Optional[asyncio.Task]:
+        """
+        Take the prefetched result for a tool call, if one matches
+
+        Args:
+            turn_id: Turn the tool call belongs to
+            name: Tool name
+            args: Tool call arguments
+
+        Returns:
+            Task producing the prefetched tool output, or None
+        """
+        turn = self._turns.get(turn_id)
+        prefetch = turn.prefetches.get(name) if turn else None
+        if prefetch is None or prefetch.used or prefetch.task.cancelled() or not self._matches(prefetch, args):
+            return None
+
+        prefetch.used = True
+        self.used += 1
+        claimed_at = time.perf_counter()
+
+        def record_saving(_: asyncio.Task) -> None:
+            finished = prefetch.finished or time.perf_counter()
+            # Time the search ran before the model asked for it
+            self.saved_seconds += min(finished, claimed_at) - prefetch.started
+
+        if prefetch.task.done():
+            record_saving(prefetch.task)
+        else:
+            prefetch.task.add_done_callback(record_saving)
+        return prefetch.task
+
+    def finish(self, turn_id: str) -> None:
+        """End a turn, cancelling prefetches the model did not use"""
+        turn = self._turns.pop(turn_id, None)
+        if turn is None:
+            return
+        for prefetch in turn.prefetches.values():
+            if not prefetch.used:
+                self.wasted += 1
+                if not prefetch.task.done():
+                    prefetch.task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get prefetch statistics
+
+        Returns:
+            Dictionary with started/used/wasted counts, hit rate and time saved
+        """
+        return {
+            "tools": [tool.name for tool in self.tools],
+            "started": self.started,
+            "used": self.used,
+            "wasted": self.wasted,
+            "hit_rate": round(self.used / self.started, 4) if self.started else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "active_turns": len(self._turns),
+        }
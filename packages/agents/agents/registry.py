@@ -0,0 +1,259 @@
+"""
+Agent Registry
+
+This module keeps one compiled SupervisorAgent per (provider, model) so
+requests can be routed to different models without restarting the service.
+Agents are built on first use and evicted when idle or when too many are
+resident. Conversation sessions live in the shared checkpointer, so a
+session can move between models.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from agents.supervisor import SupervisorAgent
+from config import get_settings
+from services.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+AgentKey = Tuple[str, str]
+
+
+def parse_allowed_models(value: str) -> Set[AgentKey]:
+    """
+    Parse an allow-list of models
+
+    Args:
+        value: Comma-separated "provider:model" entries
+
+    Returns:
+        Set of (provider, model) pairs (empty allows only the default model)
+    """
+    allowed = set()
+    for entry in value.split(","):
+        provider, sep, model_name = entry.strip().partition(":")
+        if sep and provider and model_name:
+            allowed.add((provider.strip(), model_name.strip()))
+    return allowed
+
+
+class AgentRegistry:
+    """
+    Registry of SupervisorAgent instances keyed by (provider, model).
+
+    The default agent is never evicted. Latency statistics are kept per model
+    and survive eviction of its agent.
+    """
+
+    def __init__(
+        self,
+        default_provider: str = "openai",
+        default_model: str = "gpt-4o-mini",
+        allowed_models: Optional[Set[AgentKey]] = None,
+        max_agents: int = 8,
+        idle_ttl: float = 900.0,
+        factory: Optional[Callable[[str, str], SupervisorAgent]] = None
+    ):
+        """
+        Initialize the registry
+
+        Args:
+            default_provider: Provider used when a request does not select one
+            default_model: Model used when a request does not select one
+            allowed_models: (provider, model) pairs that may be selected besides the default model
+            max_agents: Maximum number of agents kept resident
+            idle_ttl: Seconds of inactivity before an agent is evicted (0 disables)
+            factory: Callable building an agent from (model_name, provider)
+        """
+        self.default_key: AgentKey = (default_provider, default_model)
+        self.allowed_models = set(allowed_models or ())
+        self.max_agents = max(1, max_agents)
+        self.idle_ttl = idle_ttl
+        self._factory = factory or self._build
+
+        self._lock = threading.RLock()
+        # key -> (agent, last use time), least recently used first
+        self._agents: "OrderedDict[AgentKey, Tuple[SupervisorAgent, float]]" = OrderedDict()
+        self._sweeper: Optional[asyncio.Task] = None
+        self._latency: Dict[AgentKey, Histogram] = {}
+        self.created = 0
+        self.evictions = 0
+
+    def _build(self, model_name: str, provider: str) -> SupervisorAgent:
+        """Build an agent; the default agent runs the cascade when enabled"""
+        cascade = get_settings().CASCADE_ENABLED and (provider, model_name) == self.default_key
+        return SupervisorAgent(model_name=model_name, provider=provider, cascade=cascade)
+
+    def resolve(self, provider: Optional[str] = None, model_name: Optional[str] = None) -> AgentKey:
+        """
+        Resolve a model selection to a registry key
+
+        Args:
+            provider: Requested provider (defaults to the default provider)
+            model_name: Requested model (defaults to the default model)
+
+        Returns:
+            (provider, model) key
+
+        Raises:
+            ValueError: If the model is neither the default nor in the allow-list
+        """
+        key = (provider or self.default_key[0], model_name or self.default_key[1])
+        # Every selectable model gets its own agent, rate limiter and metric series
+        if key != self.default_key and key not in self.allowed_models:
+            raise ValueError(f"Model not available: {key[0]}:{key[1]}")
+        return key
+
+    def get(self, provider: Optional[str] = None, model_name: Optional[str] = None) -> SupervisorAgent:
+        """
+        Get the agent for a model, building it on first use
+
+        Args:
+            provider: LLM provider (defaults to the default provider)
+            model_name: LLM model (defaults to the default model)
+
+        Returns:
+            SupervisorAgent instance for the model
+
+        Raises:
+            ValueError: If the model is not allowed or its provider is not configured
+        """
+        key = self.resolve(provider, model_name)
+        with self._lock:
+            entry = self._agents.get(key)
+            if entry is None:
+                logger.info(f"Creating agent for {key[0]}:{key[1]}")
+                agent = self._factory(key[1], key[0])
+                agent.latency = self._latency.setdefault(key, Histogram())
+                self.created += 1
+            else:
+                agent = entry[0]
+            self._agents[key] = (agent, time.monotonic())
+            self._agents.move_to_end(key)
+            self._evict(keep=key)
+            return agent
+
+    def _evict(self, keep: AgentKey) -> None:
+        """Drop idle and least recently used agents until within limits"""
+        now = time.monotonic()
+        for key, (_, last_used) in list(self._agents.items()):
+            if key in (keep, self.default_key):
+                continue
+            over_capacity = len(self._agents) > self.max_agents
+            idle = self.idle_ttl > 0 and now - last_used > self.idle_ttl
+            if over_capacity or idle:
+                del self._agents[key]
+                self.evictions += 1
+                logger.info(f"Evicted agent for {key[0]}:{key[1]}")
+
+    def evict_idle(self) -> None:
+        """Evict agents that have been idle longer than the idle TTL"""
+        with self._lock:
+            self._evict(keep=self.default_key)
+
+    async def _sweep_idle(self) -> None:
+        """Periodically evict idle agents, so they are freed without further traffic"""
+        while True:
+            await asyncio.sleep(self.idle_ttl / 2)
+            self.evict_idle()
+
+    async def start(self) -> None:
+        """Start the idle agent sweeper on the running loop"""
+        if self.idle_ttl > 0 and (self._sweeper is None or self._sweeper.done()):
+            self._sweeper = asyncio.create_task(self._sweep_idle())
+
+    async def aclose(self) -> None:
+        """Stop the idle agent sweeper"""
+        if self._sweeper is not None and not self._sweeper.done():
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+        self._sweeper = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get registry statistics
+
+        Returns:
+            Dictionary with resident agents and per-model latency statistics
+        """
+        with self._lock:
+            now = time.monotonic()
+            resident = {key: round(now - last_used, 1) for key, (_, last_used) in self._agents.items()}
+            models = []
+            for key, histogram in self._latency.items():
+                entry = {
+                    "provider": key[0],
+                    "model": key[1],
+                    "default": key == self.default_key,
+                    "resident": key in resident,
+                    "idle_seconds": resident.get(key),
+                    "latency": histogram.get_stats(),
+                }
+                agent = self._agents[key][0] if key in self._agents else None
+                if agent is not None and agent.cascade_stats is not None:
+                    entry["cascade"] = agent.cascade_stats.get_stats()
+                if agent is not None and agent.prefetcher is not None:
+                    entry["prefetch"] = agent.prefetcher.get_stats()
+                models.append(entry)
+            return {
+                "resident_count": len(resident),
+                "max_agents": self.max_agents,
+                "idle_ttl": self.idle_ttl,
+                "created": self.created,
+                "evictions": self.evictions,
+                "allowed_models": sorted(f"{provider}:{model}" for provider, model in self.allowed_models),
+                "models": models,
+            }
+
+
+# Global agent registry
+_registry: Optional[AgentRegistry] = None
+
+
+def get_agent_registry() -> AgentRegistry:
+    """
+    Get or create the global agent registry
+
+    Returns:
+        AgentRegistry configured from settings
+    """
+    global _registry
+    if _registry is None:
+        settings = get_settings()
+        _registry = AgentRegistry(
+            default_provider=settings.AGENT_DEFAULT_PROVIDER,
+            default_model=settings.AGENT_DEFAULT_MODEL,
+            allowed_models=parse_allowed_models(settings.AGENT_ALLOWED_MODELS),
+            max_agents=settings.AGENT_MAX_INSTANCES,
+            idle_ttl=settings.AGENT_IDLE_TTL
+        )
+    return _registry
+
+
+def get_agent(model_name: Optional[str] = None, provider: Optional[str] = None) -> SupervisorAgent:
+    """
+    Get the agent for a model from the global registry
+
+    Args:
+        model_name: Name of the LLM model to use (defaults to AGENT_DEFAULT_MODEL)
+        provider: LLM provider (defaults to AGENT_DEFAULT_PROVIDER)
+
+    Returns:
+        SupervisorAgent instance
+    """
+    return get_agent_registry().get(provider=provider, model_name=model_name)
+
+
+async def close_agent_registry() -> None:
+    """
+    Stop the global agent registry's idle sweeper, if it was created
+    """
+    if _registry is not None:
+        await _registry.aclose()
@@ -5,27 +5,58 @@ This module implements the main supervisor agent that orchestrates troubleshooti
 and analysis tasks using LangGraph.
 """
 
-from typing import Annotated, Sequence, TypedDict, Literal
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
+from typing import Annotated, Any, Dict, List, Optional, Sequence, TypedDict, Literal
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableConfig
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from langgraph.graph import StateGraph, END
+from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.prebuilt.tool_node import ToolCallRequest
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from agents.answer_cache import answer_cache_key, get_answer_cache
+from agents.cascade import (
+    EMPTY_TOOL_RESULT, LARGE, SMALL, TOOL_DEPTH, UNCERTAIN,
+    CascadeStats, current_turn, has_empty_tool_result, is_uncertain, parse_markers, tool_rounds
+)
+from agents.checkpointer import get_checkpointer
+from agents.prefetch import Prefetcher
+from agents.tool_executor import get_tool_executor
+from agents.compaction import compact_messages, fit_summary, summarize_extractive
 from tools.rag_tools import get_rag_tools
 from tools.system_tools import get_system_tools
 from config import get_settings
-import operator
+from services.deadline import Deadline, DeadlineExceeded, deadline_from_config, deadline_scope, within_deadline
+from services.llm_rate_limiter import get_llm_rate_limiter
+from services.metrics import Histogram
+from services.prometheus import GraphMetricsCallback
+from services.tracing import start_span
+from services.tokens import content_text, count_tokens, estimate_tokens
 import logging
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
 
-class AgentState(TypedDict):
+class AgentState(TypedDict, total=False):
     """State for the supervisor agent"""
-    messages: Annotated[Sequence[BaseMessage], operator.add]
+    messages: Annotated[Sequence[BaseMessage], add_messages]
     next: str
+    # Running summary of turns compacted out of the prompt
+    summary: str
+    # Prompt token estimates for the session, before and after compaction
+    context_tokens: Dict[str, int]
+    # Tools prefetched for the current turn
+    prefetched: List[str]
+    # Whether the current turn was cut short by its deadline
+    deadline_exceeded: bool
+    # Cascade tier answering the current turn and why it was escalated
+    tier: str
+    escalation: str
 
 
 class SupervisorAgent:
@@ -40,42 +71,95 @@ class SupervisorAgent:
     - Plan and execute troubleshooting steps
     """
     
-    def __init__(self, model_name: str = "gpt-4o-mini", provider: str = "openai"):
+    def __init__(
+        self,
+        model_name: str = "gpt-4o-mini",
+        provider: str = "openai",
+        llm: Optional[BaseChatModel] = None,
+        checkpointer: Optional[BaseCheckpointSaver] = None,
+        cascade: bool = False,
+        escalation_llm: Optional[BaseChatModel] = None
+    ):
         """
         Initialize the supervisor agent
         
         Args:
             model_name: Name of the LLM model to use
             provider: LLM provider (openai, anthropic)
+            llm: Optional pre-built chat model (skips provider setup)
+            checkpointer: Optional session checkpointer (defaults to the shared bounded one)
+            cascade: Answer with the model first and escalate uncertain turns to a larger model
+            escalation_llm: Optional pre-built larger model (enables the cascade)
         """
         self.settings = get_settings()
         self.model_name = model_name
         self.provider = provider
-        self.llm = self._create_llm()
+        self.llm = llm or self._create_llm()
         self.tools = self._create_tools()
+        
+        # Built once and reused by every model step
+        self.system_message = SystemMessage(content=self._create_system_prompt())
+        self.system_tokens = estimate_tokens(self.system_message.content)
+        self.model_with_tools = self.llm.bind_tools(self.tools) if self.tools else self.llm
+        
+        # Tiered cascade: this agent's model is the small tier
+        self.cascade = cascade or escalation_llm is not None
+        self.cascade_stats: Optional[CascadeStats] = None
+        if self.cascade:
+            self.escalation_llm = escalation_llm or self._create_llm(
+                self.settings.CASCADE_LARGE_PROVIDER or self.provider,
+                self.settings.CASCADE_LARGE_MODEL
+            )
+            self.tier_models = {
+                SMALL: self.model_with_tools.with_config(tags=[f"tier:{SMALL}"]),
+                LARGE: (
+                    self.escalation_llm.bind_tools(self.tools) if self.tools else self.escalation_llm
+                ).with_config(tags=[f"tier:{LARGE}"]),
+            }
+            self.uncertainty_markers = parse_markers(self.settings.CASCADE_UNCERTAINTY_MARKERS)
+            self.empty_result_markers = parse_markers(self.settings.CASCADE_EMPTY_RESULT_MARKERS)
+            self.cascade_stats = CascadeStats()
+        
+        self.checkpointer = checkpointer or get_checkpointer()
+        self.tool_executor = get_tool_executor()
+        
+        # Speculative searches on the user's question, run alongside the first model call
+        self.prefetcher: Optional[Prefetcher] = None
+        prefetch_names = {name.strip() for name in self.settings.PREFETCH_TOOLS.split(",")}
+        prefetch_tools = [tool for tool in self.tools if tool.name in prefetch_names]
+        if self.settings.PREFETCH_ENABLED and prefetch_tools:
+            self.prefetcher = Prefetcher(prefetch_tools, self.settings.PREFETCH_MATCH_THRESHOLD)
+        self.answer_cache = get_answer_cache()
+        # Latency of full agent runs (shared per model by the registry)
+        self.latency = Histogram()
+        # Graph step and LLM call metrics exported on /metrics
+        self.metrics_callback = GraphMetricsCallback(self.provider, self.model_name)
         self.graph = self._create_graph()
-        self.checkpointer = MemorySaver()
         
-    def _create_llm(self):
-        """Create the LLM instance based on provider"""
-        if self.provider == "openai":
+    def _create_llm(self, provider: Optional[str] = None, model_name: Optional[str] = None):
+        """Create the LLM instance based on provider (defaults to the agent's model)"""
+        provider = provider or self.provider
+        model_name = model_name or self.model_name
+        if provider == "openai":
             if not self.settings.OPENAI_API_KEY:
                 raise ValueError("OPENAI_API_KEY not configured")
-            return ChatOpenAI(
-                model=self.model_name,
+            llm = ChatOpenAI(
+                model=model_name,
                 temperature=0.1,
                 api_key=self.settings.OPENAI_API_KEY
             )
-        elif self.provider == "anthropic":
+        elif provider == "anthropic":
             if not self.settings.ANTHROPIC_API_KEY:
                 raise ValueError("ANTHROPIC_API_KEY not configured")
-            return ChatAnthropic(
-                model=self.model_name,
+            llm = ChatAnthropic(
+                model=model_name,
                 temperature=0.1,
                 api_key=self.settings.ANTHROPIC_API_KEY
             )
         else:
-            raise ValueError(f"Unsupported provider: {self.provider}")
+            raise ValueError(f"Unsupported provider: {provider}")
+        # Calls wait for the provider/model's RPM and TPM capacity instead of hitting 429s
+        return get_llm_rate_limiter().wrap(llm, provider, model_name)
     
     def _create_tools(self):
         """Create and combine all available tools"""
@@ -130,11 +214,19 @@ Guidelines:
 
 Be concise but thorough. Focus on solving the problem efficiently."""
     
-    def _should_continue(self, state: AgentState) -> Literal["tools", "end"]:
+    def _should_continue(self, state: AgentState) -> Literal["tools", "escalate", "end"]:
         """Determine if the agent should continue or end"""
         messages = state["messages"]
         last_message = messages[-1]
         
+        # A deadline answer is final, even if it cut short an escalated step
+        if state.get("deadline_exceeded"):
+            return "end"
+        
+        # The small model's answer was discarded; retry the step on the large model
+        if state.get("next") == "escalate":
+            return "escalate"
+        
         # If the LLM makes a tool call, route to tools
         if hasattr(last_message, "tool_calls") and last_message.tool_calls:
             return "tools"
@@ -142,50 +234,273 @@ Be concise but thorough. Focus on solving the problem efficiently."""
         # Otherwise, end
         return "end"
     
-    def _call_model(self, state: AgentState) -> dict:
-        """Call the LLM with the current state"""
+    def _system_message_for(self, state: AgentState) -> SystemMessage:
+        """System message for a step, including the summary of compacted turns"""
+        summary = state.get("summary")
+        if not summary:
+            return self.system_message
+        return SystemMessage(
+            content=f"{self.system_message.content}\n\nSummary of the earlier conversation:\n{summary}"
+        )
+    
+    async def _summarize(self, messages: Sequence[BaseMessage]) -> str:
+        """Summarize compacted messages with the configured strategy"""
+        extractive = summarize_extractive(messages)
+        if self.settings.CONTEXT_SUMMARY_MODE != "llm":
+            return extractive
+        try:
+            response = await self.llm.ainvoke([
+                SystemMessage(content=(
+                    "Summarize this troubleshooting conversation excerpt in a few bullet points. "
+                    "Keep resource names, errors, findings and decisions."
+                )),
+                HumanMessage(content=extractive)
+            ])
+            return content_text(response.content)
+        except Exception as e:
+            logger.warning(f"LLM summary failed, using extractive summary: {e}")
+            return extractive
+    
+    async def _condense_summary(self, summary: str, max_tokens: int) -> str:
+        """Bring the running summary back within its token budget"""
+        if estimate_tokens(summary) <= max_tokens:
+            return summary
+        if self.settings.CONTEXT_SUMMARY_MODE == "llm":
+            try:
+                response = await self.llm.ainvoke([
+                    SystemMessage(content=(
+                        f"Condense this summary of a troubleshooting conversation to at most "
+                        f"{max_tokens * 3 // 4} words. Keep resource names, errors, findings and decisions."
+                    )),
+                    HumanMessage(content=summary)
+                ])
+                summary = content_text(response.content)
+            except Exception as e:
+                logger.warning(f"LLM summary condensing failed, trimming the summary: {e}")
+        # The oldest lines go first; also a hard cap on the model's condensed summary
+        return fit_summary(summary, max_tokens)
+    
+    async def _compact(self, state: AgentState, config: RunnableConfig) -> dict:
+        """Keep the prompt within the token budget by compacting older turns"""
         messages = state["messages"]
+        previous_summary = state.get("summary", "")
+        summary_budget = int(self.settings.CONTEXT_TOKEN_BUDGET * self.settings.CONTEXT_SUMMARY_SHARE)
+        # A summary written under a larger budget must not crowd out the conversation
+        summary = await self._condense_summary(previous_summary, summary_budget)
+        base_tokens = self.system_tokens + estimate_tokens(summary)
+        
+        result = compact_messages(
+            messages,
+            budget=self.settings.CONTEXT_TOKEN_BUDGET,
+            keep_turns=self.settings.CONTEXT_KEEP_TURNS,
+            tool_result_chars=self.settings.CONTEXT_TOOL_RESULT_CHARS,
+            base_tokens=base_tokens
+        )
+        
+        previous = state.get("context_tokens") or {}
+        if result is None:
+            tokens = base_tokens + count_tokens(messages)
+            update: Dict[str, Any] = {"context_tokens": {**previous, "before": tokens, "after": tokens}}
+            if summary != previous_summary:
+                update["summary"] = summary
+            return update
         
-        # Create the prompt with system message
-        system_message = SystemMessage(content=self._create_system_prompt())
-        all_messages = [system_message] + list(messages)
+        update = {"messages": result.updates}
+        tokens_after = result.tokens_after
+        if result.removed:
+            new_summary = await self._summarize(result.removed)
+            merged = f"{summary}\n{new_summary}".strip()
+            # The running summary keeps its own share of the budget, however long the session
+            merged = await self._condense_summary(merged, summary_budget)
+            tokens_after += estimate_tokens(merged) - estimate_tokens(summary)
+            summary = merged
+        if summary != previous_summary:
+            update["summary"] = summary
+        
+        update["context_tokens"] = {
+            "before": result.tokens_before,
+            "after": tokens_after,
+            "compactions": previous.get("compactions", 0) + 1
+        }
+        logger.info(
+            f"Compacted session {config['configurable'].get('thread_id')}: "
+            f"{result.tokens_before} -> {tokens_after} tokens "
+            f"({len(result.removed)} messages summarized, {result.truncated_tool_results} tool results truncated)"
+        )
+        return update
+    
+    async def _prefetch(self, state: AgentState, config: RunnableConfig) -> dict:
+        """Start speculative searches on the user's question for this turn"""
+        question = content_text(state["messages"][-1].content)
+        # Search on the question itself, not the context block prepended to it
+        question = question.rsplit("\n\nQuestion: ", 1)[-1]
+        turn_id = config["configurable"].get("turn_id")
+        if turn_id is None:
+            return {"prefetched": []}
+        with deadline_scope(deadline_from_config(config)):
+            started = self.prefetcher.start(turn_id, question)
+        return {"prefetched": started}
+    
+    async def _execute_tool(self, request: ToolCallRequest, execute) -> Any:
+        """Run a tool call, answering it from a matching prefetch when possible"""
+        turn_id = request.runtime.config["configurable"].get("turn_id") if request.runtime else None
+        if self.prefetcher and turn_id is not None:
+            call = request.tool_call
+            task = self.prefetcher.claim(turn_id, call["name"], call["args"])
+            if task is not None:
+                async def execute(request: ToolCallRequest) -> ToolMessage:
+                    return ToolMessage(content=await task, name=call["name"], tool_call_id=call["id"])
+        return await self.tool_executor(request, execute)
+    
+    def _finish_turn(self, config: RunnableConfig) -> None:
+        """Release per-turn resources such as unused prefetches"""
+        if self.prefetcher:
+            self.prefetcher.finish(config["configurable"]["turn_id"])
+    
+    async def _call_model(self, state: AgentState, config: RunnableConfig) -> dict:
+        """Call the LLM with the current state"""
+        messages = state["messages"]
         
-        # Bind tools to the model
-        model_with_tools = self.llm.bind_tools(self.tools)
+        # Prepend the system message (prebuilt unless a summary is present)
+        all_messages = [self._system_message_for(state), *messages]
         
-        # Call the model
-        response = model_with_tools.invoke(all_messages)
+        with deadline_scope(deadline_from_config(config)) as deadline:
+            # Too little time left for another tool round: answer with what we have
+            if deadline is not None and deadline.remaining() * 1000 < self.settings.DEADLINE_ANSWER_RESERVE_MS:
+                return await self._best_effort_answer(state, deadline)
+            
+            try:
+                if self.cascade:
+                    return await self._call_tier(state, all_messages)
+                
+                # Call the tool-bound model without blocking the event loop
+                response = await within_deadline(self.model_with_tools.ainvoke(all_messages))
+            except DeadlineExceeded:
+                return self._fallback_answer(messages)
         
         return {"messages": [response]}
     
+    async def _best_effort_answer(self, state: AgentState, deadline: Deadline) -> dict:
+        """Produce a final answer without tools before the deadline passes"""
+        logger.info(f"Deadline near ({deadline.remaining():.2f}s left); producing a best-effort answer")
+        if deadline.remaining() * 1000 >= self.settings.DEADLINE_MIN_LLM_MS:
+            system = SystemMessage(content=(
+                f"{self._system_message_for(state).content}\n\n"
+                "The time budget for this request is almost exhausted. Do not call tools. "
+                "Give your best final answer now from the information gathered so far, "
+                "and state briefly what could not be checked."
+            ))
+            try:
+                response = await within_deadline(self.llm.ainvoke([system, *state["messages"]]))
+                if not getattr(response, "tool_calls", None):
+                    return {"messages": [response], "deadline_exceeded": True, "next": ""}
+            except DeadlineExceeded:
+                pass
+        return self._fallback_answer(state["messages"])
+    
+    def _fallback_answer(self, messages: Sequence[BaseMessage]) -> dict:
+        """Model-free final answer listing the findings of the current turn"""
+        findings = summarize_extractive([message for message in current_turn(messages) if isinstance(message, ToolMessage)])
+        if findings:
+            content = f"I ran out of time before finishing the investigation. What I found so far:\n{findings}"
+        else:
+            content = "I ran out of time before I could gather any findings. Please try again with a narrower question."
+        return {"messages": [AIMessage(content=content)], "deadline_exceeded": True, "next": ""}
+    
+    async def _call_tier(self, state: AgentState, all_messages: list) -> dict:
+        """Call the current cascade tier, escalating when a check fails"""
+        messages = state["messages"]
+        tier = state.get("tier") or SMALL
+        
+        # Nothing useful came back from the tools; let the large model take over
+        if tier == SMALL and has_empty_tool_result(messages, self.empty_result_markers):
+            return self._escalate(EMPTY_TOOL_RESULT)
+        
+        started = time.perf_counter()
+        response = await within_deadline(self.tier_models[tier].ainvoke(all_messages))
+        self.cascade_stats.record_call(tier, time.perf_counter() - started)
+        
+        if tier == SMALL:
+            max_rounds = self.settings.CASCADE_MAX_TOOL_ROUNDS
+            if response.tool_calls and max_rounds > 0 and tool_rounds(messages) >= max_rounds:
+                return self._escalate(TOOL_DEPTH)
+            if not response.tool_calls and is_uncertain(response, self.uncertainty_markers):
+                return self._escalate(UNCERTAIN)
+        
+        return {"messages": [response], "tier": tier, "next": ""}
+    
+    def _escalate(self, reason: str) -> dict:
+        """Discard the small model's step and hand the turn to the large model"""
+        self.cascade_stats.record_escalation(reason)
+        logger.info(f"Escalating to {self.settings.CASCADE_LARGE_MODEL}: {reason}")
+        return {"tier": LARGE, "escalation": reason, "next": "escalate"}
+    
+    def _deadline_for(self, budget_ms: Optional[int]) -> Optional[Deadline]:
+        """Deadline for a turn from its budget or the configured default"""
+        budget_ms = budget_ms or self.settings.DEADLINE_DEFAULT_MS
+        return Deadline(budget_ms / 1000.0) if budget_ms and budget_ms > 0 else None
+    
+    def _turn_input(self, input_message: HumanMessage) -> dict:
+        """Graph input for a new user turn"""
+        if not self.cascade:
+            return {"messages": [input_message], "deadline_exceeded": False}
+        # Every turn starts on the small model
+        return {"messages": [input_message], "deadline_exceeded": False, "tier": SMALL, "escalation": "", "next": ""}
+    
+    def _record_turn(self, values: dict, elapsed: float) -> None:
+        """Record the cascade outcome of a completed turn"""
+        if not self.cascade:
+            return
+        tier = values.get("tier") or SMALL
+        small_calls = tool_rounds(values.get("messages", [])) + 1 if tier == SMALL else 0
+        self.cascade_stats.record_turn(tier, elapsed, small_calls)
+    
+    def _traced(self, name: str, node):
+        """Wrap a graph node so each execution is recorded as a span"""
+        async def run(state: AgentState, config: RunnableConfig) -> dict:
+            attributes = {"node": name, "session_id": config["configurable"].get("thread_id"), "model": self.model_name}
+            with start_span(f"node {name}", attributes):
+                return await node(state, config)
+        return run
+    
     def _create_graph(self):
         """Create the LangGraph workflow"""
         # Create the graph
         workflow = StateGraph(AgentState)
         
         # Add nodes
-        workflow.add_node("agent", self._call_model)
+        if self.prefetcher:
+            workflow.add_node("prefetch", self._traced("prefetch", self._prefetch))
+        workflow.add_node("compact", self._traced("compact", self._compact))
+        workflow.add_node("agent", self._traced("agent", self._call_model))
         
         # Only add tool node if we have tools
         if self.tools:
-            tool_node = ToolNode(self.tools)
+            # Tool calls of one step run concurrently, each within its own timeout and concurrency limit
+            tool_node = ToolNode(self.tools, awrap_tool_call=self._execute_tool)
             workflow.add_node("tools", tool_node)
         
-        # Set entry point
-        workflow.set_entry_point("agent")
+        # Set entry point; every model step is preceded by compaction
+        if self.prefetcher:
+            # Prefetch only starts background searches, so the first model call is not delayed
+            workflow.set_entry_point("prefetch")
+            workflow.add_edge("prefetch", "compact")
+        else:
+            workflow.set_entry_point("compact")
+        workflow.add_edge("compact", "agent")
         
         # Add conditional edges
-        if self.tools:
-            workflow.add_conditional_edges(
-                "agent",
-                self._should_continue,
-                {
-                    "tools": "tools",
-                    "end": END
-                }
-            )
-            # After tools, go back to agent
-            workflow.add_edge("tools", "agent")
+        if self.tools or self.cascade:
+            routes = {"end": END}
+            if self.tools:
+                routes["tools"] = "tools"
+            if self.cascade:
+                # Escalated steps are retried on the large model
+                routes["escalate"] = "compact"
+            workflow.add_conditional_edges("agent", self._should_continue, routes)
+            if self.tools:
+                # After tools, compact and go back to agent
+                workflow.add_edge("tools", "compact")
         else:
             # If no tools, just end after agent
             workflow.add_edge("agent", END)
@@ -197,15 +512,24 @@ Be concise but thorough. Focus on solving the problem efficiently."""
         self,
         message: str,
         session_id: str = "default",
-        context: dict = None
+        context: dict = None,
+        bypass_cache: bool = False,
+        budget_ms: Optional[int] = None
     ) -> dict:
         """
         Send a message to the agent and get a response
         
+        When the answer cache is enabled, the opening question of a session is
+        answered from the cache if the same question, context and model were
+        seen within the TTL. Follow-up questions depend on the conversation and
+        are never served from the cache.
+        
         Args:
             message: User message
             session_id: Session ID for conversation continuity
             context: Optional context information
+            bypass_cache: Skip the answer cache lookup (a fresh answer is still cached)
+            budget_ms: Latency budget for the turn (defaults to DEADLINE_DEFAULT_MS)
             
         Returns:
             Response dictionary with message and metadata
@@ -220,17 +544,39 @@ Be concise but thorough. Focus on solving the problem efficiently."""
                 input_message.content = f"Context:\n{context_str}\n\nQuestion: {message}"
             
             # Configure the graph execution
+            deadline = self._deadline_for(budget_ms)
             config = {
                 "configurable": {
-                    "thread_id": session_id
-                }
+                    "thread_id": session_id,
+                    # Per-turn state, such as prefetches, is keyed by turn so concurrent turns don't collide
+                    "turn_id": uuid.uuid4().hex,
+                    "deadline": deadline
+                },
+                "callbacks": [self.metrics_callback]
             }
             
+            # Answer repeated opening questions from the cache
+            cache_key = None
+            if self.settings.ANSWER_CACHE_ENABLED:
+                state = await self.graph.aget_state(config)
+                if not state.values.get("messages"):
+                    cache_key = answer_cache_key(message, context, self.provider, self.model_name)
+                    cached = None if bypass_cache else self.answer_cache.get(cache_key)
+                    if cached is not None:
+                        return await self._cached_response(cached, input_message, session_id, config)
+            
             # Run the graph
-            result = await self.graph.ainvoke(
-                {"messages": [input_message]},
-                config=config
-            )
+            started = time.perf_counter()
+            try:
+                result = await self.graph.ainvoke(
+                    self._turn_input(input_message),
+                    config=config
+                )
+            finally:
+                self._finish_turn(config)
+            elapsed = time.perf_counter() - started
+            self.latency.observe(elapsed)
+            self._record_turn(result, elapsed)
             
             # Extract the final response
             messages = result["messages"]
@@ -248,15 +594,36 @@ Be concise but thorough. Focus on solving the problem efficiently."""
                 if hasattr(msg, "tool_calls") and msg.tool_calls:
                     tool_calls.extend([tc["name"] for tc in msg.tool_calls])
             
+            metadata = {
+                "model": self.model_name,
+                "provider": self.provider,
+                "tools_used": tool_calls,
+                "message_count": len(messages),
+                "context_tokens": result.get("context_tokens")
+            }
+            # Best-effort answers cut short by the deadline must not be served to later requests
+            if cache_key is not None and not result.get("deadline_exceeded"):
+                self.answer_cache.set(cache_key, {
+                    "response": response_text,
+                    "tools_used": tool_calls,
+                    "created_at": time.time()
+                })
+            if self.settings.ANSWER_CACHE_ENABLED:
+                metadata["cache"] = {"hit": False, "bypassed": bypass_cache}
+            if deadline is not None:
+                metadata["deadline"] = {
+                    "budget_ms": round(deadline.budget * 1000),
+                    "remaining_ms": round(deadline.remaining() * 1000),
+                    "exceeded": bool(result.get("deadline_exceeded"))
+                }
+            if self.cascade:
+                metadata["tier"] = result.get("tier") or SMALL
+                metadata["escalation"] = result.get("escalation") or None
+            
             return {
                 "response": response_text,
                 "session_id": session_id,
-                "metadata": {
-                    "model": self.model_name,
-                    "provider": self.provider,
-                    "tools_used": tool_calls,
-                    "message_count": len(messages)
-                }
+                "metadata": metadata
             }
             
         except Exception as e:
@@ -269,19 +636,48 @@ Be concise but thorough. Focus on solving the problem efficiently."""
                 }
             }
     
+    async def _cached_response(
+        self,
+        cached: dict,
+        input_message: HumanMessage,
+        session_id: str,
+        config: RunnableConfig
+    ) -> dict:
+        """Return a cached answer, recording the exchange in the session"""
+        # Keep the session coherent so follow-up questions see this exchange
+        answer = AIMessage(content=cached["response"])
+        await self.graph.aupdate_state(config, {"messages": [input_message, answer]}, as_node="agent")
+        
+        return {
+            "response": cached["response"],
+            "session_id": session_id,
+            "metadata": {
+                "model": self.model_name,
+                "provider": self.provider,
+                "tools_used": cached["tools_used"],
+                "message_count": 2,
+                "cache": {
+                    "hit": True,
+                    "age_seconds": round(time.time() - cached["created_at"], 3)
+                }
+            }
+        }
+    
     async def stream_chat(
         self,
         message: str,
         session_id: str = "default",
-        context: dict = None
+        context: dict = None,
+        budget_ms: Optional[int] = None
     ):
         """
-        Stream agent responses (for future implementation)
+        Stream agent responses token by token
         
         Args:
             message: User message
             session_id: Session ID for conversation continuity
             context: Optional context information
+            budget_ms: Latency budget for the turn (defaults to DEADLINE_DEFAULT_MS)
             
         Yields:
             Response chunks
@@ -296,25 +692,57 @@ Be concise but thorough. Focus on solving the problem efficiently."""
         # Configure the graph execution
         config = {
             "configurable": {
-                "thread_id": session_id
-            }
+                "thread_id": session_id,
+                "turn_id": uuid.uuid4().hex,
+                "deadline": self._deadline_for(budget_ms)
+            },
+            "callbacks": [self.metrics_callback]
         }
         
+        started = time.perf_counter()
+        
         # Stream the graph execution
+        try:
+            async for event in self._stream_events(input_message, config):
+                yield event
+        finally:
+            self._finish_turn(config)
+        
+        if self.cascade:
+            state = await self.graph.aget_state(config)
+            self._record_turn(state.values, time.perf_counter() - started)
+    
+    async def _stream_events(self, input_message: HumanMessage, config: RunnableConfig):
+        """Translate graph events into content and tool events"""
+        # Small-tier tokens are held back until the step is known not to escalate
+        held: list[str] = []
+        
         async for event in self.graph.astream_events(
-            {"messages": [input_message]},
+            self._turn_input(input_message),
             config=config,
-            version="v1"
+            version="v2"
         ):
             kind = event["event"]
             
-            if kind == "on_chat_model_stream":
-                content = event["data"]["chunk"].content
-                if content:
+            # Only stream tokens from the agent's own model step (not e.g. summaries)
+            if kind == "on_chat_model_stream" and event["metadata"].get("langgraph_node") == "agent":
+                content = content_text(event["data"]["chunk"].content)
+                if content and f"tier:{SMALL}" in event.get("tags", []):
+                    held.append(content)
+                elif content:
                     yield {
                         "type": "content",
                         "data": content
                     }
+            elif kind == "on_chain_end" and held and event["name"] == "agent":
+                output = event["data"].get("output")
+                escalated = isinstance(output, dict) and output.get("next") == "escalate"
+                if not escalated:
+                    yield {
+                        "type": "content",
+                        "data": "".join(held)
+                    }
+                held.clear()
             elif kind == "on_tool_start":
                 yield {
                     "type": "tool_start",
@@ -329,24 +757,3 @@ Be concise but thorough. Focus on solving the problem efficiently."""
                         "tool": event["name"]
                     }
                 }
-
-
-# Global agent instance
-_agent: SupervisorAgent = None
-
-
-def get_agent(model_name: str = "gpt-4o-mini", provider: str = "openai") -> SupervisorAgent:
-    """
-    Get or create the global agent instance
-    
-    Args:
-        model_name: Name of the LLM model to use
-        provider: LLM provider (openai, anthropic)
-        
-    Returns:
-        SupervisorAgent instance
-    """
-    global _agent
-    if _agent is None:
-        _agent = SupervisorAgent(model_name=model_name, provider=provider)
-    return _agent
@@ -0,0 +1,259 @@
+"""
+Tool Execution Policy
+
+This module limits how tools run inside the agent's ToolNode. Each tool gets
+its own timeout and concurrency limit, so a slow or saturated tool does not
+hold up the others, and a timed-out call is returned to the model as a
+structured result instead of failing the turn.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from langchain_core.messages import ToolMessage
+from langgraph.prebuilt.tool_node import ToolCallRequest
+from config import get_settings
+from services.deadline import DeadlineExceeded, cap_timeout, current_deadline, deadline_from_config, deadline_scope
+from services.metrics import Histogram
+from services.prometheus import TOOL_CALLS, TOOL_DURATION
+from services.tracing import current_span, start_span
+
+logger = logging.getLogger(__name__)
+
+
+def parse_tool_limits(value: str) -> Dict[str, float]:
+    """Parse "tool=value" pairs separated by commas"""
+    limits: Dict[str, float] = {}
+    for item in value.split(","):
+        tool, sep, limit = item.partition("=")
+        if not sep:
+            continue
+        try:
+            limits[tool.strip()] = float(limit)
+        except ValueError:
+            logger.warning(f"Ignoring invalid limit for tool '{tool.strip()}': {limit}")
+    return limits
+
+
+class _ToolStats:
+    """Counters and latency for one tool"""
+
+    __slots__ = ("latency", "calls", "timeouts", "deadline_exceeded", "errors", "in_flight", "queued")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.calls = 0
+        self.timeouts = 0
+        # Calls cut short by the request deadline rather than the tool's own timeout
+        self.deadline_exceeded = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.queued = 0
+
+
+class ToolExecutor:
+    """
+    Tool call interceptor enforcing per-tool timeouts and concurrency limits.
+
+    Used as the ToolNode's awrap_tool_call hook. The ToolNode already runs the
+    tool calls of one model step concurrently; this adds the limits around
+    each call and records per-tool latency.
+    """
+
+    def __init__(
+        self,
+        default_timeout: float = 30.0,
+        default_concurrency: int = 8,
+        timeouts: Optional[Dict[str, float]] = None,
+        concurrency: Optional[Dict[str, float]] = None
+    ):
+        """
+        Initialize the executor
+
+        Args:
+            default_timeout: Seconds a tool call may take, including queueing (0 disables)
+            default_concurrency: Concurrent calls allowed per tool
+            timeouts: Per-tool timeout overrides
+            concurrency: Per-tool concurrency overrides
+        """
+        self.default_timeout = default_timeout
+        self.default_concurrency = max(1, default_concurrency)
+        self.timeouts = dict(timeouts or {})
+        self.concurrency = {name: max(1, int(limit)) for name, limit in (concurrency or {}).items()}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, _ToolStats] = {}
+
+    def timeout_for(self, name: str) -> float:
+        """Timeout in seconds for a tool"""
+        return self.timeouts.get(name, self.default_timeout)
+
+    def _semaphore(self, name: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(name)
+        if semaphore is None:
+            semaphore = self._semaphores[name] = asyncio.Semaphore(
+                self.concurrency.get(name, self.default_concurrency)
+            )
+        return semaphore
+
+    def _tool_stats(self, name: str) -> _ToolStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = _ToolStats()
+        return stats
+
+    async def __call__(
+        self,
+        request: ToolCallRequest,
+        execute: Callable[[ToolCallRequest], Awaitable[Any]]
+    ) -> Any:
+        """
+        Run one tool call within its limits
+
+        Args:
+            request: Tool call request from the ToolNode
+            execute: Continuation running the tool
+
+        Returns:
+            The tool's message, or a structured timeout result
+        """
+        call = request.tool_call
+        name = call["name"]
+        stats = self._tool_stats(name)
+        stats.calls += 1
+        started = time.perf_counter()
+
+        # Tools and the RAG client cap their own timeouts to the request deadline; the span
+        # opened here is the parent of the tool's RAG and backend requests
+        deadline = deadline_from_config(request.runtime.config) if request.runtime else None
+        with deadline_scope(deadline), start_span(f"tool {name}", {"node": "tools", "tool": name}) as span:
+            try:
+                timeout = cap_timeout(self.timeout_for(name) or None) or 0
+            except DeadlineExceeded:
+                stats.deadline_exceeded += 1
+                TOOL_CALLS.labels(name, "deadline").inc()
+                if span is not None:
+                    span.set_attribute("tool.status", "deadline")
+                return self._timeout_result(call, 0, "the request deadline has passed", status="deadline_exceeded")
+            return await self._run(request, execute, stats, timeout, started)
+
+    async def _run(
+        self,
+        request: ToolCallRequest,
+        execute: Callable[[ToolCallRequest], Awaitable[Any]],
+        stats: _ToolStats,
+        timeout: float,
+        started: float
+    ) -> Any:
+        """Run a tool call under its semaphore and timeout"""
+        call = request.tool_call
+        name = call["name"]
+
+        async def run() -> Any:
+            semaphore = self._semaphore(name)
+            # Calls that time out or are cancelled while queued leave the queue too
+            stats.queued += 1
+            try:
+                await semaphore.acquire()
+            finally:
+                stats.queued -= 1
+            stats.in_flight += 1
+            try:
+                return await execute(request)
+            finally:
+                stats.in_flight -= 1
+                semaphore.release()
+
+        status = "error"
+        try:
+            result = await asyncio.wait_for(run(), timeout) if timeout > 0 else await run()
+        except asyncio.TimeoutError as e:
+            # The timeout may have been capped to the request deadline, or a tool hit the deadline
+            deadline = current_deadline()
+            if isinstance(e, DeadlineExceeded) or (deadline is not None and deadline.expired):
+                stats.deadline_exceeded += 1
+                status = "deadline"
+                logger.warning(f"Tool {name} was cut short by the request deadline")
+                return self._timeout_result(
+                    call, timeout, "the request deadline passed before it finished", status="deadline_exceeded"
+                )
+            stats.timeouts += 1
+            status = "timeout"
+            logger.warning(f"Tool {name} timed out after {timeout:.3g}s")
+            return self._timeout_result(call, timeout, f"it did not finish within {timeout:.3g}s")
+        else:
+            if isinstance(result, ToolMessage) and result.status == "error":
+                stats.errors += 1
+            else:
+                status = "ok"
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            stats.latency.observe(elapsed)
+            TOOL_DURATION.labels(name).observe(elapsed)
+            TOOL_CALLS.labels(name, status).inc()
+            span = current_span()
+            if span is not None:
+                span.set_attribute("tool.status", status)
+
+    @staticmethod
+    def _timeout_result(call: Dict[str, Any], timeout: float, reason: str, status: str = "timeout") -> ToolMessage:
+        """Structured result returned to the model for a tool call that ran out of time"""
+        return ToolMessage(
+            content=json.dumps({
+                "status": status,
+                "tool": call["name"],
+                "timeout_seconds": round(timeout, 3),
+                "result": None,
+                "message": f"{call['name']} returned no result because {reason}; continue with the other results.",
+            }),
+            name=call["name"],
+            tool_call_id=call["id"],
+            status="error"
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get per-tool execution statistics
+
+        Returns:
+            Dictionary keyed by tool name with limits, counters and latency
+        """
+        return {
+            name: {
+                "timeout_seconds": self.timeout_for(name),
+                "max_concurrency": self.concurrency.get(name, self.default_concurrency),
+                "calls": stats.calls,
+                "timeouts": stats.timeouts,
+                "deadline_exceeded": stats.deadline_exceeded,
+                "errors": stats.errors,
+                "in_flight": stats.in_flight,
+                "queued": stats.queued,
+                "latency": stats.latency.get_stats(),
+            }
+            for name, stats in sorted(self._stats.items())
+        }
+
+
+# Global tool executor; limits apply across all agents
+_tool_executor: Optional[ToolExecutor] = None
+
+
+def get_tool_executor() -> ToolExecutor:
+    """
+    Get or create the global tool executor
+
+    Returns:
+        ToolExecutor configured from settings
+    """
+    global _tool_executor
+    if _tool_executor is None:
+        settings = get_settings()
+        _tool_executor = ToolExecutor(
+            default_timeout=settings.TOOL_DEFAULT_TIMEOUT,
+            default_concurrency=settings.TOOL_DEFAULT_CONCURRENCY,
+            timeouts=parse_tool_limits(settings.TOOL_TIMEOUTS),
+            concurrency=parse_tool_limits(settings.TOOL_CONCURRENCY)
+        )
+    return _tool_executor
@@ -0,0 +1,6 @@
+"""
+Benchmarks for the Synapse Agents Service.
+
+Run a benchmark module from the service directory, e.g.
+``python -m benchmarks.log_templates``.
+"""
@@ -0,0 +1,408 @@
+"""
+Chat load and latency benchmark.
+
+Starts the service with a scripted stand-in LLM (fixed latency, scripted
+tool calls) and local stand-ins for the RAG service and the metrics/log
+backend, then drives ``/api/agents/chat`` and ``/api/agents/chat/stream`` at
+the given concurrency levels. Reports throughput, p50/p95/p99 latency,
+time to first token for streams and process memory growth; thresholds make
+it fail (exit code 1) on regressions. Run with
+``python -m benchmarks.chat_load [--concurrency 1 8 32] [--requests N]``.
+
+Everything runs in one process: the service and the stand-ins are served by
+uvicorn in background threads, so absolute numbers include the load
+generator's own overhead and are best compared between runs on one machine.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+import agents.registry as registry_module
+import agents.tool_executor as tool_executor_module
+from agents.registry import AgentRegistry
+from agents.supervisor import SupervisorAgent
+from config import get_settings
+from services import admission as admission_module
+from services import log_backend as log_backend_module
+from services import metrics_backend as metrics_backend_module
+from services import rag_client as rag_client_module
+from services.log_backend import LogBackendClient
+from services.metrics import Histogram
+from services.metrics_backend import MetricsBackendClient
+from services.rag_client import RagClient
+from tests.fake_backend_server import create_fake_backend_app
+from tests.fake_llm import FakeChatModel
+from tests.fake_rag_server import FakeRagServer, create_fake_rag_app
+
+# Tool rounds the stand-in model makes before answering; calls in one round run concurrently
+SCRIPTS: Dict[str, List[List[Tuple[str, Dict[str, Any]]]]] = {
+    "answer": [],
+    "search": [
+        [("search_documentation", {"query": "pods crashloop kubernetes"})],
+    ],
+    "investigate": [
+        [
+            ("search_incident_logs", {"query": "checkout memory restarts"}),
+            ("check_metrics", {"resource_type": "kubernetes", "resource_id": "checkout", "time_range": "1h"}),
+        ],
+        [("query_logs", {"resource_type": "kubernetes", "resource_id": "checkout", "query": "ERROR"})],
+    ],
+}
+
+ANSWER = (
+    "The checkout pods are restarting because they exceed their memory limit under peak load. "
+    "Raise the limit, check the recent deployment for a leak and watch the restart count. "
+)
+
+
+def scripted_responder(rounds: Sequence[Sequence[Tuple[str, Dict[str, Any]]]], answer_words: int = 40):
+    """
+    Build a responder playing a fixed tool-call script
+
+    Args:
+        rounds: Tool calls per model step, before the final answer
+        answer_words: Words in the final (streamed) answer
+
+    Returns:
+        Responder for FakeChatModel
+    """
+    words = (ANSWER * (answer_words // len(ANSWER.split()) + 1)).split()[:answer_words]
+    answer = " ".join(words)
+
+    def respond(messages: List[BaseMessage]) -> AIMessage:
+        # Tool rounds already made in this turn
+        done = 0
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                break
+            if isinstance(message, AIMessage) and message.tool_calls:
+                done += 1
+        if done < len(rounds):
+            return AIMessage(content="", tool_calls=[
+                {"name": name, "args": args, "id": f"call-{done}-{index}"}
+                for index, (name, args) in enumerate(rounds[done])
+            ])
+        return AIMessage(content=answer)
+
+    return respond
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Peak rather than current RSS; KB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class LoadResult:
+    """Outcome of one load run"""
+    endpoint: str
+    concurrency: int
+    requests: int
+    errors: int
+    elapsed_seconds: float
+    throughput_rps: float
+    p50_ms: Optional[float]
+    p95_ms: Optional[float]
+    p99_ms: Optional[float]
+    # Streams only: time until the first content frame
+    ttft_p50_ms: Optional[float] = None
+    ttft_p95_ms: Optional[float] = None
+    ttft_p99_ms: Optional[float] = None
+    memory_start_mb: float = 0.0
+    memory_growth_mb: float = 0.0
+
+
+def _ms(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value * 1000, 1)
+
+
+@contextmanager
+def service(
+    llm_latency: float = 0.05,
+    token_delay: float = 0.005,
+    rag_delay: float = 0.01,
+    script: str = "search",
+    answer_words: int = 40
+) -> Iterator[str]:
+    """
+    Run the service against stand-ins for the LLM, RAG service and backend
+
+    The service's global clients, agent registry and tool executor are
+    replaced for the duration and restored afterwards.
+
+    Args:
+        llm_latency: Seconds each model call takes before responding
+        token_delay: Seconds between streamed answer tokens
+        rag_delay: Seconds added to each RAG query
+        script: Tool-call script of the stand-in model (see SCRIPTS)
+        answer_words: Words in the final answer
+
+    Yields:
+        Base URL of the running service
+    """
+    from main import app
+
+    responder = scripted_responder(SCRIPTS[script], answer_words)
+
+    def build_agent(model_name: str, provider: str) -> SupervisorAgent:
+        llm = FakeChatModel(responder=responder, latency=llm_latency, token_delay=token_delay)
+        return SupervisorAgent(model_name=model_name, provider=provider, llm=llm)
+
+    rag = FakeRagServer(create_fake_rag_app(delay=rag_delay)).start()
+    backend = FakeRagServer(create_fake_backend_app()).start()
+    settings = get_settings()
+    saved_settings = {"RAG_SERVICE_URL": settings.RAG_SERVICE_URL}
+    saved_globals = [
+        (registry_module, "_registry"),
+        (tool_executor_module, "_tool_executor"),
+        (rag_client_module, "_rag_client"),
+        (metrics_backend_module, "_metrics_backend"),
+        (log_backend_module, "_log_backend"),
+        (admission_module, "_admission_controller"),
+    ]
+    saved = [(module, name, getattr(module, name)) for module, name in saved_globals]
+    server = None
+    try:
+        settings.RAG_SERVICE_URL = rag.base_url
+        # Fresh clients and limits; their pools and semaphores bind to the service's event loop
+        registry_module._registry = AgentRegistry(default_provider="fake", default_model="scripted", factory=build_agent)
+        tool_executor_module._tool_executor = None
+        rag_client_module._rag_client = RagClient(base_url=rag.base_url)
+        metrics_backend_module._metrics_backend = MetricsBackendClient(base_url=backend.base_url)
+        log_backend_module._log_backend = LogBackendClient(base_url=backend.base_url)
+        admission_module._admission_controller = None
+        # The runner is not RAG-specific: it serves any ASGI app on a free port
+        server = FakeRagServer(app).start()
+        yield server.base_url
+    finally:
+        if server is not None:
+            server.stop()
+        backend.stop()
+        rag.stop()
+        for module, name, value in saved:
+            setattr(module, name, value)
+        for name, value in saved_settings.items():
+            setattr(settings, name, value)
+
+
+async def _chat(client: httpx.AsyncClient, session_id: str) -> Tuple[float, Optional[float]]:
+    """Send one chat request; returns (latency, None)"""
+    started = time.perf_counter()
+    response = await client.post("/api/agents/chat", json={
+        "message": "Why is checkout restarting?", "session_id": session_id
+    })
+    response.raise_for_status()
+    if "error" in (response.json().get("metadata") or {}):
+        raise RuntimeError(response.json()["response"])
+    return time.perf_counter() - started, None
+
+
+async def _stream(client: httpx.AsyncClient, session_id: str) -> Tuple[float, Optional[float]]:
+    """Send one streaming chat request; returns (latency, time to first content frame)"""
+    started = time.perf_counter()
+    first: Optional[float] = None
+    done = False
+    async with client.stream("POST", "/api/agents/chat/stream", json={
+        "message": "Why is checkout restarting?", "session_id": session_id
+    }) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line == "data: [DONE]":
+                done = True
+            elif first is None and line.startswith("data: ") and json.loads(line[6:])["type"] == "content":
+                first = time.perf_counter() - started
+    if not done:
+        raise RuntimeError("stream ended without [DONE]")
+    return time.perf_counter() - started, first
+
+
+async def drive(
+    base_url: str,
+    endpoint: str = "chat",
+    concurrency: int = 8,
+    requests: int = 200,
+    warmup: int = 0
+) -> LoadResult:
+    """
+    Send requests with a fixed number of concurrent clients
+
+    Args:
+        base_url: Service URL
+        endpoint: "chat" or "stream"
+        concurrency: Requests in flight at any time
+        requests: Measured requests
+        warmup: Unmeasured requests sent first (defaults to the concurrency)
+
+    Returns:
+        LoadResult for the measured requests
+    """
+    send = _stream if endpoint == "stream" else _chat
+    latency = Histogram(window=max(1, requests))
+    ttft = Histogram(window=max(1, requests))
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+        for index in range(warmup or concurrency):
+            await send(client, f"warmup-{endpoint}-{concurrency}-{index}")
+
+        gc.collect()
+        memory_start = rss_bytes()
+        queue: asyncio.Queue = asyncio.Queue()
+        for index in range(requests):
+            queue.put_nowait(index)
+
+        async def worker() -> None:
+            nonlocal errors
+            while not queue.empty():
+                index = queue.get_nowait()
+                try:
+                    elapsed, first = await send(client, f"load-{endpoint}-{concurrency}-{index}")
+                except (httpx.HTTPError, RuntimeError):
+                    errors += 1
+                    continue
+                latency.observe(elapsed)
+                if first is not None:
+                    ttft.observe(first)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        gc.collect()
+        memory_growth = rss_bytes() - memory_start
+
+    streamed = endpoint == "stream"
+    return LoadResult(
+        endpoint=endpoint,
+        concurrency=concurrency,
+        requests=requests,
+        errors=errors,
+        elapsed_seconds=round(elapsed, 3),
+        throughput_rps=round(latency.count / elapsed, 2) if elapsed > 0 else 0.0,
+        p50_ms=_ms(latency.percentile(50)),
+        p95_ms=_ms(latency.percentile(95)),
+        p99_ms=_ms(latency.percentile(99)),
+        ttft_p50_ms=_ms(ttft.percentile(50)) if streamed else None,
+        ttft_p95_ms=_ms(ttft.percentile(95)) if streamed else None,
+        ttft_p99_ms=_ms(ttft.percentile(99)) if streamed else None,
+        memory_start_mb=round(memory_start / 2**20, 1),
+        memory_growth_mb=round(memory_growth / 2**20, 2),
+    )
+
+
+def run(
+    endpoints: Sequence[str] = ("chat", "stream"),
+    concurrency: Sequence[int] = (1, 8, 32),
+    requests: int = 200,
+    **service_options: Any
+) -> List[LoadResult]:
+    """
+    Run the benchmark
+
+    Args:
+        endpoints: Endpoints to drive ("chat", "stream")
+        concurrency: Concurrency levels, each run separately
+        requests: Measured requests per endpoint and concurrency level
+        **service_options: Stand-in behaviour (see service())
+
+    Returns:
+        One LoadResult per endpoint and concurrency level
+    """
+    results = []
+    with service(**service_options) as base_url:
+        for endpoint in endpoints:
+            for level in concurrency:
+                results.append(asyncio.run(drive(base_url, endpoint, level, requests)))
+    return results
+
+
+def check(results: Sequence[LoadResult], max_p95_ms: Optional[float], max_memory_growth_mb: Optional[float]) -> List[str]:
+    """
+    Compare results with regression thresholds
+
+    Returns:
+        One message per violated threshold (empty if all passed)
+    """
+    failures = []
+    for result in results:
+        name = f"{result.endpoint} x{result.concurrency}"
+        if result.errors:
+            failures.append(f"{name}: {result.errors} failed requests")
+        if max_p95_ms is not None and result.p95_ms is not None and result.p95_ms > max_p95_ms:
+            failures.append(f"{name}: p95 {result.p95_ms}ms exceeds {max_p95_ms}ms")
+        if max_memory_growth_mb is not None and result.memory_growth_mb > max_memory_growth_mb:
+            failures.append(f"{name}: memory grew {result.memory_growth_mb}MB, limit {max_memory_growth_mb}MB")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--endpoint", choices=["chat", "stream", "both"], default="both", help="Endpoints to drive")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="Concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per level")
+    parser.add_argument("--script", choices=sorted(SCRIPTS), default="search", help="Tool calls made per turn")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per model call")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="Seconds between streamed tokens")
+    parser.add_argument("--rag-delay", type=float, default=0.01, help="Seconds added to each RAG query")
+    parser.add_argument("--answer-words", type=int, default=40, help="Words in the final answer")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail if any p95 latency exceeds this")
+    parser.add_argument("--max-memory-growth-mb", type=float, help="Fail if memory grows more than this per run")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+    # Per-request client logs would drown the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    results = run(
+        endpoints=["chat", "stream"] if args.endpoint == "both" else [args.endpoint],
+        concurrency=args.concurrency,
+        requests=args.requests,
+        llm_latency=args.llm_latency,
+        token_delay=args.token_delay,
+        rag_delay=args.rag_delay,
+        script=args.script,
+        answer_words=args.answer_words,
+    )
+
+    if args.json:
+        print(json.dumps([asdict(result) for result in results], indent=2))
+    else:
+        def cell(value: Optional[float]) -> str:
+            return "-" if value is None else f"{value:g}"
+
+        print(
+            f"{'endpoint':>8} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'ttft p50':>9} {'ttft p95':>9} {'errors':>7} {'mem +MB':>8}"
+        )
+        for r in results:
+            print(
+                f"{r.endpoint:>8} {r.concurrency:>5} {r.throughput_rps:>8g} {cell(r.p50_ms):>8} {cell(r.p95_ms):>8} "
+                f"{cell(r.p99_ms):>8} {cell(r.ttft_p50_ms):>9} {cell(r.ttft_p95_ms):>9} {r.errors:>7} "
+                f"{r.memory_growth_mb:>8g}"
+            )
+
+    failures = check(results, args.max_p95_ms, args.max_memory_growth_mb)
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
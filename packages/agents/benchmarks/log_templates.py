@@ -0,0 +1,118 @@
+"""
+Log template mining throughput benchmark.
+
+Measures how many lines per second the template miner and the full
+parse-and-mine path handle, and how far a window of log lines is
+compressed. Run with ``python -m benchmarks.log_templates [--lines N]``.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timezone
+from typing import List
+
+from services.log_backend import parse_line
+from services.log_templates import TemplateMiner, format_templates
+
+TEMPLATES = [
+    ("ERROR", "Connection timeout to database server db-{n3} after {ms}ms"),
+    ("ERROR", "Failed to process message {hex}: NullPointerException at OrderService.java:{n3}"),
+    ("ERROR", "API request to http://payments:8080/charge failed with status 503 (request id {uuid})"),
+    ("ERROR", "Liveness probe failed: HTTP probe failed with statuscode: 500"),
+    ("ERROR", "OOMKilled: container checkout-{hex6} exceeded memory limit of {mb}Mi"),
+    ("WARN", "High memory usage detected: {pct}%"),
+    ("WARN", "Slow query took {ms}ms: SELECT * FROM orders WHERE customer_id = {n}"),
+    ("WARN", "Retrying failed operation (attempt {attempt}/5)"),
+    ("WARN", "Connection pool exhausted, {n3} requests waiting"),
+    ("INFO", "GET /api/orders/{n} 200 {ms}ms"),
+    ("INFO", "POST /api/cart/{n}/items 201 {ms}ms"),
+    ("INFO", "User {n} logged in from {ip}"),
+    ("INFO", "Cache hit ratio {pct}% over last {n3} requests"),
+    ("INFO", "Scheduled job cleanup-sessions finished in {ms}ms, removed {n3} sessions"),
+    ("DEBUG", "Span {hex} finished: duration={ms}ms status=ok"),
+]
+
+
+def generate_lines(count: int, seed: int = 7) -> List[str]:
+    """Synthetic text log lines drawn from a fixed set of templates"""
+    rng = random.Random(seed)
+    start = datetime(2024, 12, 2, 7, 0, tzinfo=timezone.utc).timestamp()
+    lines = []
+    for index in range(count):
+        level, template = rng.choice(TEMPLATES)
+        message = template.format(
+            n=rng.randint(1, 999_999),
+            n3=rng.randint(0, 999),
+            ms=rng.randint(1, 30_000),
+            pct=rng.randint(50, 99),
+            mb=rng.choice([256, 512, 1024]),
+            attempt=rng.randint(1, 5),
+            hex=f"{rng.getrandbits(48):012x}",
+            hex6=f"{rng.getrandbits(24):06x}",
+            uuid=f"{rng.getrandbits(32):08x}-{rng.getrandbits(16):04x}-{rng.getrandbits(16):04x}-"
+                 f"{rng.getrandbits(16):04x}-{rng.getrandbits(48):012x}",
+            ip=f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+        )
+        when = datetime.fromtimestamp(start + index * 0.5, tz=timezone.utc)
+        lines.append(f"{when.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]} [{level}] {message}")
+    return lines
+
+
+def run(lines: int = 5000, repeat: int = 5) -> dict:
+    """
+    Run the benchmark
+
+    Args:
+        lines: Log lines per window
+        repeat: Timed repetitions; the best run is reported
+
+    Returns:
+        Dictionary with lines/sec for mining and parse+mine, and compression figures
+    """
+    raw = generate_lines(lines)
+    entries = [parse_line(line) for line in raw]
+
+    mine_best = parse_best = float("inf")
+    miner = TemplateMiner()
+    for _ in range(repeat):
+        miner = TemplateMiner()
+        started = time.perf_counter()
+        for entry in entries:
+            miner.add_entry(entry)
+        mine_best = min(mine_best, time.perf_counter() - started)
+
+        parsed_miner = TemplateMiner()
+        started = time.perf_counter()
+        for line in raw:
+            parsed_miner.add_entry(parse_line(line))
+        parse_best = min(parse_best, time.perf_counter() - started)
+
+    output = format_templates(miner)
+    return {
+        "lines": lines,
+        "templates": len(miner.templates),
+        "mine_lines_per_sec": round(lines / mine_best),
+        "parse_and_mine_lines_per_sec": round(lines / parse_best),
+        "input_chars": sum(len(line) for line in raw),
+        "output_chars": len(output),
+        "output_lines": output.count("\n") + 1,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, nargs="+", default=[5000, 50000], help="Window sizes to benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per size")
+    args = parser.parse_args()
+
+    print(f"{'lines':>8} {'templates':>9} {'mine l/s':>10} {'parse+mine l/s':>15} {'in chars':>10} {'out chars':>10}")
+    for count in args.lines:
+        result = run(count, args.repeat)
+        print(
+            f"{result['lines']:>8} {result['templates']:>9} {result['mine_lines_per_sec']:>10} "
+            f"{result['parse_and_mine_lines_per_sec']:>15} {result['input_chars']:>10} {result['output_chars']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
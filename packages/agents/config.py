@@ -31,14 +31,175 @@ class Settings:
     ANTHROPIC_API_KEY: Optional[str] = os.getenv("ANTHROPIC_API_KEY")
     GEMINI_API_KEY: Optional[str] = os.getenv("GEMINI_API_KEY")
     
+    # Agent models; requests may select the default or an allowed "provider:model"
+    AGENT_DEFAULT_PROVIDER: str = os.getenv("AGENT_DEFAULT_PROVIDER", "openai")
+    AGENT_DEFAULT_MODEL: str = os.getenv("AGENT_DEFAULT_MODEL", "gpt-4o-mini")
+    AGENT_ALLOWED_MODELS: str = os.getenv("AGENT_ALLOWED_MODELS", "")
+    AGENT_MAX_INSTANCES: int = int(os.getenv("AGENT_MAX_INSTANCES", "8"))
+    AGENT_IDLE_TTL: float = float(os.getenv("AGENT_IDLE_TTL", "900"))
+    
+    # Tiered model cascade for the default agent: escalate to the large model on low confidence
+    CASCADE_ENABLED: bool = os.getenv("CASCADE_ENABLED", "false").lower() == "true"
+    CASCADE_LARGE_PROVIDER: str = os.getenv("CASCADE_LARGE_PROVIDER", "")
+    CASCADE_LARGE_MODEL: str = os.getenv("CASCADE_LARGE_MODEL", "gpt-4o")
+    CASCADE_MAX_TOOL_ROUNDS: int = int(os.getenv("CASCADE_MAX_TOOL_ROUNDS", "3"))
+    CASCADE_UNCERTAINTY_MARKERS: str = os.getenv(
+        "CASCADE_UNCERTAINTY_MARKERS",
+        "i'm not sure,i am not sure,i don't know,i do not know,unable to determine,cannot determine"
+    )
+    CASCADE_EMPTY_RESULT_MARKERS: str = os.getenv(
+        "CASCADE_EMPTY_RESULT_MARKERS", "no relevant,no similar,no results"
+    )
+    
+    # Client-side LLM rate limits per provider/model (0 disables a limit). There are no
+    # default limits: set them from the provider account's quotas. Overrides are
+    # "provider:model=value" or "provider=value" pairs, e.g. "anthropic=50,openai:gpt-4o=5000"
+    LLM_RATE_LIMIT_ENABLED: bool = os.getenv("LLM_RATE_LIMIT_ENABLED", "false").lower() == "true"
+    LLM_RPM_LIMIT: float = float(os.getenv("LLM_RPM_LIMIT", "0"))
+    LLM_TPM_LIMIT: float = float(os.getenv("LLM_TPM_LIMIT", "0"))
+    LLM_RPM_LIMITS: str = os.getenv("LLM_RPM_LIMITS", "")
+    LLM_TPM_LIMITS: str = os.getenv("LLM_TPM_LIMITS", "")
+    # Output tokens reserved for a call when the model sets no max_tokens
+    LLM_RATE_LIMIT_OUTPUT_TOKENS: int = int(os.getenv("LLM_RATE_LIMIT_OUTPUT_TOKENS", "512"))
+    
+    # Admission control for chat requests
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "32"))
+    # Requests waiting for a slot beyond this are rejected with 429
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+    # Queued requests not admitted within this are rejected with 503
+    ADMISSION_QUEUE_TIMEOUT_MS: int = int(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "2000"))
+    # Extra slots for active-incident requests, which also skip the normal queue
+    ADMISSION_PRIORITY_EXTRA: int = int(os.getenv("ADMISSION_PRIORITY_EXTRA", "8"))
+    # Normal requests are shed with 503 while event loop lag exceeds this (0 disables). Off by
+    # default: one slow synchronous step would otherwise shed healthy traffic
+    ADMISSION_MAX_LOOP_LAG_MS: int = int(os.getenv("ADMISSION_MAX_LOOP_LAG_MS", "0"))
+    ADMISSION_LAG_CHECK_INTERVAL_MS: int = int(os.getenv("ADMISSION_LAG_CHECK_INTERVAL_MS", "100"))
+    
+    # Tool execution limits; overrides are "tool=value" pairs, e.g. "query_logs=20,check_metrics=10"
+    TOOL_DEFAULT_TIMEOUT: float = float(os.getenv("TOOL_DEFAULT_TIMEOUT", "30"))
+    TOOL_DEFAULT_CONCURRENCY: int = int(os.getenv("TOOL_DEFAULT_CONCURRENCY", "8"))
+    TOOL_TIMEOUTS: str = os.getenv("TOOL_TIMEOUTS", "")
+    TOOL_CONCURRENCY: str = os.getenv("TOOL_CONCURRENCY", "")
+    
+    # Token budgets for RAG tool output (estimated tokens)
+    TOOL_OUTPUT_TOKEN_BUDGET: int = int(os.getenv("TOOL_OUTPUT_TOKEN_BUDGET", "1200"))
+    # Per-tool overrides, e.g. "search_incident_logs=800,retrieve_context=1000"
+    TOOL_OUTPUT_TOKEN_BUDGETS: str = os.getenv("TOOL_OUTPUT_TOKEN_BUDGETS", "")
+    # Word-shingle overlap at which a lower-scoring result counts as a near-duplicate
+    TOOL_OUTPUT_DUPLICATE_THRESHOLD: float = float(os.getenv("TOOL_OUTPUT_DUPLICATE_THRESHOLD", "0.8"))
+    
+    # Request deadlines; a request's budget_ms overrides the default (0 means no deadline)
+    DEADLINE_DEFAULT_MS: int = int(os.getenv("DEADLINE_DEFAULT_MS", "0"))
+    # Below this much time left, no new tool rounds start and a best-effort answer is produced
+    DEADLINE_ANSWER_RESERVE_MS: int = int(os.getenv("DEADLINE_ANSWER_RESERVE_MS", "4000"))
+    # Below this much time left, the best-effort answer is built without an LLM call
+    DEADLINE_MIN_LLM_MS: int = int(os.getenv("DEADLINE_MIN_LLM_MS", "1000"))
+    
+    # Speculative RAG searches on the user's question, run alongside the first model call
+    PREFETCH_ENABLED: bool = os.getenv("PREFETCH_ENABLED", "false").lower() == "true"
+    PREFETCH_TOOLS: str = os.getenv("PREFETCH_TOOLS", "search_documentation,search_incident_logs")
+    # Minimum word overlap between the model's query and the question for a prefetch to be used
+    PREFETCH_MATCH_THRESHOLD: float = float(os.getenv("PREFETCH_MATCH_THRESHOLD", "0.5"))
+    
     # External Services
     RAG_SERVICE_URL: Optional[str] = os.getenv("RAG_SERVICE_URL")
     RAG_SERVICE_API_KEY: Optional[str] = os.getenv("RAG_SERVICE_API_KEY")
     RAG_SERVICE_TIMEOUT: int = int(os.getenv("RAG_SERVICE_TIMEOUT", "30000"))
+    # Node.js backend serving metrics and logs
+    BACKEND_URL: str = os.getenv("BACKEND_URL", "http://localhost:3000")
+    
+    # Metrics backend
+    METRICS_BACKEND_URL: str = os.getenv("METRICS_BACKEND_URL", BACKEND_URL)
+    METRICS_BACKEND_TIMEOUT: int = int(os.getenv("METRICS_BACKEND_TIMEOUT", "10000"))
+    # Buckets in the downsampled series passed to the LLM per metric
+    METRICS_SUMMARY_POINTS: int = int(os.getenv("METRICS_SUMMARY_POINTS", "12"))
+    
+    # Log backend (streamed log queries)
+    LOG_BACKEND_URL: str = os.getenv("LOG_BACKEND_URL", BACKEND_URL)
+    LOG_BACKEND_TIMEOUT: int = int(os.getenv("LOG_BACKEND_TIMEOUT", "30000"))
+    # Length returned log messages are truncated to
+    LOG_MAX_LINE_CHARS: int = int(os.getenv("LOG_MAX_LINE_CHARS", "1000"))
+    # Group matching log lines into templates when there are more than max_lines
+    LOG_TEMPLATES_ENABLED: bool = os.getenv("LOG_TEMPLATES_ENABLED", "true").lower() == "true"
+    # Matching lines read into the template miner per query
+    LOG_TEMPLATE_SCAN_LINES: int = int(os.getenv("LOG_TEMPLATE_SCAN_LINES", "5000"))
+    LOG_TEMPLATE_MAX_TEMPLATES: int = int(os.getenv("LOG_TEMPLATE_MAX_TEMPLATES", "30"))
+    LOG_TEMPLATE_SIMILARITY: float = float(os.getenv("LOG_TEMPLATE_SIMILARITY", "0.5"))
+    
+    # analyze_health fan-out: per-source timeouts in seconds
+    HEALTH_METRICS_TIMEOUT: float = float(os.getenv("HEALTH_METRICS_TIMEOUT", "5"))
+    HEALTH_LOGS_TIMEOUT: float = float(os.getenv("HEALTH_LOGS_TIMEOUT", "8"))
+    HEALTH_INCIDENTS_TIMEOUT: float = float(os.getenv("HEALTH_INCIDENTS_TIMEOUT", "5"))
+    # p95 utilization (%) reported as degraded / critical
+    HEALTH_WARNING_PERCENT: float = float(os.getenv("HEALTH_WARNING_PERCENT", "80"))
+    HEALTH_CRITICAL_PERCENT: float = float(os.getenv("HEALTH_CRITICAL_PERCENT", "90"))
+    
+    # RAG HTTP connection pool
+    RAG_HTTP_MAX_CONNECTIONS: int = int(os.getenv("RAG_HTTP_MAX_CONNECTIONS", "100"))
+    RAG_HTTP_MAX_KEEPALIVE: int = int(os.getenv("RAG_HTTP_MAX_KEEPALIVE", "20"))
+    RAG_HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("RAG_HTTP_KEEPALIVE_EXPIRY", "30"))
+    RAG_HTTP2: bool = os.getenv("RAG_HTTP2", "false").lower() == "true"
+    
+    # RAG query result cache
+    RAG_CACHE_ENABLED: bool = os.getenv("RAG_CACHE_ENABLED", "true").lower() == "true"
+    RAG_CACHE_MAX_SIZE: int = int(os.getenv("RAG_CACHE_MAX_SIZE", "512"))
+    RAG_CACHE_TTL: float = float(os.getenv("RAG_CACHE_TTL", "60"))
+    # Per-namespace TTL overrides in seconds, e.g. "incidents=30,docs=600"
+    RAG_CACHE_NAMESPACE_TTLS: str = os.getenv("RAG_CACHE_NAMESPACE_TTLS", "")
+    # How often (seconds) to check the index's last_updated for invalidation; 0 disables
+    RAG_CACHE_INDEX_CHECK_INTERVAL: float = float(os.getenv("RAG_CACHE_INDEX_CHECK_INTERVAL", "30"))
+    # Share one upstream request between concurrent identical queries
+    RAG_COALESCE_ENABLED: bool = os.getenv("RAG_COALESCE_ENABLED", "true").lower() == "true"
+    # Batched multi-query requests (falls back to parallel queries if unsupported)
+    RAG_BATCH_ENABLED: bool = os.getenv("RAG_BATCH_ENABLED", "true").lower() == "true"
+    RAG_BATCH_MAX_CONCURRENCY: int = int(os.getenv("RAG_BATCH_MAX_CONCURRENCY", "8"))
+    
+    # Conversation session storage
+    SESSION_MAX_RESIDENT: int = int(os.getenv("SESSION_MAX_RESIDENT", "1000"))
+    SESSION_MAX_MEMORY_MB: int = int(os.getenv("SESSION_MAX_MEMORY_MB", "256"))
+    SESSION_IDLE_TTL: float = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+    # SQLite file for sessions evicted from memory; empty discards them
+    SESSION_SPILL_PATH: str = os.getenv("SESSION_SPILL_PATH", "sessions.sqlite3")
+    
+    # Conversation compaction
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "12000"))
+    CONTEXT_KEEP_TURNS: int = int(os.getenv("CONTEXT_KEEP_TURNS", "2"))
+    CONTEXT_TOOL_RESULT_CHARS: int = int(os.getenv("CONTEXT_TOOL_RESULT_CHARS", "600"))
+    # "extractive" (no LLM call) or "llm"
+    CONTEXT_SUMMARY_MODE: str = os.getenv("CONTEXT_SUMMARY_MODE", "extractive")
+    # Share of the token budget the running summary of compacted turns may use
+    CONTEXT_SUMMARY_SHARE: float = float(os.getenv("CONTEXT_SUMMARY_SHARE", "0.25"))
+    
+    # Exact-match answer cache for repeated questions (opt-in)
+    ANSWER_CACHE_ENABLED: bool = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+    ANSWER_CACHE_TTL: float = float(os.getenv("ANSWER_CACHE_TTL", "300"))
+    ANSWER_CACHE_MAX_SIZE: int = int(os.getenv("ANSWER_CACHE_MAX_SIZE", "256"))
+    
+    # Streaming (SSE) defaults, overridable per request
+    STREAM_FLUSH_INTERVAL_MS: int = int(os.getenv("STREAM_FLUSH_INTERVAL_MS", "50"))
+    STREAM_MAX_BUFFER_CHARS: int = int(os.getenv("STREAM_MAX_BUFFER_CHARS", "512"))
+    STREAM_HEARTBEAT_INTERVAL_MS: int = int(os.getenv("STREAM_HEARTBEAT_INTERVAL_MS", "15000"))
+    STREAM_DISCONNECT_POLL_MS: int = int(os.getenv("STREAM_DISCONNECT_POLL_MS", "250"))
     
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     
+    # Prometheus metrics endpoint (GET /metrics)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    
+    # Request tracing (spans per request, graph node, tool call and RAG request)
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+    # Comma-separated exporters: "jsonl", "log" or "package.module:factory"; traces are always kept in memory
+    TRACING_EXPORTERS: str = os.getenv("TRACING_EXPORTERS", "")
+    TRACING_JSONL_PATH: str = os.getenv("TRACING_JSONL_PATH", "traces.jsonl")
+    # Size at which the JSON-lines file is rotated to "<path>.1" (0 disables rotation)
+    TRACING_JSONL_MAX_BYTES: int = int(os.getenv("TRACING_JSONL_MAX_BYTES", "52428800"))
+    # Recent traces kept in memory for GET /api/agents/traces/{trace_id}
+    TRACING_MAX_TRACES: int = int(os.getenv("TRACING_MAX_TRACES", "200"))
+    # Paths not traced, e.g. probes and scrapes
+    TRACING_EXCLUDE_PATHS: str = os.getenv("TRACING_EXCLUDE_PATHS", "/health,/health/ready,/health/live,/metrics")
+    
     @property
     def is_development(self) -> bool:
         """Check if running in development mode."""
@@ -3,12 +3,20 @@ Synapse Agents Service - FastAPI application for hosting LangGraph agents.
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import logging
 from datetime import datetime
 
+from agents.checkpointer import close_checkpointer
+from agents.registry import close_agent_registry, get_agent_registry
 from config import get_settings
 from routes import health, agents
+from services.admission import close_admission_controller
+from services.log_backend import close_log_backend
+from services.metrics_backend import close_metrics_backend
+from services.prometheus import CONTENT_TYPE, PrometheusMiddleware, get_metrics_registry, route_template
+from services.rag_client import get_rag_client, close_rag_client
+from services.tracing import TracingMiddleware, close_tracer
 
 # Configure logging
 logging.basicConfig(
@@ -36,6 +44,15 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if settings.TRACING_ENABLED:
+    app.add_middleware(
+        TracingMiddleware,
+        exclude_paths=[path.strip() for path in settings.TRACING_EXCLUDE_PATHS.split(",") if path.strip()],
+        route_template=route_template
+    )
+if settings.METRICS_ENABLED:
+    # Outermost, so the recorded latency covers the whole middleware stack
+    app.add_middleware(PrometheusMiddleware)
 
 # Include routers
 app.include_router(health.router, prefix="/health", tags=["health"])
@@ -53,18 +70,37 @@ async def root():
     }
 
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus metrics endpoint."""
+        return Response(content=get_metrics_registry().render(), media_type=CONTENT_TYPE)
+
+
 @app.on_event("startup")
 async def startup_event():
     """Application startup event."""
     logger.info(f"Starting {settings.SERVICE_NAME}")
     logger.info(f"Environment: {settings.ENVIRONMENT}")
     logger.info(f"Port: {settings.PORT}")
+    
+    # Open the shared RAG connection pool so tool calls reuse warm connections
+    await get_rag_client().start()
+    # Free idle per-model agents even when no requests arrive
+    await get_agent_registry().start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Application shutdown event."""
     logger.info(f"Shutting down {settings.SERVICE_NAME}")
+    await close_rag_client()
+    await close_metrics_backend()
+    await close_log_backend()
+    await close_admission_controller()
+    await close_agent_registry()
+    await close_checkpointer()
+    close_tracer()
 
 
 if __name__ == "__main__":
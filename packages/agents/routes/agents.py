@@ -1,10 +1,20 @@
 """
 Agent interaction endpoints.
 """
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from pydantic import BaseModel
+import asyncio
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
-from agents import get_agent
+from agents import get_agent, get_agent_registry, get_checkpointer
+from agents.answer_cache import get_answer_cache
+from agents.tool_executor import get_tool_executor
+from config import get_settings
+from services.admission import AdmissionRejected, Ticket, get_admission_controller
+from services.llm_rate_limiter import get_llm_rate_limiter
+from services.rag_client import get_rag_client
+from services.result_packer import get_result_packer
+from services.streaming import StreamOptions, get_stream_stats, stream_sse
+from services.tracing import build_waterfall, get_tracer
 
 router = APIRouter()
 
@@ -14,6 +24,49 @@ class ChatRequest(BaseModel):
     message: str
     session_id: Optional[str] = "default"
     context: Optional[Dict[str, Any]] = None
+    # Optional model selection (defaults to the configured default model)
+    provider: Optional[str] = None
+    model: Optional[str] = None
+    # Latency budget for the whole request (defaults to DEADLINE_DEFAULT_MS)
+    budget_ms: Optional[int] = Field(default=None, gt=0)
+    # Skip the answer cache and force a fresh agent run
+    bypass_cache: bool = False
+    # Session is handling an active incident: admitted ahead of other requests under load
+    active_incident: bool = False
+    stream_options: Optional[StreamOptions] = None
+
+
+def _select_agent(request: ChatRequest):
+    """Get the agent for the model selected by a request"""
+    # Unknown models and unconfigured providers are client errors
+    try:
+        return get_agent(model_name=request.model, provider=request.provider)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _admit(request: ChatRequest) -> Optional[Ticket]:
+    """Wait for an agent run slot, rejecting the request with 429/503 under overload"""
+    if not get_settings().ADMISSION_ENABLED:
+        return None
+    try:
+        return await get_admission_controller().acquire(priority=request.active_incident)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=f"Agent service overloaded: {e}",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+
+async def _release_after(events, ticket: Optional[Ticket]):
+    """Yield the stream's frames, holding the admission slot until it ends"""
+    try:
+        async for frame in events:
+            yield frame
+    finally:
+        if ticket is not None:
+            ticket.release()
 
 
 class ChatResponse(BaseModel):
@@ -32,13 +85,20 @@ async def chat(request: ChatRequest) -> ChatResponse:
     using available tools (RAG, metrics, logs).
     """
     try:
-        agent = get_agent()
+        agent = _select_agent(request)
+        ticket = await _admit(request)
         
-        result = await agent.chat(
-            message=request.message,
-            session_id=request.session_id,
-            context=request.context
-        )
+        try:
+            result = await agent.chat(
+                message=request.message,
+                session_id=request.session_id,
+                context=request.context,
+                bypass_cache=request.bypass_cache,
+                budget_ms=request.budget_ms
+            )
+        finally:
+            if ticket is not None:
+                ticket.release()
         
         return ChatResponse(
             response=result["response"],
@@ -46,6 +106,8 @@ async def chat(request: ChatRequest) -> ChatResponse:
             metadata=result.get("metadata")
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -54,27 +116,38 @@ async def chat(request: ChatRequest) -> ChatResponse:
 
 
 from fastapi.responses import StreamingResponse
-import json
+from starlette.background import BackgroundTask
+
 
 @router.post("/chat/stream")
-async def chat_stream(request: ChatRequest):
+async def chat_stream(request: ChatRequest, http_request: Request):
     """
     Stream chat response from the agent.
+    
+    The agent run is cancelled if the client disconnects before it finishes.
     """
     try:
-        agent = get_agent()
+        agent = _select_agent(request)
+        # Admitted before the response starts, so rejections get a proper status code
+        ticket = await _admit(request)
         
-        async def event_generator():
-            async for event in agent.stream_chat(
-                message=request.message,
-                session_id=request.session_id,
-                context=request.context
-            ):
-                yield f"data: {json.dumps(event)}\n\n"
-            yield "data: [DONE]\n\n"
+        events = agent.stream_chat(
+            message=request.message,
+            session_id=request.session_id,
+            context=request.context,
+            budget_ms=request.budget_ms
+        )
+        event_generator = stream_sse(events, http_request.is_disconnected, request.stream_options)
 
-        return StreamingResponse(event_generator(), media_type="text/event-stream")
+        return StreamingResponse(
+            _release_after(event_generator, ticket),
+            media_type="text/event-stream",
+            # Also releases the slot if the stream never started (release is idempotent)
+            background=BackgroundTask(ticket.release) if ticket is not None else None
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -82,6 +155,46 @@ async def chat_stream(request: ChatRequest):
         )
 
 
+@router.get("/stats")
+async def agent_stats():
+    """
+    Get runtime statistics for the agent service and its dependencies.
+    """
+    return {
+        "rag": get_rag_client().get_stats(),
+        "answer_cache": get_answer_cache().get_stats(),
+        "agents": get_agent_registry().get_stats(),
+        "tools": get_tool_executor().get_stats(),
+        "tool_output": get_result_packer().get_stats(),
+        "streams": get_stream_stats().get_stats(),
+        "admission": get_admission_controller().get_stats(),
+        "llm_rate_limits": get_llm_rate_limiter().get_stats()
+    }
+
+
+@router.get("/sessions")
+async def agent_sessions():
+    """
+    Get resident and spilled conversation sessions with their byte footprint.
+    """
+    return get_checkpointer().get_stats()
+
+
+@router.get("/traces/{trace_id}")
+async def agent_trace(trace_id: str):
+    """
+    Get the span waterfall of a traced request.
+    
+    The trace id is returned in the X-Trace-Id response header, or taken from
+    the caller's traceparent header.
+    """
+    # Older traces are read back from exporter files, off the event loop
+    spans = await asyncio.to_thread(get_tracer().get_trace, trace_id.lower())
+    if not spans:
+        raise HTTPException(status_code=404, detail=f"Trace {trace_id} not found")
+    return build_waterfall(trace_id.lower(), spans)
+
+
 @router.get("/status")
 async def agent_status():
     """
@@ -0,0 +1,288 @@
+"""
+Admission Control
+
+This module bounds how many agent runs execute at once. Requests beyond
+the in-flight limit wait in a short FIFO queue; when the queue is full they
+are rejected at once with 429, and when they wait too long or the event loop
+is lagging they are shed with 503, both with a Retry-After hint, so callers
+fail fast instead of every request slowing down until the proxy times out.
+Requests for sessions with an active incident use a priority lane: they get
+extra slots above the limit, are served before the normal queue and are
+never shed for loop lag.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from config import get_settings
+from services.prometheus import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+_registry = get_metrics_registry()
+ADMISSION_REJECTED = _registry.counter(
+    "agents_admission_rejected_total",
+    "Chat requests rejected by admission control by reason (queue_full, queue_timeout, loop_lag)",
+    ("reason",)
+)
+ADMISSION_WAIT = _registry.histogram(
+    "agents_admission_wait_seconds",
+    "Time admitted chat requests waited for a slot",
+    ("lane",)
+)
+ADMISSION_IN_FLIGHT = _registry.gauge("agents_admission_in_flight", "Agent runs currently admitted")
+ADMISSION_QUEUED = _registry.gauge("agents_admission_queued", "Chat requests waiting for a slot")
+EVENT_LOOP_LAG = _registry.gauge("agents_event_loop_lag_seconds", "Most recently measured event loop lag")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """An admitted request's slot; release it when the run ends"""
+
+    __slots__ = ("_controller", "_started", "_released")
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        """Free the slot (safe to call more than once)"""
+        if not self._released:
+            self._released = True
+            self._controller._release(time.monotonic() - self._started)
+
+
+class AdmissionController:
+    """
+    Bounded in-flight limit with a wait queue, loop-lag shedding and a priority lane
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 32,
+        max_queue: int = 64,
+        queue_timeout: float = 2.0,
+        priority_extra: int = 8,
+        max_loop_lag: float = 0.2,
+        lag_check_interval: float = 0.1
+    ):
+        """
+        Initialize the controller
+
+        Args:
+            max_in_flight: Agent runs executing at once
+            max_queue: Requests allowed to wait for a slot; more are rejected with 429
+            queue_timeout: Seconds a request waits before it is shed with 503
+            priority_extra: Slots above the limit usable only by priority requests
+            max_loop_lag: Event loop lag (seconds) above which normal requests are shed (0 disables)
+            lag_check_interval: Seconds between event loop lag measurements
+        """
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.priority_extra = max(0, priority_extra)
+        self.max_loop_lag = max_loop_lag
+        self.lag_check_interval = lag_check_interval
+        self.in_flight = 0
+        self.loop_lag = 0.0
+        self._normal: Deque[asyncio.Future] = deque()
+        self._priority: Deque[asyncio.Future] = deque()
+        self._monitor: Optional[asyncio.Task] = None
+        # Moving average of run duration, used for Retry-After hints
+        self._avg_duration = 1.0
+        self._admitted = 0
+        self._priority_admitted = 0
+        self._queued_total = 0
+        self._rejected: Dict[str, int] = {"queue_full": 0, "queue_timeout": 0, "loop_lag": 0}
+        ADMISSION_IN_FLIGHT.set_function(lambda: self.in_flight)
+        ADMISSION_QUEUED.set_function(lambda: len(self._normal) + len(self._priority))
+        EVENT_LOOP_LAG.set_function(lambda: self.loop_lag)
+
+    @property
+    def queued(self) -> int:
+        return len(self._normal) + len(self._priority)
+
+    def _ensure_monitor(self) -> None:
+        """Start the loop lag monitor on the running loop if it is not running there"""
+        if self.max_loop_lag <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        if self._monitor is None or self._monitor.done() or self._monitor.get_loop() is not loop:
+            self.loop_lag = 0.0
+            self._monitor = loop.create_task(self._monitor_lag())
+
+    async def _monitor_lag(self) -> None:
+        """Measure how late the loop wakes a sleeping task"""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.lag_check_interval
+            await asyncio.sleep(self.lag_check_interval)
+            self.loop_lag = max(0.0, loop.time() - expected)
+
+    async def aclose(self) -> None:
+        """Stop the loop lag monitor"""
+        if self._monitor is not None and not self._monitor.done():
+            self._monitor.cancel()
+            try:
+                await self._monitor
+            except asyncio.CancelledError:
+                pass
+        self._monitor = None
+
+    def _retry_after(self) -> int:
+        """Seconds until a slot is likely to be free, for the Retry-After header"""
+        waves = (self.queued + 1) / self.max_in_flight
+        return max(1, min(60, math.ceil(waves * self._avg_duration)))
+
+    def _reject(self, status_code: int, reason: str, message: str) -> AdmissionRejected:
+        self._rejected[reason] += 1
+        ADMISSION_REJECTED.labels(reason).inc()
+        logger.warning(f"Rejected chat request ({reason}): {message}")
+        return AdmissionRejected(status_code, reason, self._retry_after(), message)
+
+    def _admit(self, priority: bool, waited: float) -> Ticket:
+        self.in_flight += 1
+        self._admitted += 1
+        if priority:
+            self._priority_admitted += 1
+        ADMISSION_WAIT.labels("priority" if priority else "normal").observe(waited)
+        return Ticket(self)
+
+    async def acquire(self, priority: bool = False) -> Ticket:
+        """
+        Wait for a slot
+
+        Args:
+            priority: Request belongs to an active-incident session
+
+        Returns:
+            Ticket to release when the agent run ends
+
+        Raises:
+            AdmissionRejected: 429 if the queue is full, 503 if the request
+                waited too long or the event loop is lagging
+        """
+        self._ensure_monitor()
+        if priority:
+            if self.in_flight < self.max_in_flight + self.priority_extra and not self._priority:
+                return self._admit(True, 0.0)
+            queue = self._priority
+        else:
+            if self.max_loop_lag > 0 and self.loop_lag > self.max_loop_lag:
+                raise self._reject(503, "loop_lag", f"event loop lag {self.loop_lag * 1000:.0f}ms")
+            if self.in_flight < self.max_in_flight and not self.queued:
+                return self._admit(False, 0.0)
+            if len(self._normal) >= self.max_queue:
+                raise self._reject(429, "queue_full", f"{self.in_flight} runs in flight and {len(self._normal)} queued")
+            queue = self._normal
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        self._queued_total += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout if self.queue_timeout > 0 else None)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over as the wait ended; pass it on
+                self.in_flight -= 1
+                self._wake()
+            else:
+                waiter.cancel()
+                try:
+                    queue.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self._reject(503, "queue_timeout", f"no slot within {self.queue_timeout:.3g}s")
+        # in_flight was incremented by the releasing request
+        self.in_flight -= 1
+        return self._admit(queue is self._priority, time.monotonic() - started)
+
+    def _release(self, duration: float) -> None:
+        self.in_flight -= 1
+        self._avg_duration += 0.1 * (duration - self._avg_duration)
+        self._wake()
+
+    def _wake(self) -> None:
+        """Hand free slots to waiting requests, priority lane first"""
+        while self._priority and self.in_flight < self.max_in_flight + self.priority_extra:
+            self._hand_over(self._priority.popleft())
+        while self._normal and self.in_flight < self.max_in_flight:
+            self._hand_over(self._normal.popleft())
+
+    def _hand_over(self, waiter: asyncio.Future) -> None:
+        # Waiters that gave up are skipped; the slot is counted for the waiter until it resumes
+        if not waiter.done():
+            self.in_flight += 1
+            waiter.set_result(True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get admission statistics
+
+        Returns:
+            Dictionary with limits, current load, loop lag and rejection counts
+        """
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "priority_extra": self.priority_extra,
+            "in_flight": self.in_flight,
+            "queued": len(self._normal),
+            "priority_queued": len(self._priority),
+            "loop_lag_ms": round(self.loop_lag * 1000, 2),
+            "admitted": self._admitted,
+            "priority_admitted": self._priority_admitted,
+            "queued_total": self._queued_total,
+            "rejected": dict(self._rejected),
+            "avg_run_seconds": round(self._avg_duration, 3),
+        }
+
+
+# Global admission controller
+_admission_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Get or create the global admission controller
+
+    Returns:
+        AdmissionController configured from settings
+    """
+    global _admission_controller
+    if _admission_controller is None:
+        settings = get_settings()
+        _admission_controller = AdmissionController(
+            max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+            max_queue=settings.ADMISSION_MAX_QUEUE,
+            queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_MS / 1000.0,
+            priority_extra=settings.ADMISSION_PRIORITY_EXTRA,
+            max_loop_lag=settings.ADMISSION_MAX_LOOP_LAG_MS / 1000.0,
+            lag_check_interval=settings.ADMISSION_LAG_CHECK_INTERVAL_MS / 1000.0
+        )
+    return _admission_controller
+
+
+async def close_admission_controller() -> None:
+    """
+    Stop the global admission controller's loop lag monitor, if it was created
+    """
+    if _admission_controller is not None:
+        await _admission_controller.aclose()
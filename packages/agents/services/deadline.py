@@ -0,0 +1,130 @@
+"""
+Request deadlines
+
+This module tracks the latency budget of the request being served. The
+deadline is carried in a context variable so the agent graph, tools and the
+RAG client can cap their own timeouts to the time that is left.
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when work cannot finish within the request deadline"""
+
+
+class Deadline:
+    """A point in time by which the current request must be answered"""
+
+    __slots__ = ("budget", "expires_at")
+
+    def __init__(self, budget: float):
+        """
+        Initialize the deadline
+
+        Args:
+            budget: Seconds from now until the deadline
+        """
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (negative once it has passed)"""
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Get the deadline of the request being served, if any"""
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """
+    Make a deadline current for the enclosed code and the tasks it starts
+
+    Args:
+        deadline: Deadline to apply (None leaves the current one in place)
+
+    Yields:
+        The deadline in effect
+    """
+    if deadline is None:
+        yield current_deadline()
+        return
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def cap_timeout(timeout: Optional[float]) -> Optional[float]:
+    """
+    Limit a timeout to the time left before the current deadline
+
+    Args:
+        timeout: Timeout in seconds (None or 0 for no timeout)
+
+    Returns:
+        The smaller of timeout and the remaining time, never negative
+
+    Raises:
+        DeadlineExceeded: If the deadline has already passed
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return timeout
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return remaining if not timeout else min(timeout, remaining)
+
+
+async def within_deadline(awaitable: Awaitable[T]) -> T:
+    """
+    Await a coroutine, cancelling it when the current deadline passes
+
+    Args:
+        awaitable: Coroutine to run
+
+    Returns:
+        Its result
+
+    Raises:
+        DeadlineExceeded: If the deadline passes first
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return await awaitable
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded("Request deadline exceeded")
+    try:
+        return await asyncio.wait_for(awaitable, remaining)
+    except TimeoutError:
+        if deadline.expired:
+            raise DeadlineExceeded("Request deadline exceeded") from None
+        raise
+
+
+def deadline_from_config(config: Optional[Any]) -> Optional[Deadline]:
+    """Get the deadline carried in a LangGraph run config"""
+    if not config:
+        return None
+    return (config.get("configurable") or {}).get("deadline")
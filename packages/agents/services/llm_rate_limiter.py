@@ -0,0 +1,449 @@
+"""
+LLM Rate Limiting
+
+This module keeps the service under the provider's requests-per-minute and
+tokens-per-minute limits on the client side. Each provider/model gets a
+token bucket for requests and one for estimated tokens; a call takes one
+request and its estimated prompt plus output tokens before it is sent, and
+the token bucket is corrected with the reported usage afterwards. When a
+bucket runs dry calls wait in a FIFO queue, so a large prompt is not starved
+by a stream of small ones, instead of being sent and coming back with a 429
+and a backoff inside the user's request.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableBinding
+
+from config import get_settings
+from services.prometheus import get_metrics_registry
+from services.tokens import content_text, count_tokens, estimate_tokens
+from services.tracing import current_span
+
+logger = logging.getLogger(__name__)
+
+_registry = get_metrics_registry()
+LLM_RATE_LIMIT_WAIT = _registry.histogram(
+    "agents_llm_rate_limit_wait_seconds",
+    "Time LLM calls waited for rate limit capacity by provider and model",
+    ("provider", "model")
+)
+LLM_RATE_LIMIT_QUEUED = _registry.gauge(
+    "agents_llm_rate_limit_queued",
+    "LLM calls waiting for rate limit capacity by provider and model",
+    ("provider", "model")
+)
+
+
+def parse_model_limits(value: str) -> Dict[str, float]:
+    """Parse "provider:model=value" or "provider=value" pairs separated by commas"""
+    limits: Dict[str, float] = {}
+    for item in value.split(","):
+        key, sep, limit = item.partition("=")
+        if not sep:
+            continue
+        try:
+            limits[key.strip()] = float(limit)
+        except ValueError:
+            logger.warning(f"Ignoring invalid rate limit for '{key.strip()}': {limit}")
+    return limits
+
+
+class TokenBucket:
+    """Bucket holding up to a minute's allowance, refilled continuously"""
+
+    __slots__ = ("capacity", "rate", "level", "_updated")
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until the bucket holds amount (call refill first)"""
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+
+class ModelRateLimiter:
+    """
+    Request and token buckets for one provider/model with a FIFO wait queue
+    """
+
+    def __init__(self, provider: str, model: str, rpm: float = 0, tpm: float = 0):
+        """
+        Initialize the limiter
+
+        Args:
+            provider: LLM provider
+            model: Model name
+            rpm: Requests per minute (0 disables)
+            tpm: Tokens per minute (0 disables)
+        """
+        self.provider = provider
+        self.model = model
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self._waiters: Deque[Tuple[asyncio.Future, float]] = deque()
+        self._pump: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._wait_metric = LLM_RATE_LIMIT_WAIT.labels(provider, model)
+        LLM_RATE_LIMIT_QUEUED.labels(provider, model).set_function(lambda: len(self._waiters))
+        self._calls = 0
+        self._throttled = 0
+        self._wait_seconds = 0.0
+        self._max_wait = 0.0
+
+    def _cost(self, tokens: float) -> float:
+        # A call larger than a minute's allowance would never fit; let it drain the bucket instead
+        return min(tokens, self.tokens.capacity) if self.tokens else tokens
+
+    def _delay(self, cost: float) -> float:
+        now = time.monotonic()
+        delay = 0.0
+        if self.requests:
+            self.requests.refill(now)
+            delay = self.requests.wait_time(1)
+        if self.tokens:
+            self.tokens.refill(now)
+            delay = max(delay, self.tokens.wait_time(cost))
+        return delay
+
+    def _take(self, cost: float) -> None:
+        if self.requests:
+            self.requests.level -= 1
+        if self.tokens:
+            self.tokens.level -= cost
+
+    def _ensure_pump(self) -> None:
+        """Start the task granting capacity to queued calls on the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._pump is not None and not self._pump.done() and self._pump.get_loop() is loop:
+            return
+        # Calls queued on a loop that has gone away will never resume
+        self._waiters = deque(item for item in self._waiters if item[0].get_loop() is loop)
+        self._wakeup = asyncio.Event()
+        self._pump = loop.create_task(self._grant())
+
+    async def _grant(self) -> None:
+        """Grant capacity to queued calls strictly in arrival order"""
+        while self._waiters:
+            waiter, cost = self._waiters[0]
+            if waiter.done():
+                self._waiters.popleft()
+                continue
+            delay = self._delay(cost)
+            if delay <= 0:
+                self._waiters.popleft()
+                self._take(cost)
+                waiter.set_result(None)
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def acquire(self, tokens: float) -> float:
+        """
+        Wait until a call of the given size fits within the limits
+
+        Args:
+            tokens: Estimated prompt plus output tokens of the call
+
+        Returns:
+            Tokens reserved, to pass to settle() once the call's usage is known
+        """
+        cost = self._cost(tokens)
+        self._calls += 1
+        if not self._waiters and self._delay(cost) <= 0:
+            self._take(cost)
+            self._wait_metric.observe(0.0)
+            return cost
+
+        started = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append((waiter, cost))
+        self._throttled += 1
+        self._ensure_pump()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Capacity was granted as the call was cancelled; give it back
+                self._release(cost)
+            self._wakeup.set()
+            raise
+        waited = time.monotonic() - started
+        self._wait_metric.observe(waited)
+        self._wait_seconds += waited
+        self._max_wait = max(self._max_wait, waited)
+        span = current_span()
+        if span is not None:
+            span.set_attribute("llm.rate_limit_wait_ms", round(waited * 1000, 2))
+        return cost
+
+    def _release(self, cost: float) -> None:
+        if self.requests:
+            self.requests.level = min(self.requests.capacity, self.requests.level + 1)
+        if self.tokens:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + cost)
+
+    def settle(self, reserved: float, used: Optional[float]) -> None:
+        """
+        Correct the token bucket with a call's actual usage
+
+        Args:
+            reserved: Tokens taken by acquire()
+            used: Tokens the call actually used (None keeps the estimate)
+        """
+        if self.tokens and used is not None:
+            # Under-estimates leave the bucket in debt, delaying the next calls
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + reserved - used)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get limiter statistics
+
+        Returns:
+            Dictionary with limits, remaining capacity, queue length and wait times
+        """
+        self._delay(0)
+        return {
+            "rpm": self.requests.capacity if self.requests else None,
+            "tpm": self.tokens.capacity if self.tokens else None,
+            "requests_available": round(self.requests.level, 2) if self.requests else None,
+            "tokens_available": round(self.tokens.level) if self.tokens else None,
+            "queued": len(self._waiters),
+            "calls": self._calls,
+            "throttled": self._throttled,
+            "wait_seconds_total": round(self._wait_seconds, 3),
+            "max_wait_seconds": round(self._max_wait, 3),
+        }
+
+
+class LlmRateLimiter:
+    """
+    Per provider/model rate limiters configured from defaults and overrides
+    """
+
+    def __init__(
+        self,
+        rpm: float = 0,
+        tpm: float = 0,
+        rpm_limits: Optional[Dict[str, float]] = None,
+        tpm_limits: Optional[Dict[str, float]] = None,
+        output_tokens: int = 512
+    ):
+        """
+        Initialize the limiters
+
+        Args:
+            rpm: Default requests per minute per model (0 disables)
+            tpm: Default tokens per minute per model (0 disables)
+            rpm_limits: Overrides keyed by "provider:model" or "provider"
+            tpm_limits: Overrides keyed by "provider:model" or "provider"
+            output_tokens: Output tokens assumed for a call when the model sets no max_tokens
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self.rpm_limits = dict(rpm_limits or {})
+        self.tpm_limits = dict(tpm_limits or {})
+        self.output_tokens = output_tokens
+        self._limiters: Dict[str, ModelRateLimiter] = {}
+
+    @staticmethod
+    def _lookup(limits: Dict[str, float], provider: str, model: str, default: float) -> float:
+        return limits.get(f"{provider}:{model}", limits.get(provider, default))
+
+    def for_model(self, provider: str, model: str) -> Optional[ModelRateLimiter]:
+        """
+        Get the shared limiter for a provider/model
+
+        Returns:
+            ModelRateLimiter, or None if the model has no limits
+        """
+        key = f"{provider}:{model}"
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            rpm = self._lookup(self.rpm_limits, provider, model, self.rpm)
+            tpm = self._lookup(self.tpm_limits, provider, model, self.tpm)
+            if rpm <= 0 and tpm <= 0:
+                return None
+            limiter = self._limiters[key] = ModelRateLimiter(provider, model, rpm, tpm)
+        return limiter
+
+    def wrap(self, llm: BaseChatModel, provider: str, model: str) -> BaseChatModel:
+        """
+        Wrap a chat model so its calls go through the provider/model's limiter
+
+        Returns:
+            RateLimitedChatModel, or the model itself if it has no limits
+        """
+        limiter = self.for_model(provider, model)
+        if limiter is None:
+            return llm
+        return RateLimitedChatModel(llm=llm, limiter=limiter, output_tokens=self.output_tokens)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get statistics for every limited model
+
+        Returns:
+            Dictionary keyed by "provider:model"
+        """
+        return {key: limiter.get_stats() for key, limiter in self._limiters.items()}
+
+
+def _reported_tokens(message: Any) -> Optional[int]:
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("total_tokens")
+    return None
+
+
+class RateLimitedChatModel(BaseChatModel):
+    """
+    Chat model wrapper acquiring rate limit capacity before each call.
+
+    Calls go to the wrapped model's generate/stream implementation, so tool
+    binding, streaming and usage reporting behave as for the model itself.
+    Only async calls are limited; the service never calls models synchronously.
+    """
+
+    llm: BaseChatModel
+    limiter: ModelRateLimiter
+    output_tokens: int = 512
+
+    @property
+    def _llm_type(self) -> str:
+        return self.llm._llm_type
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return self.llm._identifying_params
+
+    def _get_ls_params(self, stop: Optional[List[str]] = None, **kwargs: Any) -> Any:
+        # Metrics and traces label calls with the wrapped model's provider and name
+        return self.llm._get_ls_params(stop=stop, **kwargs)
+
+    def _should_stream(self, *, async_api: bool, run_manager: Any = None, **kwargs: Any) -> bool:
+        return async_api and self.llm._should_stream(async_api=True, run_manager=run_manager, **kwargs)
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> Any:
+        bound = self.llm.bind_tools(tools, **kwargs)
+        if bound is self.llm:
+            return self
+        if isinstance(bound, RunnableBinding) and bound.bound is self.llm:
+            # Keep the formatted tools, but call through the limiter
+            return self.bind(**bound.kwargs)
+        logger.warning(f"Tool binding of {self.llm._llm_type} bypasses the rate limiter")
+        return bound
+
+    def _estimate(self, messages: List[BaseMessage], kwargs: Dict[str, Any]) -> int:
+        tokens = count_tokens(messages)
+        if kwargs.get("tools"):
+            tokens += estimate_tokens(json.dumps(kwargs["tools"], default=str))
+        return tokens + (getattr(self.llm, "max_tokens", None) or self.output_tokens)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Limits are only enforced on the async path, where waiting does not block a thread
+        logger.warning(
+            f"Synchronous call to {self.limiter.provider}:{self.limiter.model} bypasses the rate limiter"
+        )
+        return self.llm._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        reserved = await self.limiter.acquire(self._estimate(messages, kwargs))
+        used = None
+        try:
+            result = await self.llm._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            used = _reported_tokens(result.generations[0].message) if result.generations else None
+            if used is None:
+                used = (result.llm_output or {}).get("token_usage", {}).get("total_tokens")
+            if used is None:
+                used = count_tokens(messages) + sum(estimate_tokens(g.text) for g in result.generations)
+            return result
+        finally:
+            self.limiter.settle(reserved, used)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        reserved = await self.limiter.acquire(self._estimate(messages, kwargs))
+        reported: Optional[int] = None
+        output: List[str] = []
+        completed = False
+        try:
+            async for chunk in self.llm._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                tokens = _reported_tokens(chunk.message)
+                if tokens is not None:
+                    reported = (reported or 0) + tokens
+                output.append(content_text(chunk.message.content))
+                yield chunk
+            completed = True
+        finally:
+            used = reported
+            if used is None and completed:
+                used = count_tokens(messages) + estimate_tokens("".join(output))
+            self.limiter.settle(reserved, used)
+
+
+# Global LLM rate limiter
+_llm_rate_limiter: Optional[LlmRateLimiter] = None
+
+
+def get_llm_rate_limiter() -> LlmRateLimiter:
+    """
+    Get or create the global LLM rate limiter
+
+    Returns:
+        LlmRateLimiter configured from settings (with no limits if disabled)
+    """
+    global _llm_rate_limiter
+    if _llm_rate_limiter is None:
+        settings = get_settings()
+        if settings.LLM_RATE_LIMIT_ENABLED:
+            _llm_rate_limiter = LlmRateLimiter(
+                rpm=settings.LLM_RPM_LIMIT,
+                tpm=settings.LLM_TPM_LIMIT,
+                rpm_limits=parse_model_limits(settings.LLM_RPM_LIMITS),
+                tpm_limits=parse_model_limits(settings.LLM_TPM_LIMITS),
+                output_tokens=settings.LLM_RATE_LIMIT_OUTPUT_TOKENS
+            )
+            limiter = _llm_rate_limiter
+            if not (limiter.rpm or limiter.tpm or limiter.rpm_limits or limiter.tpm_limits):
+                logger.warning("LLM rate limiting is enabled but no limits are configured")
+        else:
+            _llm_rate_limiter = LlmRateLimiter()
+    return _llm_rate_limiter
@@ -0,0 +1,392 @@
+"""
+Log Backend Client
+
+This module queries logs from the backend as a stream. Lines are matched
+while the response is being read, the time window is pushed down to the
+backend, and the stream is closed as soon as enough matches are found, so
+memory stays flat however large the log window is. Follow-up pages are
+requested with an opaque cursor.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+import httpx
+
+from config import get_settings
+from services.deadline import cap_timeout, within_deadline
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+_TIME_RANGE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhdw])\s*$", re.IGNORECASE)
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+# "2024-12-02 07:10:15 [ERROR] message" with optional fraction, zone and level
+_TEXT_LINE = re.compile(
+    r"^(?P<ts>\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?)\s+"
+    r"(?:\[?(?P<level>TRACE|DEBUG|INFO|NOTICE|WARN|WARNING|ERROR|FATAL|CRITICAL)\]?:?\s+)?"
+    r"(?P<message>.*)$",
+    re.IGNORECASE
+)
+_QUERY_TERM = re.compile(r'"([^"]+)"|(\S+)')
+
+Matcher = Callable[[str], bool]
+
+
+def parse_time_range(value: str) -> float:
+    """
+    Parse a time range such as 30m, 1h or 7d
+
+    Args:
+        value: Time range string
+
+    Returns:
+        Length of the range in seconds
+
+    Raises:
+        ValueError: If the value is not a number followed by s, m, h, d or w
+    """
+    match = _TIME_RANGE.match(value)
+    if not match:
+        raise ValueError(f"Invalid time range: {value!r} (expected e.g. 30m, 1h, 7d)")
+    return float(match.group(1)) * _UNIT_SECONDS[match.group(2).lower()]
+
+
+def parse_timestamp(value) -> Optional[float]:
+    """Convert an ISO-8601 string or epoch number to epoch seconds (naive times are UTC)"""
+    if isinstance(value, (int, float)):
+        # Epoch milliseconds are common in JSON logs
+        return value / 1000.0 if value > 1e11 else float(value)
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace(",", "."))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def compile_matcher(query: str) -> Matcher:
+    """
+    Compile a log query into a matcher
+
+    The query is either a regular expression between slashes (``/time(d )?out/``)
+    or whitespace-separated terms that must all appear in the line. A term
+    may list alternatives with ``|`` (``error|exception``) and quoted phrases
+    are kept together. Matching is case-insensitive; an empty query or ``*``
+    matches every line.
+
+    Args:
+        query: Search query
+
+    Returns:
+        Function returning True for matching lines
+
+    Raises:
+        ValueError: If a regular expression query is invalid
+    """
+    query = query.strip()
+    if not query or query == "*":
+        return lambda line: True
+    if len(query) > 2 and query.startswith("/") and query.endswith("/"):
+        try:
+            return re.compile(query[1:-1], re.IGNORECASE).search
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression {query}: {e}") from e
+
+    terms = [phrase or word for phrase, word in _QUERY_TERM.findall(query)]
+    patterns = ["|".join(re.escape(part) for part in term.split("|") if part) or re.escape(term) for term in terms]
+    if len(patterns) == 1:
+        return re.compile(patterns[0], re.IGNORECASE).search
+    # One pass per line: every term as a lookahead from the start
+    return re.compile("".join(f"(?=.*?(?:{pattern}))" for pattern in patterns), re.IGNORECASE | re.DOTALL).match
+
+
+@dataclass
+class LogEntry:
+    """A matched log line"""
+    message: str
+    timestamp: Optional[float] = None
+    level: Optional[str] = None
+    # Timestamp as written in the log, used for display
+    time_text: Optional[str] = None
+
+    def render(self) -> str:
+        """Format the entry as a single log line"""
+        parts = [part for part in (self.time_text, f"[{self.level}]" if self.level else None, self.message) if part]
+        return " ".join(parts)
+
+
+def parse_line(line: str, max_chars: int = 1000) -> LogEntry:
+    """
+    Parse a JSON or plain-text log line
+
+    Args:
+        line: Raw log line
+        max_chars: Length the message is truncated to
+
+    Returns:
+        LogEntry; lines without a recognizable timestamp keep timestamp None
+    """
+    if line.startswith("{"):
+        try:
+            data = orjson.loads(line) if orjson is not None else json.loads(line)
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            raw_time = data.get("timestamp", data.get("time", data.get("ts")))
+            message = data.get("message", data.get("msg", data.get("log", line)))
+            level = data.get("level", data.get("severity"))
+            return LogEntry(
+                message=str(message)[:max_chars],
+                timestamp=parse_timestamp(raw_time),
+                level=str(level).upper() if level else None,
+                time_text=str(raw_time) if raw_time is not None else None
+            )
+
+    match = _TEXT_LINE.match(line)
+    if match is None:
+        return LogEntry(message=line[:max_chars])
+    level = match.group("level")
+    return LogEntry(
+        message=match.group("message")[:max_chars],
+        timestamp=parse_timestamp(match.group("ts")),
+        level=level.upper() if level else None,
+        time_text=match.group("ts")
+    )
+
+
+@dataclass
+class LogWindow:
+    """Time window of a query and the position reached in its stream"""
+    since: float
+    until: float
+    # Raw lines of the backend stream already consumed
+    offset: int = 0
+
+
+def _query_key(resource_type: str, resource_id: str, query: str) -> str:
+    """Short fingerprint tying a cursor to the query it came from"""
+    return hashlib.sha1(f"{resource_type}\0{resource_id}\0{query}".encode()).hexdigest()[:12]
+
+
+def encode_cursor(window: LogWindow, key: str) -> str:
+    """Encode a window position as an opaque cursor"""
+    payload = json.dumps({"s": window.since, "u": window.until, "o": window.offset, "k": key}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key: str) -> LogWindow:
+    """
+    Decode a cursor returned by an earlier query
+
+    Args:
+        cursor: Opaque cursor
+        key: Fingerprint of the current query
+
+    Returns:
+        LogWindow to resume from
+
+    Raises:
+        ValueError: If the cursor is malformed or belongs to a different query
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        window = LogWindow(since=float(data["s"]), until=float(data["u"]), offset=int(data["o"]))
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid log cursor") from e
+    if data.get("k") != key:
+        raise ValueError("Log cursor belongs to a different query; repeat the query without a cursor")
+    return window
+
+
+@dataclass
+class LogQueryResult:
+    """Matched entries of one page and how much of the stream was read"""
+    entries: List[LogEntry] = field(default_factory=list)
+    matched_lines: int = 0
+    since: float = 0.0
+    until: float = 0.0
+    scanned_lines: int = 0
+    scanned_bytes: int = 0
+    # Cursor for the next page, set when the scan stopped at max_lines
+    next_cursor: Optional[str] = None
+
+
+class LogBackendClient:
+    """Client for the log backend"""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        timeout: Optional[int] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """
+        Initialize the client
+
+        Args:
+            base_url: Log backend URL (defaults to LOG_BACKEND_URL)
+            timeout: Request timeout in milliseconds (defaults to LOG_BACKEND_TIMEOUT)
+            transport: Optional httpx transport (for tests)
+        """
+        settings = get_settings()
+        self.base_url = base_url or settings.LOG_BACKEND_URL
+        self.timeout = (timeout or settings.LOG_BACKEND_TIMEOUT) / 1000.0
+        self.max_line_chars = settings.LOG_MAX_LINE_CHARS
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the shared pooled HTTP client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                transport=self._transport
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the shared connection pool"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    async def query_logs(
+        self,
+        resource_type: str,
+        resource_id: str,
+        query: str,
+        time_range: str = "1h",
+        max_lines: int = 50,
+        cursor: Optional[str] = None,
+        on_entry: Optional[Callable[[LogEntry], None]] = None
+    ) -> LogQueryResult:
+        """
+        Stream logs from the backend and collect matching lines
+
+        The time window (since/until) and the stream offset are sent to the
+        backend so it can skip lines itself; they are also checked locally.
+        Reading stops after max_lines matches, and the returned cursor resumes
+        the scan where it stopped, over the same time window.
+
+        Args:
+            resource_type: Type of resource (kubernetes, azure, application)
+            resource_id: Resource identifier
+            query: Search query (see compile_matcher)
+            time_range: Time range (e.g. 30m, 1h, 24h); ignored when a cursor is given
+            max_lines: Maximum number of matching lines to return
+            cursor: Cursor from a previous page
+            on_entry: Optional consumer of matching entries; when given, entries
+                are passed to it as they are read instead of being collected
+
+        Returns:
+            LogQueryResult with the matching entries and the next cursor
+
+        Raises:
+            ValueError: If the time range, query or cursor is invalid
+            httpx.HTTPError: If the request fails
+            DeadlineExceeded: If the request deadline passes first
+        """
+        key = _query_key(resource_type, resource_id, query)
+        if cursor:
+            window = decode_cursor(cursor, key)
+        else:
+            until = time.time()
+            window = LogWindow(since=until - parse_time_range(time_range), until=until)
+        matcher = compile_matcher(query)
+
+        params = {
+            "resource_type": resource_type,
+            "resource_id": resource_id,
+            "since": window.since,
+            "until": window.until,
+            "offset": window.offset
+        }
+        return await within_deadline(self._scan(params, matcher, window, max(1, max_lines), key, on_entry))
+
+    async def _scan(
+        self,
+        params: dict,
+        matcher: Matcher,
+        window: LogWindow,
+        max_lines: int,
+        key: str,
+        on_entry: Optional[Callable[[LogEntry], None]] = None
+    ) -> LogQueryResult:
+        """Read the log stream line by line until it ends or max_lines match"""
+        result = LogQueryResult(since=window.since, until=window.until)
+        offset = window.offset
+        client = self._get_client()
+
+        async with client.stream("GET", "/api/logs", params=params, timeout=cap_timeout(self.timeout)) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                offset += 1
+                result.scanned_bytes += len(line) + 1
+                # Cheap match on the raw line first; only candidates are parsed
+                if not line or not matcher(line):
+                    continue
+                entry = parse_line(line, self.max_line_chars)
+                if entry.timestamp is not None and not window.since <= entry.timestamp <= window.until:
+                    continue
+                if line.startswith("{") and not matcher(entry.render()):
+                    # The raw match was on JSON keys rather than the log content
+                    continue
+                result.matched_lines += 1
+                if on_entry is not None:
+                    on_entry(entry)
+                else:
+                    result.entries.append(entry)
+                if result.matched_lines >= max_lines:
+                    # Leaving the block closes the stream without reading the rest
+                    result.next_cursor = encode_cursor(LogWindow(window.since, window.until, offset), key)
+                    break
+
+        result.scanned_lines = offset - window.offset
+        logger.debug(
+            f"Scanned {result.scanned_lines} log lines ({result.scanned_bytes} bytes), "
+            f"{result.matched_lines} matched"
+        )
+        return result
+
+
+# Global log backend client
+_log_backend: Optional[LogBackendClient] = None
+
+
+def get_log_backend() -> LogBackendClient:
+    """
+    Get or create the global log backend client
+
+    Returns:
+        LogBackendClient instance
+    """
+    global _log_backend
+    if _log_backend is None:
+        _log_backend = LogBackendClient()
+    return _log_backend
+
+
+async def close_log_backend() -> None:
+    """
+    Close the global log backend client's connection pool, if it was created
+    """
+    if _log_backend is not None:
+        await _log_backend.aclose()
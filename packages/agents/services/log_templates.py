@@ -0,0 +1,235 @@
+"""
+Log Template Mining
+
+This module clusters log lines into templates online, following the Drain
+algorithm (He et al., ICWS 2017): lines are routed through a fixed-depth
+tree by level, token count and leading tokens, then merged into the most
+similar cluster of the leaf, replacing differing tokens with ``<*>``. A
+window of thousands of repetitive lines collapses into a few dozen
+templates with counts, first/last seen times and example variable values.
+"""
+
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from services.log_backend import LogEntry
+
+WILDCARD = "<*>"
+
+# Tokens that are variables regardless of context: numbers (with units),
+# hex ids, UUIDs, IP addresses and key=value pairs with numeric values
+_VARIABLE = re.compile(
+    r"^[(\[{'\"]?(?:"
+    r"[-+]?\d+(?:[.,:/]\d+)*(?:ms|us|ns|s|m|h|%|[kmgt]i?b)?"
+    r"|0x[0-9a-f]+"
+    r"|[0-9a-f]{8,}"
+    r"|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+    r"|\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?"
+    r"|[\w.-]+=[-+]?[\d.]+\w*"
+    r")[)\]}'\",;:.]*$",
+    re.IGNORECASE
+)
+_DIGIT = re.compile(r"\d")
+_PUNCTUATION = "()[]{}'\",;:."
+# Masking decisions are cached per distinct token; words repeat heavily in logs
+_MASK_CACHE_SIZE = 65536
+
+
+def mask_tokens(message: str, cache: Optional[Dict[str, bool]] = None) -> Tuple[List[str], List[str]]:
+    """
+    Split a message into tokens and mask the obvious variables
+
+    Args:
+        message: Log message
+        cache: Optional token -> is-variable cache shared between calls
+
+    Returns:
+        Tuple of (raw tokens, tokens with variables replaced by the wildcard)
+    """
+    tokens = message.split()
+    if cache is None:
+        return tokens, [WILDCARD if _VARIABLE.match(token) else token for token in tokens]
+    masked = []
+    for token in tokens:
+        variable = cache.get(token)
+        if variable is None:
+            if len(cache) >= _MASK_CACHE_SIZE:
+                cache.clear()
+            variable = cache[token] = _VARIABLE.match(token) is not None
+        masked.append(WILDCARD if variable else token)
+    return tokens, masked
+
+
+@dataclass
+class LogTemplate:
+    """A cluster of log lines sharing one template"""
+    id: int
+    level: Optional[str]
+    tokens: List[str]
+    count: int = 0
+    first_seen: Optional[float] = None
+    last_seen: Optional[float] = None
+    # Distinct variable tuples in the order they were first seen
+    examples: List[Tuple[str, ...]] = field(default_factory=list)
+
+    @property
+    def template(self) -> str:
+        """Template text with ``<*>`` in variable positions"""
+        return " ".join(self.tokens)
+
+    def _observe(self, timestamp: Optional[float]) -> None:
+        self.count += 1
+        if timestamp is not None:
+            if self.first_seen is None or timestamp < self.first_seen:
+                self.first_seen = timestamp
+            if self.last_seen is None or timestamp > self.last_seen:
+                self.last_seen = timestamp
+
+
+class TemplateMiner:
+    """
+    Online Drain-style log template miner
+
+    Lines are added one at a time and memory is bounded by the number of
+    templates, not the number of lines.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.5,
+        depth: int = 4,
+        max_children: int = 100,
+        max_examples: int = 3
+    ):
+        """
+        Initialize the miner
+
+        Args:
+            similarity_threshold: Fraction of matching tokens needed to join a template
+            depth: Tree depth; depth - 2 leading tokens are used for routing
+            max_children: Branches per tree node before tokens share a wildcard branch
+            max_examples: Distinct variable examples kept per template
+        """
+        self.similarity_threshold = similarity_threshold
+        self.prefix_tokens = max(1, depth - 2)
+        self.max_children = max_children
+        self.max_examples = max_examples
+        # (level, token count) -> nested prefix dict -> list of templates
+        self._root: Dict[Tuple[Optional[str], int], dict] = {}
+        self.templates: List[LogTemplate] = []
+        self.total = 0
+        self._mask_cache: Dict[str, bool] = {}
+
+    def _leaf(self, level: Optional[str], tokens: Sequence[str]) -> List[LogTemplate]:
+        """Find or create the leaf list of templates for a masked token sequence"""
+        node = self._root.setdefault((level, len(tokens)), {})
+        for token in tokens[:self.prefix_tokens]:
+            # Tokens with digits are likely variables; route them together
+            key = WILDCARD if _DIGIT.search(token) else token
+            if key not in node and len(node) >= self.max_children:
+                key = WILDCARD
+            node = node.setdefault(key, {})
+        return node.setdefault(None, [])
+
+    @staticmethod
+    def _similarity(template: Sequence[str], tokens: Sequence[str]) -> Tuple[float, int]:
+        """Fraction of equal tokens, and the number of wildcards as a tie-breaker"""
+        equal = wildcards = 0
+        for a, b in zip(template, tokens):
+            if a == b:
+                # Positions masked in both count as matching structure
+                equal += 1
+            elif a == WILDCARD:
+                wildcards += 1
+        return equal / len(tokens), wildcards
+
+    def add(self, message: str, level: Optional[str] = None, timestamp: Optional[float] = None) -> LogTemplate:
+        """
+        Add a log line
+
+        Args:
+            message: Log message (without timestamp and level)
+            level: Log level; templates never span levels
+            timestamp: Epoch seconds of the line, if known
+
+        Returns:
+            The template the line was assigned to
+        """
+        self.total += 1
+        raw, masked = mask_tokens(message, self._mask_cache)
+        if not masked:
+            raw, masked = [""], [""]
+        leaf = self._leaf(level, masked)
+
+        best: Optional[LogTemplate] = None
+        best_score = (-1.0, -1)
+        for candidate in leaf:
+            score = self._similarity(candidate.tokens, masked)
+            if score > best_score:
+                best, best_score = candidate, score
+
+        if best is None or best_score[0] < self.similarity_threshold:
+            best = LogTemplate(id=len(self.templates) + 1, level=level, tokens=list(masked))
+            leaf.append(best)
+            self.templates.append(best)
+        else:
+            for index, (a, b) in enumerate(zip(best.tokens, masked)):
+                if a != b and a != WILDCARD:
+                    best.tokens[index] = WILDCARD
+                    # Examples taken before the template widened lack the new variable
+                    best.examples.clear()
+
+        best._observe(timestamp)
+        if len(best.examples) < self.max_examples:
+            variables = tuple(
+                token.strip(_PUNCTUATION) or token for token, slot in zip(raw, best.tokens) if slot == WILDCARD
+            )
+            if variables and variables not in best.examples:
+                best.examples.append(variables)
+        return best
+
+    def add_entry(self, entry: LogEntry) -> LogTemplate:
+        """Add a parsed log entry"""
+        return self.add(entry.message, entry.level, entry.timestamp)
+
+    def top(self, limit: Optional[int] = None) -> List[LogTemplate]:
+        """Templates by descending line count"""
+        ranked = sorted(self.templates, key=lambda template: (-template.count, template.id))
+        return ranked[:limit] if limit is not None else ranked
+
+
+def _clock(timestamp: Optional[float]) -> str:
+    """Format a timestamp as a UTC time of day"""
+    if timestamp is None:
+        return "?"
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%H:%M:%S")
+
+
+def format_templates(miner: TemplateMiner, limit: int = 30) -> str:
+    """
+    Format the most frequent templates for the LLM
+
+    Args:
+        miner: Template miner holding the scanned lines
+        limit: Maximum number of templates listed
+
+    Returns:
+        One line per template with count, level, time span and example variables
+    """
+    ranked = miner.top()
+    lines = []
+    for template in ranked[:limit]:
+        level = f"[{template.level}] " if template.level else ""
+        line = f"  {template.count}x {level}{template.template}"
+        if template.first_seen is not None:
+            line += f" (first {_clock(template.first_seen)}, last {_clock(template.last_seen)} UTC)"
+        if template.examples:
+            examples = "; ".join(", ".join(example) for example in template.examples)
+            line += f" e.g. {examples}"
+        lines.append(line)
+    remaining = ranked[limit:]
+    if remaining:
+        lines.append(f"  ... {len(remaining)} rarer patterns covering {sum(t.count for t in remaining)} lines omitted")
+    return "\n".join(lines)
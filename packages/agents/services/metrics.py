@@ -0,0 +1,81 @@
+"""
+In-process service metrics
+
+This module provides lightweight latency histograms used to report
+per-component timings on the diagnostics endpoints.
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+
+class Histogram:
+    """
+    Latency histogram with exact totals and windowed percentiles.
+
+    Count, sum, min and max cover every observation. Percentiles are computed
+    over the most recent window observations, so they follow recent behaviour
+    and memory stays bounded.
+    """
+
+    def __init__(self, window: int = 1024):
+        """
+        Initialize the histogram
+
+        Args:
+            window: Number of recent observations kept for percentiles
+        """
+        self._lock = threading.Lock()
+        self._recent: Deque[float] = deque(maxlen=max(1, window))
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        """Record one observation (seconds)"""
+        with self._lock:
+            self._recent.append(value)
+            self.count += 1
+            self.total += value
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Get a percentile of the recent observations
+
+        Args:
+            q: Percentile between 0 and 100
+
+        Returns:
+            Nearest-rank percentile, or None without observations
+        """
+        with self._lock:
+            values = sorted(self._recent)
+        if not values:
+            return None
+        rank = max(1, math.ceil(q / 100.0 * len(values)))
+        return values[rank - 1]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get histogram statistics
+
+        Returns:
+            Dictionary with count, mean, min/max and p50/p95/p99 in milliseconds
+        """
+        def ms(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value * 1000, 2)
+
+        return {
+            "count": self.count,
+            "mean_ms": ms(self.total / self.count) if self.count else None,
+            "min_ms": ms(self.min),
+            "max_ms": ms(self.max),
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "p99_ms": ms(self.percentile(99)),
+        }
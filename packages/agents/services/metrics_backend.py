@@ -0,0 +1,311 @@
+"""
+Metrics Backend Client
+
+This module fetches raw metric time series from the metrics backend and
+reduces them to compact summaries (avg/max/p95/trend plus a short
+downsampled series) with vectorized NumPy math, so only a few lines per
+metric reach the LLM.
+"""
+
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+import numpy as np
+
+from config import get_settings
+from services.deadline import cap_timeout, within_deadline
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MetricSeries:
+    """Raw time series for one metric"""
+    name: str
+    unit: str
+    timestamps: np.ndarray
+    values: np.ndarray
+
+
+@dataclass
+class MetricSummary:
+    """Compact summary of a metric time series"""
+    name: str
+    unit: str
+    count: int
+    avg: float
+    min: float
+    max: float
+    p95: float
+    last: float
+    # Least-squares slope in units per hour and the resulting trend label
+    slope_per_hour: float
+    trend: str
+    # Downsampled bucket means and the width of each bucket
+    series: List[float] = field(default_factory=list)
+    bucket_seconds: float = 0.0
+
+
+def _parse_iso_timestamp(value: str) -> float:
+    """Parse an ISO-8601 timestamp to epoch seconds, treating a missing offset as UTC"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).timestamp()
+
+
+def _to_epoch_seconds(timestamps: Sequence[Any]) -> np.ndarray:
+    """Convert epoch seconds or ISO-8601 strings to float epoch seconds"""
+    if len(timestamps) and isinstance(timestamps[0], str):
+        return np.array([_parse_iso_timestamp(ts) for ts in timestamps], dtype=np.float64)
+    return np.asarray(timestamps, dtype=np.float64)
+
+
+def parse_series(data: Dict[str, Any]) -> MetricSeries:
+    """
+    Build a series from a backend metric entry
+
+    Entries carry either parallel "timestamps" and "values" arrays or a
+    "points" array of [timestamp, value] pairs.
+
+    Args:
+        data: Metric entry from the backend response
+
+    Returns:
+        MetricSeries with float arrays
+    """
+    if "points" in data:
+        points = data["points"]
+        timestamps = _to_epoch_seconds([point[0] for point in points])
+        values = np.asarray([point[1] for point in points], dtype=np.float64)
+    else:
+        timestamps = _to_epoch_seconds(data.get("timestamps", []))
+        values = np.asarray(data.get("values", []), dtype=np.float64)
+    return MetricSeries(name=data.get("name", "metric"), unit=data.get("unit", ""), timestamps=timestamps, values=values)
+
+
+def summarize_series(
+    series: MetricSeries,
+    points: int = 12,
+    flat_threshold: float = 0.05
+) -> Optional[MetricSummary]:
+    """
+    Summarize a time series
+
+    Args:
+        series: Raw time series
+        points: Number of buckets in the downsampled series
+        flat_threshold: Fitted change over the window, relative to the value
+            range, below which the trend is reported as flat
+
+    Returns:
+        MetricSummary, or None if the series has no valid samples
+    """
+    t, v = series.timestamps, series.values
+    if t.shape != v.shape:
+        raise ValueError(f"Metric {series.name} has {t.size} timestamps but {v.size} values")
+
+    valid = np.isfinite(t) & np.isfinite(v)
+    if not valid.all():
+        t, v = t[valid], v[valid]
+    if v.size == 0:
+        return None
+    if v.size > 1 and np.any(t[1:] < t[:-1]):
+        order = np.argsort(t, kind="stable")
+        t, v = t[order], v[order]
+
+    avg = float(v.mean())
+    low, high = float(v.min()), float(v.max())
+
+    # Least-squares slope of value over time
+    centered = t - t.mean()
+    denominator = float(np.dot(centered, centered))
+    slope = float(np.dot(centered, v - avg)) / denominator if denominator > 0 else 0.0
+    change = slope * float(t[-1] - t[0])
+    scale = max(high - low, abs(avg), 1e-9)
+    if abs(change) < flat_threshold * scale:
+        trend = "flat"
+    else:
+        trend = "rising" if change > 0 else "falling"
+
+    # Downsample to bucket means over equal index ranges
+    buckets = max(1, min(points, v.size))
+    edges = np.linspace(0, v.size, buckets + 1).astype(np.int64)
+    means = np.add.reduceat(v, edges[:-1]) / np.diff(edges)
+    bucket_seconds = float(t[-1] - t[0]) / buckets if v.size > 1 else 0.0
+
+    return MetricSummary(
+        name=series.name,
+        unit=series.unit,
+        count=int(v.size),
+        avg=avg,
+        min=low,
+        max=high,
+        p95=float(np.percentile(v, 95)),
+        last=float(v[-1]),
+        slope_per_hour=slope * 3600.0,
+        trend=trend,
+        series=[round(float(mean), 2) for mean in means],
+        bucket_seconds=bucket_seconds
+    )
+
+
+def _format_duration(seconds: float) -> str:
+    """Format a bucket width compactly (e.g. 5m, 2h)"""
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size:
+            return f"{seconds / size:.3g}{unit}"
+    return f"{seconds:.3g}s"
+
+
+def format_summary(summary: MetricSummary) -> str:
+    """
+    Format a metric summary for the LLM
+
+    Args:
+        summary: Metric summary
+
+    Returns:
+        Two lines: the statistics and the downsampled series
+    """
+    unit = summary.unit
+    trend = summary.trend if summary.trend == "flat" else f"{summary.trend} ({summary.slope_per_hour:+.3g}{unit}/h)"
+    lines = [
+        f"  {summary.name}: avg {summary.avg:.3g}{unit}, p95 {summary.p95:.3g}{unit}, "
+        f"max {summary.max:.3g}{unit}, min {summary.min:.3g}{unit}, last {summary.last:.3g}{unit}, "
+        f"trend {trend} [{summary.count} samples]"
+    ]
+    if len(summary.series) > 1:
+        values = " ".join(f"{value:.3g}" for value in summary.series)
+        lines.append(f"    per {_format_duration(summary.bucket_seconds)}: {values}")
+    return "\n".join(lines)
+
+
+class MetricsBackendClient:
+    """Client for the metrics backend"""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        timeout: Optional[int] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """
+        Initialize the client
+
+        Args:
+            base_url: Metrics backend URL (defaults to METRICS_BACKEND_URL)
+            timeout: Request timeout in milliseconds (defaults to METRICS_BACKEND_TIMEOUT)
+            transport: Optional httpx transport (for tests)
+        """
+        settings = get_settings()
+        self.base_url = base_url or settings.METRICS_BACKEND_URL
+        self.timeout = (timeout or settings.METRICS_BACKEND_TIMEOUT) / 1000.0
+        self.summary_points = settings.METRICS_SUMMARY_POINTS
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the shared pooled HTTP client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                transport=self._transport
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the shared connection pool"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    async def get_metrics(
+        self,
+        resource_type: str,
+        resource_id: str,
+        metric_types: Sequence[str],
+        time_range: str = "1h"
+    ) -> List[MetricSeries]:
+        """
+        Fetch raw time series for a resource
+
+        Args:
+            resource_type: Type of resource (kubernetes, azure, oracle)
+            resource_id: Resource identifier
+            metric_types: Metric names to fetch
+            time_range: Time range (e.g. 1h, 6h, 24h)
+
+        Returns:
+            One MetricSeries per metric returned by the backend
+
+        Raises:
+            httpx.HTTPError: If the request fails
+            DeadlineExceeded: If the request deadline passes first
+        """
+        client = self._get_client()
+        response = await within_deadline(client.get(
+            "/api/metrics",
+            params={
+                "resource_type": resource_type,
+                "resource_id": resource_id,
+                "metric_type": ",".join(metric_types),
+                "time_range": time_range
+            },
+            timeout=cap_timeout(self.timeout)
+        ))
+        response.raise_for_status()
+        data = orjson.loads(response.content) if orjson is not None else json.loads(response.content)
+        return [parse_series(entry) for entry in data.get("metrics", [])]
+
+    async def summarize(
+        self,
+        resource_type: str,
+        resource_id: str,
+        metric_types: Sequence[str],
+        time_range: str = "1h"
+    ) -> List[MetricSummary]:
+        """
+        Fetch and summarize the metrics of a resource
+
+        Returns:
+            One MetricSummary per metric with samples
+        """
+        series = await self.get_metrics(resource_type, resource_id, metric_types, time_range)
+        summaries = [summarize_series(item, points=self.summary_points) for item in series]
+        return [summary for summary in summaries if summary is not None]
+
+
+# Global metrics backend client
+_metrics_backend: Optional[MetricsBackendClient] = None
+
+
+def get_metrics_backend() -> MetricsBackendClient:
+    """
+    Get or create the global metrics backend client
+
+    Returns:
+        MetricsBackendClient instance
+    """
+    global _metrics_backend
+    if _metrics_backend is None:
+        _metrics_backend = MetricsBackendClient()
+    return _metrics_backend
+
+
+async def close_metrics_backend() -> None:
+    """
+    Close the global metrics backend client's connection pool, if it was created
+    """
+    if _metrics_backend is not None:
+        await _metrics_backend.aclose()
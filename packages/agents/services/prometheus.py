@@ -0,0 +1,510 @@
+"""
+Prometheus Metrics
+
+This module keeps cumulative counters, gauges and fixed-bucket histograms
+and renders them in the Prometheus text exposition format (version 0.0.4)
+for the /metrics endpoint. Observations are a bisect and a locked add, so
+instrumenting hot paths (HTTP requests, graph steps, tool, LLM and RAG
+calls) costs well under a microsecond each.
+"""
+
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from services.tokens import count_tokens, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds; LLM calls and agent turns need the long tail
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value"""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: Any) -> str:
+    """Escape a label value"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    """Render a label set, e.g. {tool="query_logs",status="ok"}"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase the counter"""
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value", "_lock", "_function")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float) -> None:
+        """Set the gauge"""
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase the gauge"""
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Decrease the gauge"""
+        with self._lock:
+            self.value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the value from a function when the metrics are rendered"""
+        self._function = function
+
+    def get(self) -> float:
+        """Current value"""
+        return float(self._function()) if self._function is not None else self.value
+
+
+class _HistogramChild:
+    __slots__ = ("_upper", "counts", "sum", "_lock")
+
+    def __init__(self, upper: Tuple[float, ...]):
+        self._upper = upper
+        # One count per bucket plus +Inf; made cumulative when rendered
+        self.counts = [0] * (len(upper) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Record one observation"""
+        index = bisect_left(self._upper, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class _Metric:
+    """A metric family; label combinations are children created on first use"""
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[Any, ...], Any] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: Any) -> Any:
+        """
+        Get the child for a label combination
+
+        Args:
+            *values: Label values in the order of the metric's label names
+
+        Returns:
+            The child metric (hold on to it on hot paths)
+
+        Raises:
+            ValueError: If the number of values does not match the label names
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Render the metric family in the text exposition format"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    def _items(self) -> List[Tuple[Tuple[Any, ...], Any]]:
+        with self._lock:
+            return list(self._children.items())
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    type = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase an unlabelled counter"""
+        self._children[()].inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, values)} {_format_value(child.value)}"
+            for values, child in self._items()
+        ]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    type = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        """Set an unlabelled gauge"""
+        self._children[()].set(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase an unlabelled gauge"""
+        self._children[()].inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Decrease an unlabelled gauge"""
+        self._children[()].dec(amount)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read an unlabelled gauge from a function when the metrics are rendered"""
+        self._children[()].set_function(function)
+
+    def _samples(self) -> List[str]:
+        samples = []
+        for values, child in self._items():
+            try:
+                value = child.get()
+            except Exception as e:
+                logger.warning(f"Could not read gauge {self.name}: {e}")
+                continue
+            samples.append(f"{self.name}{_labels(self.labelnames, values)} {_format_value(value)}")
+        return samples
+
+
+class Histogram(_Metric):
+    """Distribution of observations in fixed cumulative buckets"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        upper = tuple(sorted(float(bucket) for bucket in buckets if not math.isinf(bucket)))
+        if not upper:
+            raise ValueError(f"{name} needs at least one finite bucket")
+        self.buckets = upper
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Record an observation on an unlabelled histogram"""
+        self._children[()].observe(value)
+
+    def _samples(self) -> List[str]:
+        samples = []
+        for values, child in self._items():
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for upper, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = f'le="{_format_value(upper)}"'
+                samples.append(f"{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}")
+            labels = _labels(self.labelnames, values)
+            samples.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            samples.append(f"{self.name}_count{labels} {cumulative}")
+        return samples
+
+
+class MetricsRegistry:
+    """Named collection of metric families rendered together"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Register a counter"""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Register a gauge"""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        """Register a histogram"""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        """Get a registered metric family by name"""
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """
+        Render all metrics
+
+        Returns:
+            Metrics in the Prometheus text exposition format
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+# Global registry and the service's instruments
+_registry = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = _registry.histogram(
+    "agents_http_request_duration_seconds",
+    "HTTP request latency by route template and status code",
+    ("method", "route", "status")
+)
+GRAPH_STEPS = _registry.counter(
+    "agents_graph_steps_total",
+    "Agent graph node executions",
+    ("node",)
+)
+TOOL_DURATION = _registry.histogram(
+    "agents_tool_duration_seconds",
+    "Tool call latency including queueing for the tool's concurrency limit",
+    ("tool",)
+)
+TOOL_CALLS = _registry.counter(
+    "agents_tool_calls_total",
+    "Tool calls by outcome (ok, error, timeout, deadline)",
+    ("tool", "status")
+)
+LLM_REQUEST_DURATION = _registry.histogram(
+    "agents_llm_request_duration_seconds",
+    "LLM call latency",
+    ("provider", "model")
+)
+LLM_TOKENS = _registry.counter(
+    "agents_llm_tokens_total",
+    "LLM tokens by direction (input, output); estimated when the provider reports no usage",
+    ("provider", "model", "direction")
+)
+LLM_ERRORS = _registry.counter(
+    "agents_llm_errors_total",
+    "LLM calls that raised an error",
+    ("provider", "model")
+)
+RAG_REQUEST_DURATION = _registry.histogram(
+    "agents_rag_request_duration_seconds",
+    "RAG service HTTP request latency by path and status code",
+    ("method", "path", "status")
+)
+STREAM_ACTIVE_CONNECTIONS = _registry.gauge(
+    "agents_stream_active_connections",
+    "Streaming chat responses currently open"
+)
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Get the global metrics registry"""
+    return _registry
+
+
+def route_template(scope: Dict[str, Any]) -> str:
+    """Path of a routed request with its path parameters put back as {name}"""
+    if "endpoint" not in scope:
+        return "<unmatched>"
+    path = scope["path"]
+    params = scope.get("path_params")
+    if params:
+        names = {str(value): name for name, value in params.items()}
+        path = "/".join(f"{{{names[part]}}}" if part in names else part for part in path.split("/"))
+    return path
+
+
+class PrometheusMiddleware:
+    """
+    ASGI middleware recording request latency per route
+
+    Requests are labelled with the matched route's path template (not the raw
+    path) and unmatched requests share one label, so the number of series
+    stays bounded. Streaming responses are
+    timed until the last frame is sent.
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], route_template(scope), status
+            ).observe(time.perf_counter() - started)
+
+
+class GraphMetricsCallback(BaseCallbackHandler):
+    """
+    Callback recording agent graph steps and LLM calls
+
+    Passed in the graph's run config, so it sees every node and every chat
+    model call made during a turn, including summaries and escalations.
+    Models that do not report their name are labelled with the agent's.
+    """
+
+    # Runs in the event loop instead of a thread pool; the handlers only update counters
+    run_inline = True
+    _MAX_PENDING = 1024
+
+    def __init__(self, provider: str, model: str):
+        """
+        Initialize the callback
+
+        Args:
+            provider: Provider label for models that do not report one
+            model: Model label for models that do not report one
+        """
+        self.provider = provider
+        self.model = model
+        # run id -> (start time, provider, model, prompt messages); calls cancelled
+        # mid-flight never end, so the oldest entries are dropped beyond a bound
+        self._pending: "OrderedDict[UUID, Tuple[float, str, str, Any]]" = OrderedDict()
+
+    def on_chain_start(
+        self,
+        serialized: Dict[str, Any],
+        inputs: Any,
+        *,
+        run_id: UUID,
+        tags: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> None:
+        # Graph nodes are the chains tagged with their superstep
+        if tags and metadata and any(tag.startswith("graph:step:") for tag in tags):
+            node = metadata.get("langgraph_node")
+            if node is not None and kwargs.get("name") == node:
+                GRAPH_STEPS.labels(node).inc()
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[Any]],
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> None:
+        metadata = metadata or {}
+        model = metadata.get("ls_model_name")
+        provider = metadata.get("ls_provider") if model else None
+        self._pending[run_id] = (time.perf_counter(), provider or self.provider, model or self.model, messages)
+        if len(self._pending) > self._MAX_PENDING:
+            self._pending.popitem(last=False)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return
+        started, provider, model, messages = pending
+        LLM_REQUEST_DURATION.labels(provider, model).observe(time.perf_counter() - started)
+        input_tokens, output_tokens = self._usage(response, messages)
+        LLM_TOKENS.labels(provider, model, "input").inc(input_tokens)
+        LLM_TOKENS.labels(provider, model, "output").inc(output_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return
+        started, provider, model, _ = pending
+        LLM_REQUEST_DURATION.labels(provider, model).observe(time.perf_counter() - started)
+        LLM_ERRORS.labels(provider, model).inc()
+
+    @staticmethod
+    def _usage(response: LLMResult, messages: List[List[Any]]) -> Tuple[int, int]:
+        """Input and output tokens reported by the provider, or estimated"""
+        generation = response.generations[0][0] if response.generations and response.generations[0] else None
+        message = getattr(generation, "message", None)
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        if token_usage:
+            return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+        input_tokens = count_tokens(messages[0]) if messages else 0
+        output_tokens = estimate_tokens(generation.text) if generation is not None else 0
+        return input_tokens, output_tokens
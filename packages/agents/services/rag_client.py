@@ -4,10 +4,20 @@ RAG Client for Python Agents Service
 This module provides a client for communicating with the external RAG service.
 """
 
+import asyncio
 import httpx
-from typing import Optional, List, Dict, Any
+import json
+import time
+from typing import Optional, List, Dict, Any, Awaitable, Tuple
 from pydantic import BaseModel, Field
 from config import get_settings
+from services.cache import SingleFlight, TTLCache
+from services.deadline import DeadlineExceeded, cap_timeout, current_deadline, within_deadline
+from services.prometheus import RAG_REQUEST_DURATION
+from services.tracing import current_span, span_context, start_span
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class RagDocument(BaseModel):
@@ -37,6 +47,18 @@ class RagQueryResponse(BaseModel):
     processing_time: Optional[float] = None
 
 
+class RagBatchItem(BaseModel):
+    """Result of a single query within a batch"""
+    query: str
+    response: Optional[RagQueryResponse] = None
+    error: Optional[str] = None
+    
+    @property
+    def ok(self) -> bool:
+        """Whether the query succeeded"""
+        return self.error is None
+
+
 class RagRetrievalParams(BaseModel):
     """RAG retrieval parameters"""
     document_ids: List[str]
@@ -72,12 +94,70 @@ class RagClient:
         self,
         base_url: Optional[str] = None,
         api_key: Optional[str] = None,
-        timeout: Optional[int] = None
+        timeout: Optional[int] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
     ):
         settings = get_settings()
         self.base_url = base_url or settings.RAG_SERVICE_URL or "http://rag-service:8080"
         self.api_key = api_key or settings.RAG_SERVICE_API_KEY
         self.timeout = (timeout or settings.RAG_SERVICE_TIMEOUT) / 1000.0  # Convert ms to seconds
+        self.limits = httpx.Limits(
+            max_connections=settings.RAG_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.RAG_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.RAG_HTTP_KEEPALIVE_EXPIRY
+        )
+        self.http2 = settings.RAG_HTTP2 and self._http2_available()
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        
+        # Pool statistics
+        self._requests_total = 0
+        self._requests_in_flight = 0
+        self._connections_opened = 0
+        
+        # Query result cache, invalidated when the index's last_updated changes
+        self._cache: Optional[TTLCache] = None
+        if settings.RAG_CACHE_ENABLED:
+            self._cache = TTLCache(max_size=settings.RAG_CACHE_MAX_SIZE, default_ttl=settings.RAG_CACHE_TTL)
+        self._namespace_ttls = self._parse_namespace_ttls(settings.RAG_CACHE_NAMESPACE_TTLS)
+        self._index_check_interval = settings.RAG_CACHE_INDEX_CHECK_INTERVAL
+        self._index_version: Optional[str] = None
+        self._index_checked_at = 0.0
+        self._index_check_task: Optional[asyncio.Task] = None
+        self._cache_generation = 0
+        
+        # Coalescing of identical in-flight queries
+        self._single_flight: Optional[SingleFlight] = SingleFlight() if settings.RAG_COALESCE_ENABLED else None
+        
+        # Batched queries; None means batch support has not been probed yet
+        self.batch_max_concurrency = max(1, settings.RAG_BATCH_MAX_CONCURRENCY)
+        self._batch_supported: Optional[bool] = None if settings.RAG_BATCH_ENABLED else False
+        self._batch_requests = 0
+        self._batch_fallbacks = 0
+        
+    @staticmethod
+    def _parse_namespace_ttls(value: str) -> Dict[str, float]:
+        """Parse "namespace=seconds" pairs separated by commas"""
+        ttls: Dict[str, float] = {}
+        for item in value.split(","):
+            namespace, sep, ttl = item.partition("=")
+            if not sep:
+                continue
+            try:
+                ttls[namespace.strip()] = float(ttl)
+            except ValueError:
+                logger.warning(f"Ignoring invalid RAG cache TTL for namespace '{namespace.strip()}': {ttl}")
+        return ttls
+    
+    @staticmethod
+    def _http2_available() -> bool:
+        """Check whether the optional h2 package needed for HTTP/2 is installed"""
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            logger.warning("RAG_HTTP2 is enabled but the 'h2' package is not installed; using HTTP/1.1")
+            return False
         
     def _get_headers(self) -> Dict[str, str]:
         """Build HTTP headers for requests"""
@@ -90,10 +170,196 @@ class RagClient:
             
         return headers
     
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Get the shared pooled HTTP client, creating it on first use
+        
+        Returns:
+            Shared httpx.AsyncClient instance
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self._get_headers(),
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                transport=self._transport
+            )
+        return self._client
+    
+    async def start(self) -> None:
+        """Open the shared connection pool (called on application startup)"""
+        self._get_client()
+        logger.info(
+            f"RAG client pool ready for {self.base_url} "
+            f"(max_connections={self.limits.max_connections}, "
+            f"max_keepalive={self.limits.max_keepalive_connections}, http2={self.http2})"
+        )
+    
+    async def aclose(self) -> None:
+        """Close the shared connection pool (called on application shutdown)"""
+        if self._index_check_task is not None and not self._index_check_task.done():
+            self._index_check_task.cancel()
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+    
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """httpcore trace hook used to count newly established connections"""
+        if event_name == "connection.connect_tcp.complete":
+            self._connections_opened += 1
+    
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """
+        Send a request over the shared pooled client
+        
+        Args:
+            method: HTTP method
+            path: Path relative to the RAG service base URL
+            **kwargs: Extra arguments passed to httpx
+            
+        Returns:
+            The successful HTTP response
+            
+        Raises:
+            httpx.HTTPError: If the request fails
+            DeadlineExceeded: If the request deadline passes first
+        """
+        client = self._get_client()
+        # Never wait past the deadline of the request being served
+        kwargs.setdefault("timeout", cap_timeout(self.timeout))
+        self._requests_total += 1
+        self._requests_in_flight += 1
+        status = "error"
+        started = time.perf_counter()
+        try:
+            with start_span(f"rag {method} {path}", {"http.method": method, "http.path": path}) as span:
+                if span is not None:
+                    # Continue the trace in the RAG service
+                    kwargs["headers"] = {**kwargs.get("headers", {}), "traceparent": span.traceparent}
+                try:
+                    response = await within_deadline(
+                        client.request(method, path, extensions={"trace": self._trace}, **kwargs)
+                    )
+                except httpx.TimeoutException:
+                    # The httpx timeout is capped to the same budget and often fires first
+                    deadline = current_deadline()
+                    if deadline is not None and deadline.expired:
+                        raise DeadlineExceeded("Request deadline exceeded") from None
+                    raise
+                status = response.status_code
+                if span is not None:
+                    span.set_attribute("http.status_code", status)
+                response.raise_for_status()
+                return response
+        finally:
+            self._requests_in_flight -= 1
+            RAG_REQUEST_DURATION.labels(method, path, status).observe(time.perf_counter() - started)
+    
+    @staticmethod
+    def _cache_key(params: RagQueryParams) -> Tuple[Any, ...]:
+        """
+        Build a cache key from normalized query parameters
+        
+        Queries are compared case-insensitively with collapsed whitespace,
+        and filters are compared independently of key order.
+        """
+        query = " ".join(params.query.split()).lower()
+        filters = json.dumps(params.filters, sort_keys=True, default=str) if params.filters else ""
+        return (params.namespace or "", query, params.top_k, params.threshold, filters)
+    
+    def _cache_ttl(self, namespace: Optional[str]) -> Optional[float]:
+        """Get the TTL for a namespace (None means the cache default)"""
+        return self._namespace_ttls.get(namespace or "")
+    
+    def invalidate_cache(self) -> None:
+        """Drop all cached query results"""
+        if self._cache is not None:
+            self._cache.clear()
+        self._cache_generation += 1
+    
+    def _observe_index_version(self, last_updated: Optional[str]) -> None:
+        """Invalidate the cache when the index reports a new last_updated value"""
+        self._index_checked_at = time.monotonic()
+        if last_updated is None:
+            return
+        if self._index_version is not None and last_updated != self._index_version:
+            logger.info(f"RAG index updated at {last_updated}; invalidating query cache")
+            self.invalidate_cache()
+        self._index_version = last_updated
+    
+    def _maybe_check_index(self) -> None:
+        """Refresh the index version in the background once the check interval has elapsed"""
+        if self._index_check_interval <= 0:
+            return
+        if time.monotonic() - self._index_checked_at < self._index_check_interval:
+            return
+        if self._index_check_task is not None and not self._index_check_task.done():
+            return
+        self._index_checked_at = time.monotonic()
+        self._index_check_task = asyncio.create_task(self._refresh_index_version())
+    
+    async def _refresh_index_version(self) -> None:
+        """Fetch index stats so a changed last_updated invalidates the cache"""
+        try:
+            await self.get_index_stats()
+        except Exception as e:
+            logger.debug(f"RAG index version check failed: {e}")
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """
+        Get connection pool statistics
+        
+        Returns:
+            Dictionary with pool configuration and usage counters
+        """
+        stats: Dict[str, Any] = {
+            "open": self._client is not None and not self._client.is_closed,
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "keepalive_expiry": self.limits.keepalive_expiry,
+            "requests_total": self._requests_total,
+            "requests_in_flight": self._requests_in_flight,
+            "connections_opened": self._connections_opened,
+        }
+        
+        # httpcore does not expose pool state publicly; report it when reachable
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is not None:
+            stats["connections"] = len(connections)
+            stats["idle_connections"] = sum(1 for conn in connections if conn.is_idle())
+        
+        return stats
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get client statistics
+        
+        Returns:
+            Dictionary with pool and cache statistics
+        """
+        return {
+            "pool": self.get_pool_stats(),
+            "cache": self._cache.get_stats() if self._cache is not None else {"enabled": False},
+            "coalescing": self._single_flight.get_stats() if self._single_flight is not None else {"enabled": False},
+            "batching": {
+                "supported": self._batch_supported,
+                "batch_requests": self._batch_requests,
+                "fallbacks": self._batch_fallbacks,
+            },
+        }
+    
     async def query(self, params: RagQueryParams) -> RagQueryResponse:
         """
         Query the RAG service for relevant documents
         
+        Results are served from the in-process cache when an identical
+        normalized query was answered recently, and concurrent identical
+        queries share a single upstream request.
+        
         Args:
             params: Query parameters
             
@@ -103,22 +369,221 @@ class RagClient:
         Raises:
             httpx.HTTPError: If the request fails
         """
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.base_url}/api/query",
-                json=params.model_dump(),
-                headers=self._get_headers()
+        key = self._cache_key(params)
+        if self._cache is not None:
+            self._maybe_check_index()
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+        
+        return await self._query_uncached(params, key)
+    
+    async def _query_uncached(self, params: RagQueryParams, key: Tuple[Any, ...]) -> RagQueryResponse:
+        """
+        Query the RAG service without consulting the cache, coalescing identical calls
+        
+        Args:
+            params: Query parameters
+            key: Normalized cache key for params
+            
+        Returns:
+            Query response with relevant documents
+        """
+        if self._single_flight is None:
+            return await self._fetch_and_cache(params, key)
+        # The shared request runs free of any caller's deadline and is traced under the
+        # caller that started it; each caller's own deadline only bounds its wait
+        joining = self._single_flight.in_flight(key)
+        flight = self._single_flight.do(key, lambda: self._fetch_and_cache(params, key), span_context(current_span()))
+        if not joining:
+            return await self._wait_for_flight(flight)
+        # The upstream request belongs to the trace that started it; record the wait in this one
+        with start_span("rag coalesced query", {"rag.query": params.query}):
+            return await self._wait_for_flight(flight)
+    
+    @staticmethod
+    async def _wait_for_flight(flight: Awaitable[RagQueryResponse]) -> RagQueryResponse:
+        """Wait for a shared query within the caller's own deadline"""
+        try:
+            return await within_deadline(flight)
+        except httpx.TimeoutException:
+            # The shared request timed out after this caller's deadline had already passed
+            deadline = current_deadline()
+            if deadline is not None and deadline.expired:
+                raise DeadlineExceeded("Request deadline exceeded") from None
+            raise
+    
+    async def _fetch_and_cache(self, params: RagQueryParams, key: Tuple[Any, ...]) -> RagQueryResponse:
+        """
+        Fetch a query result and store it in the cache
+        
+        Args:
+            params: Query parameters
+            key: Normalized cache key for params
+            
+        Returns:
+            Query response with relevant documents
+        """
+        generation = self._cache_generation
+        result = await self._fetch_query(params)
+        # Skip storing results fetched before an invalidation
+        if self._cache is not None and generation == self._cache_generation:
+            self._cache.set(key, result, ttl=self._cache_ttl(params.namespace))
+        return result
+    
+    async def _fetch_query(self, params: RagQueryParams) -> RagQueryResponse:
+        """
+        Send a query to the RAG service, bypassing the cache
+        
+        Args:
+            params: Query parameters
+            
+        Returns:
+            Query response with relevant documents
+        """
+        response = await self._request("POST", "/api/query", json=params.model_dump())
+        return self._normalize_query_response(params, response.json())
+    
+    def _normalize_query_response(self, params: RagQueryParams, data: Dict[str, Any]) -> RagQueryResponse:
+        """
+        Normalize query response format from various RAG service response formats
+        
+        Args:
+            params: Query parameters the response answers
+            data: Raw response data
+            
+        Returns:
+            Normalized RagQueryResponse
+        """
+        return RagQueryResponse(
+            documents=[self._normalize_document(doc) for doc in (data.get("documents") or data.get("results") or [])],
+            query=params.query,
+            total_results=data.get("total_results") or data.get("totalResults") or len(data.get("documents", [])),
+            processing_time=data.get("processing_time") or data.get("processingTime")
+        )
+    
+    async def query_many(self, params_list: List[RagQueryParams]) -> List[RagBatchItem]:
+        """
+        Run several queries, batching them into one upstream request when possible
+        
+        Cached results are served locally and duplicate queries are sent once.
+        If the RAG service has no batch endpoint, the remaining queries are sent
+        in parallel with bounded concurrency.
+        
+        Args:
+            params_list: Query parameters for each query
+            
+        Returns:
+            One result per query, in input order; failures are reported per item
+        """
+        items: List[Optional[RagBatchItem]] = [None] * len(params_list)
+        pending: Dict[Tuple[Any, ...], List[int]] = {}
+        
+        for index, params in enumerate(params_list):
+            key = self._cache_key(params)
+            cached = self._cache.get(key) if self._cache is not None else None
+            if cached is not None:
+                items[index] = RagBatchItem(query=params.query, response=cached)
+            else:
+                pending.setdefault(key, []).append(index)
+        
+        if pending:
+            unique = [params_list[indices[0]] for indices in pending.values()]
+            results = None
+            if self._batch_supported is not False:
+                results = await self._query_batch(unique)
+            if results is None:
+                results = await self._query_parallel(unique, list(pending.keys()))
+            
+            for indices, result in zip(pending.values(), results):
+                for index in indices:
+                    items[index] = result.model_copy(update={"query": params_list[index].query})
+        
+        return items
+    
+    async def _query_batch(self, params_list: List[RagQueryParams]) -> Optional[List[RagBatchItem]]:
+        """
+        Send queries in one request to the RAG service batch endpoint
+        
+        Args:
+            params_list: Distinct, uncached queries
+            
+        Returns:
+            Per-query results, or None if the service does not support batching
+        """
+        generation = self._cache_generation
+        try:
+            response = await self._request(
+                "POST",
+                "/api/query/batch",
+                json={"queries": [params.model_dump() for params in params_list]}
             )
-            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code in (404, 405, 501):
+                logger.info("RAG service does not support batch queries; using parallel requests")
+                self._batch_supported = False
+                return None
+            return [RagBatchItem(query=params.query, error=str(e)) for params in params_list]
+        except Exception as e:
+            return [RagBatchItem(query=params.query, error=str(e) or type(e).__name__) for params in params_list]
+        
+        try:
             data = response.json()
+        except ValueError as e:
+            return [RagBatchItem(query=params.query, error=f"Invalid batch response: {e}") for params in params_list]
+        raw_results = data.get("results") if isinstance(data, dict) else None
+        if not isinstance(raw_results, list):
+            return [RagBatchItem(query=params.query, error="Invalid batch response: no results list") for params in params_list]
+        
+        self._batch_supported = True
+        self._batch_requests += 1
+        
+        items = []
+        for index, params in enumerate(params_list):
+            raw = raw_results[index] if index < len(raw_results) else {"error": "Missing result in batch response"}
+            if not isinstance(raw, dict):
+                items.append(RagBatchItem(query=params.query, error="Invalid result in batch response"))
+                continue
+            if raw.get("error"):
+                items.append(RagBatchItem(query=params.query, error=str(raw["error"])))
+                continue
+            try:
+                result = self._normalize_query_response(params, raw)
+            except Exception as e:
+                items.append(RagBatchItem(query=params.query, error=f"Invalid result in batch response: {e}"))
+                continue
+            if self._cache is not None and generation == self._cache_generation:
+                self._cache.set(self._cache_key(params), result, ttl=self._cache_ttl(params.namespace))
+            items.append(RagBatchItem(query=params.query, response=result))
+        return items
+    
+    async def _query_parallel(
+        self,
+        params_list: List[RagQueryParams],
+        keys: List[Tuple[Any, ...]]
+    ) -> List[RagBatchItem]:
+        """
+        Send queries as individual requests with bounded concurrency
+        
+        Args:
+            params_list: Distinct, uncached queries
+            keys: Normalized cache keys for params_list
             
-            # Normalize response format
-            return RagQueryResponse(
-                documents=[self._normalize_document(doc) for doc in (data.get("documents") or data.get("results") or [])],
-                query=params.query,
-                total_results=data.get("total_results") or data.get("totalResults") or len(data.get("documents", [])),
-                processing_time=data.get("processing_time") or data.get("processingTime")
-            )
+        Returns:
+            Per-query results in input order
+        """
+        self._batch_fallbacks += 1
+        semaphore = asyncio.Semaphore(self.batch_max_concurrency)
+        
+        async def run(params: RagQueryParams, key: Tuple[Any, ...]) -> RagBatchItem:
+            async with semaphore:
+                try:
+                    return RagBatchItem(query=params.query, response=await self._query_uncached(params, key))
+                except Exception as e:
+                    # Deadlines and malformed responses fail this query, not the whole batch
+                    return RagBatchItem(query=params.query, error=str(e) or type(e).__name__)
+        
+        return list(await asyncio.gather(*[run(params, key) for params, key in zip(params_list, keys)]))
     
     async def retrieve(self, params: RagRetrievalParams) -> RagRetrievalResponse:
         """
@@ -133,19 +598,13 @@ class RagClient:
         Raises:
             httpx.HTTPError: If the request fails
         """
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.base_url}/api/retrieve",
-                json=params.model_dump(),
-                headers=self._get_headers()
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            return RagRetrievalResponse(
-                documents=[self._normalize_document(doc) for doc in data.get("documents", [])],
-                not_found=data.get("not_found") or data.get("notFound")
-            )
+        response = await self._request("POST", "/api/retrieve", json=params.model_dump())
+        data = response.json()
+        
+        return RagRetrievalResponse(
+            documents=[self._normalize_document(doc) for doc in data.get("documents", [])],
+            not_found=data.get("not_found") or data.get("notFound")
+        )
     
     async def search(
         self,
@@ -188,13 +647,8 @@ class RagClient:
         Raises:
             httpx.HTTPError: If the request fails
         """
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.get(
-                f"{self.base_url}/health",
-                headers=self._get_headers()
-            )
-            response.raise_for_status()
-            return RagHealthResponse(**response.json())
+        response = await self._request("GET", "/health")
+        return RagHealthResponse(**response.json())
     
     async def get_index_stats(self) -> RagIndexStats:
         """
@@ -206,20 +660,17 @@ class RagClient:
         Raises:
             httpx.HTTPError: If the request fails
         """
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.get(
-                f"{self.base_url}/api/stats",
-                headers=self._get_headers()
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            return RagIndexStats(
-                total_documents=data.get("total_documents") or data.get("totalDocuments") or 0,
-                namespaces=data.get("namespaces"),
-                last_updated=data.get("last_updated"),
-                index_size=data.get("index_size") or data.get("indexSize")
-            )
+        response = await self._request("GET", "/api/stats")
+        data = response.json()
+        
+        stats = RagIndexStats(
+            total_documents=data.get("total_documents") or data.get("totalDocuments") or 0,
+            namespaces=data.get("namespaces"),
+            last_updated=data.get("last_updated") or data.get("lastUpdated"),
+            index_size=data.get("index_size") or data.get("indexSize")
+        )
+        self._observe_index_version(stats.last_updated)
+        return stats
     
     async def is_available(self) -> bool:
         """
@@ -269,3 +720,11 @@ def get_rag_client() -> RagClient:
     if _rag_client is None:
         _rag_client = RagClient()
     return _rag_client
+
+
+async def close_rag_client() -> None:
+    """
+    Close the global RAG client's connection pool, if it was created
+    """
+    if _rag_client is not None:
+        await _rag_client.aclose()
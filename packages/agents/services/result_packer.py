@@ -0,0 +1,274 @@
+"""
+Tool Result Packer
+
+This module fits retrieved documents into a per-tool token budget: results
+are ranked by score, near-duplicate chunks (e.g. overlapping chunks of the
+same document) are dropped, and the highest-scoring content is packed until
+the budget is used, truncating the last result at a word boundary instead of
+cutting every result to a fixed number of characters.
+"""
+
+import logging
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from config import get_settings
+from services.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+INDENT = "   "
+
+
+def parse_token_budgets(value: str) -> Dict[str, int]:
+    """Parse "tool=tokens" pairs separated by commas"""
+    budgets: Dict[str, int] = {}
+    for item in value.split(","):
+        tool, sep, tokens = item.partition("=")
+        if not sep:
+            continue
+        try:
+            budgets[tool.strip()] = int(tokens)
+        except ValueError:
+            logger.warning(f"Ignoring invalid token budget for tool '{tool.strip()}': {tokens}")
+    return budgets
+
+
+def _shingles(text: str, size: int = 3) -> frozenset:
+    """Word n-grams of a text (single words for very short texts)"""
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return frozenset(words)
+    return frozenset(" ".join(words[i:i + size]) for i in range(len(words) - size + 1))
+
+
+def overlap(a: frozenset, b: frozenset) -> float:
+    """Fraction of the smaller shingle set contained in the other"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """Cut text to about the given number of tokens at a word boundary"""
+    limit = max(0, tokens * CHARS_PER_TOKEN - 3)
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit + 1)
+    return text[:cut if cut > limit // 2 else limit].rstrip(" ,;:.") + "..."
+
+
+@dataclass
+class PackItem:
+    """One result to be packed, rendered as a numbered block"""
+    title: str
+    content: str
+    score: float = 0.0
+    # Lines shown before and after the content
+    before: List[str] = field(default_factory=list)
+    after: List[str] = field(default_factory=list)
+
+    def render(self, number: int, content: Optional[str] = None) -> List[str]:
+        """Render the block, optionally with shortened content"""
+        lines = [f"\n{number}. {self.title}"]
+        lines.extend(f"{INDENT}{line}" for line in self.before)
+        lines.append(f"{INDENT}{self.content if content is None else content}")
+        lines.extend(f"{INDENT}{line}" for line in self.after)
+        return lines
+
+
+@dataclass
+class PackResult:
+    """Packed tool output and what was left out"""
+    text: str
+    kept: int = 0
+    duplicates: int = 0
+    truncated: int = 0
+    omitted: int = 0
+    # Tokens of all results rendered in full versus tokens actually returned
+    tokens_in: int = 0
+    tokens_out: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_in - self.tokens_out)
+
+
+class _PackStats:
+    """Per-tool packing counters"""
+
+    __slots__ = ("calls", "tokens_in", "tokens_out", "duplicates", "truncated", "omitted")
+
+    def __init__(self):
+        self.calls = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.duplicates = 0
+        self.truncated = 0
+        self.omitted = 0
+
+
+class ResultPacker:
+    """Packs ranked results into per-tool token budgets"""
+
+    def __init__(
+        self,
+        default_budget: int = 1000,
+        budgets: Optional[Dict[str, int]] = None,
+        duplicate_threshold: float = 0.8,
+        min_content_tokens: int = 40
+    ):
+        """
+        Initialize the packer
+
+        Args:
+            default_budget: Output token budget for tools without an override
+            budgets: Per-tool budget overrides
+            duplicate_threshold: Shingle overlap above which a lower-scoring result is dropped
+            min_content_tokens: Smallest truncated content worth including
+        """
+        self.default_budget = default_budget
+        self.budgets = dict(budgets or {})
+        self.duplicate_threshold = duplicate_threshold
+        self.min_content_tokens = min_content_tokens
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _PackStats] = {}
+
+    def budget_for(self, tool: str) -> int:
+        """Token budget of a tool"""
+        return self.budgets.get(tool, self.default_budget)
+
+    def pack(
+        self,
+        tool: str,
+        heading: Callable[[int], str],
+        items: Sequence[PackItem],
+        budget: Optional[int] = None
+    ) -> PackResult:
+        """
+        Pack results into a tool's token budget
+
+        Args:
+            tool: Tool name (selects the budget and keys the statistics)
+            heading: Builds the first line from the number of results kept
+            items: Results in any order
+            budget: Optional budget overriding the tool's configured one
+
+        Returns:
+            PackResult with the output text and packing counts
+        """
+        budget = self.budget_for(tool) if budget is None else budget
+        ranked = sorted(items, key=lambda item: item.score, reverse=True)
+        result = PackResult(text="")
+        full_tokens = estimate_tokens(heading(len(ranked)))
+        for number, item in enumerate(ranked, 1):
+            full_tokens += estimate_tokens("\n".join(item.render(number)))
+        result.tokens_in = full_tokens
+
+        # Drop near-duplicates of higher-scoring results
+        unique: List[PackItem] = []
+        seen: List[frozenset] = []
+        for item in ranked:
+            shingles = _shingles(item.content)
+            if any(overlap(shingles, other) >= self.duplicate_threshold for other in seen):
+                result.duplicates += 1
+                continue
+            unique.append(item)
+            seen.append(shingles)
+
+        # Heading length only depends on the count's digits; reserve it up front
+        used = estimate_tokens(heading(len(unique)))
+        blocks: List[List[str]] = []
+        for item in unique:
+            number = len(blocks) + 1
+            block = item.render(number)
+            cost = estimate_tokens("\n".join(block))
+            if used + cost <= budget:
+                blocks.append(block)
+                used += cost
+                continue
+            # Fit a shortened copy of the content into what is left, then stop
+            frame = estimate_tokens("\n".join(item.render(number, "")))
+            room = budget - used - frame
+            if room >= self.min_content_tokens:
+                short = truncate_to_tokens(item.content, room)
+                block = item.render(number, short)
+                blocks.append(block)
+                used += estimate_tokens("\n".join(block))
+                result.truncated += 1
+            break
+
+        result.kept = len(blocks)
+        result.omitted = len(unique) - result.kept
+        lines = [heading(result.kept)]
+        for block in blocks:
+            lines.extend(block)
+        if result.omitted:
+            lines.append(f"\n({result.omitted} lower-ranked results omitted to fit the output budget)")
+        result.text = "\n".join(lines)
+        result.tokens_out = estimate_tokens(result.text)
+        self._record(tool, result)
+        return result
+
+    def _record(self, tool: str, result: PackResult) -> None:
+        """Update per-tool statistics"""
+        with self._lock:
+            stats = self._stats.setdefault(tool, _PackStats())
+            stats.calls += 1
+            stats.tokens_in += result.tokens_in
+            stats.tokens_out += result.tokens_out
+            stats.duplicates += result.duplicates
+            stats.truncated += result.truncated
+            stats.omitted += result.omitted
+        logger.debug(
+            f"Packed {tool} output: {result.kept} results, {result.tokens_out} tokens "
+            f"({result.tokens_saved} saved, {result.duplicates} duplicates dropped)"
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get packing statistics
+
+        Returns:
+            Dictionary with per-tool budgets, token counts and tokens saved
+        """
+        with self._lock:
+            return {
+                tool: {
+                    "budget": self.budget_for(tool),
+                    "calls": stats.calls,
+                    "tokens_in": stats.tokens_in,
+                    "tokens_out": stats.tokens_out,
+                    "tokens_saved": max(0, stats.tokens_in - stats.tokens_out),
+                    "avg_tokens_saved": round(max(0, stats.tokens_in - stats.tokens_out) / stats.calls, 1),
+                    "duplicates_dropped": stats.duplicates,
+                    "truncated": stats.truncated,
+                    "omitted": stats.omitted,
+                }
+                for tool, stats in self._stats.items()
+            }
+
+
+# Global result packer
+_result_packer: Optional[ResultPacker] = None
+
+
+def get_result_packer() -> ResultPacker:
+    """
+    Get or create the global result packer
+
+    Returns:
+        ResultPacker configured from settings
+    """
+    global _result_packer
+    if _result_packer is None:
+        settings = get_settings()
+        _result_packer = ResultPacker(
+            default_budget=settings.TOOL_OUTPUT_TOKEN_BUDGET,
+            budgets=parse_token_budgets(settings.TOOL_OUTPUT_TOKEN_BUDGETS),
+            duplicate_threshold=settings.TOOL_OUTPUT_DUPLICATE_THRESHOLD
+        )
+    return _result_packer
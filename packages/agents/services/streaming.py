@@ -0,0 +1,308 @@
+"""
+Server-Sent Events helpers for streaming agent responses
+
+This module coalesces token-level agent events into fewer SSE frames,
+interleaves keep-alive heartbeats, serializes frames efficiently and stops
+the underlying agent run when the client disconnects.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+from pydantic import BaseModel, Field
+from config import get_settings
+from services.prometheus import STREAM_ACTIVE_CONNECTIONS
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_FRAME = b": keep-alive\n\n"
+DONE_FRAME = b"data: [DONE]\n\n"
+
+
+class StreamOptions(BaseModel):
+    """Per-request streaming options"""
+    flush_interval_ms: Optional[int] = Field(
+        default=None, ge=0, le=5000,
+        description="Maximum time content is buffered before a frame is sent"
+    )
+    max_buffer_chars: Optional[int] = Field(
+        default=None, ge=1, le=65536,
+        description="Buffered content size that forces a frame to be sent"
+    )
+    heartbeat_interval_ms: Optional[int] = Field(
+        default=None, ge=0,
+        description="Idle time before a keep-alive frame is sent (0 disables)"
+    )
+
+    def resolved(self) -> "StreamOptions":
+        """Fill unset options from the service settings"""
+        settings = get_settings()
+        return StreamOptions(
+            flush_interval_ms=settings.STREAM_FLUSH_INTERVAL_MS if self.flush_interval_ms is None else self.flush_interval_ms,
+            max_buffer_chars=settings.STREAM_MAX_BUFFER_CHARS if self.max_buffer_chars is None else self.max_buffer_chars,
+            heartbeat_interval_ms=(
+                settings.STREAM_HEARTBEAT_INTERVAL_MS
+                if self.heartbeat_interval_ms is None else self.heartbeat_interval_ms
+            ),
+        )
+
+
+def dumps(data: Any) -> bytes:
+    """Serialize data to compact JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def encode_event(event: Dict[str, Any]) -> bytes:
+    """
+    Encode an agent event as an SSE frame
+
+    Args:
+        event: Event dictionary with a "type" key
+
+    Returns:
+        Encoded frame; heartbeats are sent as SSE comments
+    """
+    if event["type"] == "heartbeat":
+        return HEARTBEAT_FRAME
+    return b"data: " + dumps(event) + b"\n\n"
+
+
+async def coalesce_events(
+    events: AsyncIterator[Dict[str, Any]],
+    options: Optional[StreamOptions] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Merge consecutive content events and interleave heartbeats
+
+    The first content chunk is forwarded immediately to keep time-to-first-byte
+    low. Later chunks are buffered until the flush interval elapses, the buffer
+    reaches max_buffer_chars or a non-content event arrives.
+
+    Args:
+        events: Agent events as produced by SupervisorAgent.stream_chat
+        options: Streaming options (defaults from settings)
+
+    Yields:
+        Coalesced events plus {"type": "heartbeat"} while the source is idle
+    """
+    options = (options or StreamOptions()).resolved()
+    flush_interval = options.flush_interval_ms / 1000.0
+    heartbeat_interval = options.heartbeat_interval_ms / 1000.0
+
+    iterator = events.__aiter__()
+    buffer: list[str] = []
+    buffered_chars = 0
+    sent_content = False
+    loop = asyncio.get_running_loop()
+    last_flush = last_emit = loop.time()
+    next_event: Optional[asyncio.Future] = None
+
+    def flush() -> Dict[str, Any]:
+        nonlocal buffered_chars, last_flush, last_emit
+        event = {"type": "content", "data": "".join(buffer)}
+        buffer.clear()
+        buffered_chars = 0
+        last_flush = last_emit = loop.time()
+        return event
+
+    try:
+        while True:
+            if next_event is None:
+                next_event = asyncio.ensure_future(iterator.__anext__())
+
+            now = loop.time()
+            deadlines = []
+            if buffer:
+                deadlines.append(last_flush + flush_interval)
+            if heartbeat_interval > 0:
+                deadlines.append(last_emit + heartbeat_interval)
+            timeout = max(0.0, min(deadlines) - now) if deadlines else None
+
+            done, _ = await asyncio.wait({next_event}, timeout=timeout)
+            if not done:
+                if buffer and loop.time() >= last_flush + flush_interval:
+                    yield flush()
+                elif heartbeat_interval > 0 and loop.time() >= last_emit + heartbeat_interval:
+                    last_emit = loop.time()
+                    yield {"type": "heartbeat"}
+                continue
+
+            try:
+                event = next_event.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                next_event = None
+
+            if event.get("type") == "content":
+                buffer.append(event["data"])
+                buffered_chars += len(event["data"])
+                if not sent_content or buffered_chars >= options.max_buffer_chars or flush_interval == 0:
+                    sent_content = True
+                    yield flush()
+                continue
+
+            if buffer:
+                yield flush()
+            last_emit = loop.time()
+            yield event
+
+        if buffer:
+            yield flush()
+    finally:
+        if next_event is not None and not next_event.done():
+            next_event.cancel()
+            await asyncio.gather(next_event, return_exceptions=True)
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+class StreamStats:
+    """Counters for streaming sessions, including work abandoned by disconnects"""
+
+    def __init__(self):
+        self.active = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.frames_sent = 0
+        self.abandoned_seconds = 0.0
+        self.abandoned_content_chars = 0
+        self.abandoned_tool_calls = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get streaming statistics
+
+        Returns:
+            Dictionary with session counts and wasted-work totals for cancelled streams
+        """
+        return {
+            "active": self.active,
+            "started": self.started,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "frames_sent": self.frames_sent,
+            "abandoned_seconds": round(self.abandoned_seconds, 3),
+            "abandoned_content_chars": self.abandoned_content_chars,
+            "abandoned_tool_calls": self.abandoned_tool_calls,
+        }
+
+
+_stream_stats = StreamStats()
+STREAM_ACTIVE_CONNECTIONS.set_function(lambda: _stream_stats.active)
+
+
+def get_stream_stats() -> StreamStats:
+    """Get the global streaming statistics"""
+    return _stream_stats
+
+
+_END = object()
+
+
+async def stream_sse(
+    events: AsyncIterator[Dict[str, Any]],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    options: Optional[StreamOptions] = None,
+    poll_interval: Optional[float] = None
+) -> AsyncIterator[bytes]:
+    """
+    Stream agent events as SSE frames, cancelling the agent run on disconnect
+
+    The agent run is driven by a separate task so it can be cancelled as soon
+    as the client goes away, even while it is waiting on an LLM call, a tool or
+    a RAG request. Cancellation also happens if the response iterator itself
+    is closed or cancelled before the run finishes.
+
+    Args:
+        events: Agent events as produced by SupervisorAgent.stream_chat
+        is_disconnected: Coroutine function reporting whether the client left
+        options: Streaming options (defaults from settings)
+        poll_interval: Seconds between disconnect checks (defaults from settings)
+
+    Yields:
+        Encoded SSE frames, ending with the [DONE] frame
+    """
+    if poll_interval is None:
+        poll_interval = get_settings().STREAM_DISCONNECT_POLL_MS / 1000.0
+    stats = _stream_stats
+    queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+    progress = {"content_chars": 0, "tools_started": 0, "tools_ended": 0}
+    started_at = time.monotonic()
+
+    async def pump() -> None:
+        try:
+            async for event in coalesce_events(events, options):
+                kind = event["type"]
+                if kind == "content":
+                    progress["content_chars"] += len(event["data"])
+                elif kind == "tool_start":
+                    progress["tools_started"] += 1
+                elif kind == "tool_end":
+                    progress["tools_ended"] += 1
+                await queue.put(encode_event(event))
+        except Exception as e:
+            await queue.put(e)
+        else:
+            await queue.put(_END)
+
+    stats.active += 1
+    stats.started += 1
+    pump_task = asyncio.create_task(pump())
+    finished = False
+    last_check = time.monotonic()
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            try:
+                while True:
+                    timeout = max(0.0, last_check + poll_interval - time.monotonic())
+                    done, _ = await asyncio.wait({getter}, timeout=timeout)
+                    if time.monotonic() - last_check >= poll_interval:
+                        last_check = time.monotonic()
+                        if await is_disconnected():
+                            logger.info("Client disconnected; cancelling agent stream")
+                            return
+                    if done:
+                        break
+            finally:
+                if not getter.done():
+                    getter.cancel()
+
+            item = getter.result()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                stats.failed += 1
+                finished = True
+                raise item
+            stats.frames_sent += 1
+            yield item
+
+        finished = True
+        stats.completed += 1
+        yield DONE_FRAME
+    finally:
+        stats.active -= 1
+        if not pump_task.done():
+            pump_task.cancel()
+            await asyncio.gather(pump_task, return_exceptions=True)
+        if not finished:
+            stats.cancelled += 1
+            stats.abandoned_seconds += time.monotonic() - started_at
+            stats.abandoned_content_chars += progress["content_chars"]
+            stats.abandoned_tool_calls += progress["tools_started"] - progress["tools_ended"]
@@ -0,0 +1,67 @@
+"""
+Token estimation helpers
+
+Token counts are estimated from character counts (about four characters per
+token for English text and code), which is fast, provider-agnostic and works
+offline. Estimates are used for budgeting, not billing.
+"""
+
+import json
+from typing import Any, Iterable
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a string
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated token count
+    """
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def content_text(content: Any) -> str:
+    """Flatten message content (string or list of content blocks) to text"""
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block.get("text", "") if isinstance(block, dict) else str(block)
+        for block in content or []
+    )
+
+
+def message_tokens(message: Any) -> int:
+    """
+    Estimate the tokens a chat message contributes to a prompt
+
+    Args:
+        message: LangChain message
+
+    Returns:
+        Estimated token count including tool call arguments
+    """
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(content_text(message.content))
+    for call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_tokens(call["name"]) + estimate_tokens(json.dumps(call["args"], default=str))
+    return tokens
+
+
+def count_tokens(messages: Iterable[Any]) -> int:
+    """
+    Estimate the total tokens of a list of chat messages
+
+    Args:
+        messages: LangChain messages
+
+    Returns:
+        Estimated token count
+    """
+    return sum(message_tokens(message) for message in messages)
@@ -0,0 +1,579 @@
+"""
+Request Tracing
+
+This module records spans for a request's work (the HTTP request, each
+agent graph node, each tool call and each RAG request) so a slow request can
+be broken down into a waterfall. Trace context is taken from the W3C
+``traceparent`` header sent by the Node.js proxy and forwarded to the RAG
+service. Finished spans are kept in memory per trace for the waterfall
+endpoint and handed to pluggable exporters, such as a JSON-lines file that
+works offline.
+"""
+
+import asyncio
+import contextvars
+import importlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class TraceContext(NamedTuple):
+    """Identifies a span to continue a trace from"""
+    trace_id: str
+    span_id: str
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[TraceContext]:
+    """
+    Parse a W3C traceparent header
+
+    Args:
+        value: Header value, e.g. "00-<32 hex trace id>-<16 hex span id>-01"
+
+    Returns:
+        TraceContext, or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+    match = _TRACEPARENT.match(value.strip().lower())
+    if match is None or match.group(1) == "ff":
+        return None
+    trace_id, span_id = match.group(2), match.group(3)
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return TraceContext(trace_id, span_id)
+
+
+def format_traceparent(trace_id: str, span_id: str) -> str:
+    """Format a W3C traceparent header (sampled)"""
+    return f"00-{trace_id}-{span_id}-01"
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+@dataclass
+class Span:
+    """A timed operation within a trace"""
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    start: float
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    duration: Optional[float] = None
+    status: str = "ok"
+    error: Optional[str] = None
+    # False for the first span this service opened in the trace
+    local_parent: bool = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Set an attribute on the span"""
+        self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        """traceparent header continuing the trace from this span"""
+        return format_traceparent(self.trace_id, self.span_id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Span as a JSON-serializable dictionary (times in epoch seconds and milliseconds)"""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": None if self.duration is None else round(self.duration * 1000, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    """Span of the work currently running, if any"""
+    return _current_span.get()
+
+
+def span_context(span: Optional[Span]) -> contextvars.Context:
+    """
+    Build an empty context in which a span is current
+
+    Work run in it is traced under the span without inheriting any other
+    context variables, such as the request deadline.
+
+    Args:
+        span: Span to make current (None for no span)
+
+    Returns:
+        The new context
+    """
+    context = contextvars.Context()
+    context.run(_current_span.set, span)
+    return context
+
+
+class SpanExporter:
+    """Receives finished spans; subclasses send them somewhere"""
+
+    def export(self, spans: Sequence[Span]) -> None:
+        """Export finished spans"""
+        raise NotImplementedError
+
+    def find(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Look up the exported spans of a trace, if the exporter can"""
+        return []
+
+    def shutdown(self) -> None:
+        """Flush and release resources"""
+
+
+class JsonLinesExporter(SpanExporter):
+    """
+    Appends spans to a local file, one JSON object per line.
+
+    Writes run on a background thread so request handlers never wait on the
+    disk. When the file reaches max_bytes it is moved to "<path>.1",
+    replacing the previous one, so at most two files are kept and scanned.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 0):
+        """
+        Initialize the exporter
+
+        Args:
+            path: File spans are appended to
+            max_bytes: Size at which the file is rotated (0 disables rotation)
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._file = None
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="span-export")
+
+    def export(self, spans: Sequence[Span]) -> None:
+        self._io.submit(self._write, list(spans))
+
+    def _write(self, spans: List[Span]) -> None:
+        """Append spans to the file, rotating it when full (runs on the export thread)"""
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        try:
+            with self._lock:
+                if self._file is None:
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write(lines)
+                self._file.flush()
+                if self.max_bytes > 0 and self._file.tell() >= self.max_bytes:
+                    self._file.close()
+                    self._file = None
+                    os.replace(self.path, f"{self.path}.1")
+        except Exception as e:
+            logger.warning(f"Writing spans to {self.path} failed: {e}")
+
+    def find(self, trace_id: str) -> List[Dict[str, Any]]:
+        spans = []
+        for path in (f"{self.path}.1", self.path):
+            try:
+                with open(path, encoding="utf-8") as file:
+                    for line in file:
+                        # Cheap substring check before parsing
+                        if trace_id in line:
+                            span = json.loads(line)
+                            if span.get("trace_id") == trace_id:
+                                spans.append(span)
+            except FileNotFoundError:
+                pass
+        return spans
+
+    def shutdown(self) -> None:
+        # Queued writes finish before the file is closed
+        self._io.shutdown(wait=True)
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class LoggingExporter(SpanExporter):
+    """Logs each finished span at debug level"""
+
+    def export(self, spans: Sequence[Span]) -> None:
+        for span in spans:
+            logger.debug(f"span {span.trace_id}/{span.span_id} {span.name} {span.duration * 1000:.1f}ms {span.status}")
+
+
+def load_exporter(name: str) -> SpanExporter:
+    """
+    Build an exporter by name
+
+    Args:
+        name: "jsonl", "log", or "package.module:factory" for a custom exporter
+            (the factory is called without arguments)
+
+    Returns:
+        SpanExporter instance
+
+    Raises:
+        ValueError: If the name is unknown or the factory cannot be imported
+    """
+    if name == "jsonl":
+        settings = get_settings()
+        return JsonLinesExporter(settings.TRACING_JSONL_PATH, max_bytes=settings.TRACING_JSONL_MAX_BYTES)
+    if name == "log":
+        return LoggingExporter()
+    module_name, sep, attribute = name.partition(":")
+    if not sep:
+        raise ValueError(f"Unknown span exporter: {name}")
+    try:
+        factory = getattr(importlib.import_module(module_name), attribute)
+    except (ImportError, AttributeError) as e:
+        raise ValueError(f"Cannot load span exporter {name}: {e}")
+    return factory()
+
+
+class Tracer:
+    """
+    Creates spans and keeps recent traces for waterfall lookups
+
+    Spans of a trace are exported together when the first span this service
+    opened in it (usually the HTTP request) ends; spans ending later, such as
+    background prefetches, are exported as they end.
+    """
+
+    def __init__(
+        self,
+        exporters: Optional[Sequence[SpanExporter]] = None,
+        max_traces: int = 200,
+        enabled: bool = True
+    ):
+        """
+        Initialize the tracer
+
+        Args:
+            exporters: Exporters receiving finished spans
+            max_traces: Recent traces kept in memory for lookups
+            enabled: When False, no spans are recorded
+        """
+        self.exporters = list(exporters or [])
+        self.max_traces = max(1, max_traces)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+        # Spans waiting for their local root to end, and local roots still open
+        self._pending: Dict[str, List[Span]] = {}
+        self._open_roots: Dict[str, int] = {}
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        attributes: Optional[Dict[str, Any]] = None,
+        parent: Optional[TraceContext] = None
+    ) -> Iterator[Optional[Span]]:
+        """
+        Record a span around a block of work
+
+        The span becomes the current span inside the block, so spans opened
+        there (including in tasks started there) become its children.
+
+        Args:
+            name: Span name
+            attributes: Initial attributes
+            parent: Remote parent, used when no span is current (e.g. from traceparent)
+
+        Yields:
+            The span, or None when tracing is disabled
+        """
+        if not self.enabled:
+            yield None
+            return
+        current = _current_span.get()
+        if current is not None:
+            trace_id, parent_id = current.trace_id, current.span_id
+        elif parent is not None:
+            trace_id, parent_id = parent
+        else:
+            trace_id, parent_id = _new_id(128), None
+        span = Span(
+            trace_id=trace_id,
+            span_id=_new_id(64),
+            parent_id=parent_id,
+            name=name,
+            start=time.time(),
+            attributes=dict(attributes or {}),
+            local_parent=current is not None
+        )
+        if current is None:
+            with self._lock:
+                self._open_roots[trace_id] = self._open_roots.get(trace_id, 0) + 1
+
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "cancelled" if isinstance(e, asyncio.CancelledError) else "error"
+            span.error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current_span.reset(token)
+            self._finish(span)
+
+    def _finish(self, span: Span) -> None:
+        """Store a finished span and export its trace when complete"""
+        export: List[Span] = []
+        with self._lock:
+            trace = self._traces.get(span.trace_id)
+            if trace is None:
+                trace = self._traces[span.trace_id] = []
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            else:
+                self._traces.move_to_end(span.trace_id)
+            trace.append(span)
+
+            open_roots = self._open_roots.get(span.trace_id, 0)
+            if not span.local_parent:
+                open_roots -= 1
+                if open_roots > 0:
+                    self._open_roots[span.trace_id] = open_roots
+                else:
+                    self._open_roots.pop(span.trace_id, None)
+            if open_roots > 0:
+                self._pending.setdefault(span.trace_id, []).append(span)
+            else:
+                export = self._pending.pop(span.trace_id, [])
+                export.append(span)
+
+        if not export:
+            return
+        for exporter in self.exporters:
+            try:
+                exporter.export(export)
+            except Exception as e:
+                logger.warning(f"Span exporter {type(exporter).__name__} failed: {e}")
+
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """
+        Get the finished spans of a trace
+
+        Recent traces are served from memory; older ones from exporters that
+        support lookups (such as the JSON-lines file).
+
+        Args:
+            trace_id: 32-character hex trace id
+
+        Returns:
+            Span dictionaries, empty if the trace is unknown
+        """
+        with self._lock:
+            spans = list(self._traces.get(trace_id, []))
+        if spans:
+            return [span.to_dict() for span in spans]
+        for exporter in self.exporters:
+            try:
+                found = exporter.find(trace_id)
+            except Exception as e:
+                logger.warning(f"Span lookup in {type(exporter).__name__} failed: {e}")
+                continue
+            if found:
+                return found
+        return []
+
+    def shutdown(self) -> None:
+        """Export spans still pending and shut the exporters down"""
+        with self._lock:
+            pending = [span for spans in self._pending.values() for span in spans]
+            self._pending.clear()
+        for exporter in self.exporters:
+            try:
+                if pending:
+                    exporter.export(pending)
+                exporter.shutdown()
+            except Exception as e:
+                logger.warning(f"Span exporter {type(exporter).__name__} failed: {e}")
+
+
+def build_waterfall(trace_id: str, spans: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Arrange the spans of a trace as a waterfall
+
+    Args:
+        trace_id: Trace id
+        spans: Span dictionaries (as returned by Tracer.get_trace)
+
+    Returns:
+        Dictionary with the trace duration and the spans in start order, each
+        with its depth, offset from the trace start and duration
+    """
+    if not spans:
+        return {"trace_id": trace_id, "duration_ms": 0.0, "span_count": 0, "spans": []}
+    by_id = {span["span_id"]: span for span in spans}
+
+    def depth(span: Dict[str, Any]) -> int:
+        level = 0
+        parent = by_id.get(span["parent_id"])
+        while parent is not None and level < len(spans):
+            level += 1
+            parent = by_id.get(parent["parent_id"])
+        return level
+
+    trace_start = min(span["start"] for span in spans)
+    trace_end = max(span["start"] + (span["duration_ms"] or 0) / 1000 for span in spans)
+    rows = []
+    for span in sorted(spans, key=lambda span: span["start"]):
+        rows.append({
+            "name": span["name"],
+            "span_id": span["span_id"],
+            "parent_id": span["parent_id"],
+            "depth": depth(span),
+            "offset_ms": round((span["start"] - trace_start) * 1000, 3),
+            "duration_ms": span["duration_ms"],
+            "status": span["status"],
+            "error": span.get("error"),
+            "attributes": span.get("attributes", {}),
+        })
+    return {
+        "trace_id": trace_id,
+        "duration_ms": round((trace_end - trace_start) * 1000, 3),
+        "span_count": len(rows),
+        "spans": rows,
+    }
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a span per HTTP request
+
+    The span continues the caller's trace when a valid traceparent header is
+    present, and the trace id is returned in the X-Trace-Id header so the
+    waterfall can be looked up.
+    """
+
+    def __init__(
+        self,
+        app: Callable,
+        exclude_paths: Sequence[str] = (),
+        route_template: Optional[Callable[[Dict[str, Any]], str]] = None
+    ):
+        """
+        Initialize the middleware
+
+        Args:
+            app: ASGI application
+            exclude_paths: Paths not traced (e.g. health probes)
+            route_template: Maps a routed scope to its path template for the span name
+        """
+        self.app = app
+        self.exclude_paths = frozenset(exclude_paths)
+        self.route_template = route_template
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        parent = None
+        for key, value in scope.get("headers", []):
+            if key == b"traceparent":
+                parent = parse_traceparent(value.decode("latin-1"))
+                break
+
+        method = scope["method"]
+        with get_tracer().span(f"{method} {scope['path']}", {"http.method": method}, parent=parent) as span:
+            if span is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_with_trace(message: Dict[str, Any]) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-trace-id", span.trace_id.encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                if self.route_template is not None:
+                    route = self.route_template(scope)
+                    span.name = f"{method} {route}"
+                    span.set_attribute("http.route", route)
+                if span.attributes.get("http.status_code", 500) >= 500:
+                    span.status = "error"
+
+
+# Global tracer
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """
+    Get or create the global tracer
+
+    Returns:
+        Tracer configured from settings
+    """
+    global _tracer
+    if _tracer is None:
+        settings = get_settings()
+        exporters = []
+        for name in settings.TRACING_EXPORTERS.split(","):
+            name = name.strip()
+            if not name:
+                continue
+            try:
+                exporters.append(load_exporter(name))
+            except ValueError as e:
+                logger.warning(f"Ignoring span exporter: {e}")
+        _tracer = Tracer(exporters, max_traces=settings.TRACING_MAX_TRACES, enabled=settings.TRACING_ENABLED)
+    return _tracer
+
+
+def start_span(
+    name: str,
+    attributes: Optional[Dict[str, Any]] = None
+):
+    """
+    Record a span on the global tracer (see Tracer.span)
+
+    Args:
+        name: Span name
+        attributes: Initial attributes
+
+    Returns:
+        Context manager yielding the span, or None when tracing is disabled
+    """
+    return get_tracer().span(name, attributes)
+
+
+def close_tracer() -> None:
+    """
+    Flush and shut down the global tracer's exporters, if it was created
+    """
+    if _tracer is not None:
+        _tracer.shutdown()
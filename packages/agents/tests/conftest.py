@@ -0,0 +1,79 @@
+"""
+Shared pytest fixtures.
+"""
+import httpx
+import pytest
+
+from config import get_settings
+from services import log_backend as log_backend_module
+from services import metrics_backend as metrics_backend_module
+from services.log_backend import LogBackendClient
+from services.metrics_backend import MetricsBackendClient
+from tests.fake_backend_server import create_fake_backend_app
+from tests.fake_rag_server import FakeRagServer, create_fake_rag_app
+
+
+@pytest.fixture(autouse=True, scope="session")
+def session_spill_path(tmp_path_factory):
+    """Keep spilled agent sessions out of the working directory"""
+    get_settings().SESSION_SPILL_PATH = str(tmp_path_factory.mktemp("sessions") / "sessions.sqlite3")
+
+
+@pytest.fixture(autouse=True, scope="session")
+def disable_prefetch():
+    """Agents only prefetch in tests that point them at a RAG server"""
+    get_settings().PREFETCH_ENABLED = False
+
+
+@pytest.fixture
+def rag_server():
+    """Start a local stand-in RAG service for the duration of a test"""
+    server = FakeRagServer(create_fake_rag_app()).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(scope="session")
+def backend_server():
+    """Local stand-in metrics backend shared by the whole test session"""
+    server = FakeRagServer(create_fake_backend_app()).start()
+    # The first request pays the server's one-off startup costs; keep them out of timed tests
+    httpx.get(f"{server.base_url}/api/metrics", params={"resource_type": "kubernetes", "resource_id": "warmup"})
+    server.app.state.request_count = 0
+    yield server
+    server.stop()
+
+
+@pytest.fixture(autouse=True)
+async def metrics_backend(backend_server, monkeypatch):
+    """Point the global metrics client at the stand-in backend, with a fresh pool per test"""
+    backend_server.app.state.metrics_delay = 0.0
+    client = MetricsBackendClient(base_url=backend_server.base_url)
+    monkeypatch.setattr(metrics_backend_module, "_metrics_backend", client)
+    yield client
+    await client.aclose()
+
+
+@pytest.fixture(autouse=True)
+async def log_backend(backend_server, monkeypatch):
+    """Point the global log client at the stand-in backend, with a fresh pool per test"""
+    app = backend_server.app
+    app.state.log_lines, app.state.log_span, app.state.log_end = 2000, 7200.0, None
+    app.state.log_format, app.state.log_pushdown, app.state.log_lines_sent = "text", True, 0
+    app.state.log_delay = 0.0
+    client = LogBackendClient(base_url=backend_server.base_url)
+    monkeypatch.setattr(log_backend_module, "_log_backend", client)
+    yield client
+    await client.aclose()
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    """
+    Settings instance whose attributes can be overridden per test with monkeypatch
+    
+    Background RAG index checks are disabled so request counts are deterministic.
+    """
+    settings = get_settings()
+    monkeypatch.setattr(settings, "RAG_CACHE_INDEX_CHECK_INTERVAL", 0)
+    return settings
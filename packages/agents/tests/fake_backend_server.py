@@ -0,0 +1,146 @@
+"""
+Local stand-in for the Node.js backend (metrics and logs APIs) used by the tests.
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import orjson
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import StreamingResponse
+
+
+def generate_series(name: str, points: int, step: float = 10.0, end: float = 1_733_000_000.0) -> Dict[str, Any]:
+    """
+    Deterministic metric series
+
+    cpu rises linearly from 20 to 80, memory stays around 60 and disk falls
+    from 90 to 70; other metrics are constant.
+    """
+    timestamps = end - step * np.arange(points)[::-1]
+    ramp = np.linspace(0.0, 1.0, points)
+    if name == "cpu":
+        values = 20 + 60 * ramp
+    elif name == "memory":
+        values = 60 + np.sin(np.arange(points))
+    elif name == "disk":
+        values = 90 - 20 * ramp
+    else:
+        values = np.full(points, 5.0)
+    return {"name": name, "unit": "%", "timestamps": timestamps.tolist(), "values": values.tolist()}
+
+
+LOG_MESSAGES = [
+    ("ERROR", lambda i: f"Connection timeout to database server db-{i // 6 % 3}"),
+    ("WARN", lambda i: f"High memory usage detected: {80 + i % 15}%"),
+    ("ERROR", lambda i: f"Failed to process message {i * 7919:08x}: NullPointerException"),
+    ("INFO", lambda i: f"Retrying failed operation (attempt {i % 5 + 1}/5)"),
+    ("ERROR", lambda i: f"API request failed with status 503 after {i % 900}ms"),
+    ("INFO", lambda i: f"GET /api/orders/{i} 200 {i % 50}ms"),
+]
+
+
+def generate_log_line(index: int, timestamp: float, fmt: str = "text") -> str:
+    """Deterministic log line cycling through a few message templates"""
+    level, message = LOG_MESSAGES[index % len(LOG_MESSAGES)]
+    when = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    if fmt == "json":
+        return orjson.dumps({"timestamp": when.isoformat(), "level": level.lower(), "message": message(index)}).decode()
+    return f"{when.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]} [{level}] {message(index)}"
+
+
+def create_fake_backend_app(points: int = 360, metrics: Optional[Dict[str, Dict[str, Any]]] = None) -> FastAPI:
+    """
+    Build a FastAPI app that mimics the backend metrics and logs APIs
+
+    Logs are generated on the fly: ``log_lines`` lines spread evenly over the
+    ``log_span`` seconds before ``log_end`` (the request time when None).
+
+    Args:
+        points: Samples returned per generated metric
+        metrics: Fixed metric entries by name, returned instead of generated series
+
+    Returns:
+        FastAPI application; request counts and last parameters are kept on ``app.state``
+    """
+    app = FastAPI()
+    app.state.log_lines = 2000
+    app.state.log_span = 7200.0
+    app.state.log_end = None
+    app.state.log_format = "text"
+    # Apply since/until/offset on the server; when False the whole window is streamed
+    app.state.log_pushdown = True
+    app.state.log_lines_sent = 0
+    app.state.log_params = None
+    app.state.points = points
+    app.state.metrics = dict(metrics or {})
+    app.state.request_count = 0
+    app.state.last_params = None
+    # Artificial latency (seconds) before responding
+    app.state.metrics_delay = 0.0
+    app.state.log_delay = 0.0
+
+    @app.get("/api/metrics")
+    async def get_metrics(resource_type: str, resource_id: str, metric_type: str = "cpu,memory", time_range: str = "1h"):
+        app.state.request_count += 1
+        if app.state.metrics_delay:
+            await asyncio.sleep(app.state.metrics_delay)
+        app.state.last_params = {
+            "resource_type": resource_type,
+            "resource_id": resource_id,
+            "metric_type": metric_type,
+            "time_range": time_range,
+        }
+        if resource_id == "missing":
+            raise HTTPException(status_code=404, detail="resource not found")
+        entries: List[Dict[str, Any]] = []
+        for name in metric_type.split(","):
+            name = name.strip()
+            if name in app.state.metrics:
+                entries.append(app.state.metrics[name])
+            elif name != "unknown":
+                entries.append(generate_series(name, app.state.points))
+        # Serialized directly; FastAPI's encoder is slow for long numeric arrays
+        body = {"resource_type": resource_type, "resource_id": resource_id, "metrics": entries}
+        return Response(content=orjson.dumps(body), media_type="application/json")
+
+    @app.get("/api/logs")
+    async def get_logs(
+        resource_type: str,
+        resource_id: str,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        offset: int = 0
+    ):
+        app.state.log_params = {"since": since, "until": until, "offset": offset}
+        if app.state.log_delay:
+            await asyncio.sleep(app.state.log_delay)
+        if resource_id == "missing":
+            raise HTTPException(status_code=404, detail="resource not found")
+        total = app.state.log_lines
+        end = app.state.log_end or time.time()
+        step = app.state.log_span / total
+        start = end - app.state.log_span
+        fmt = app.state.log_format
+
+        first, last = 0, total
+        if app.state.log_pushdown:
+            if since is not None:
+                first = max(0, int(np.ceil((since - start) / step)))
+            if until is not None:
+                last = min(total, int((until - start) / step) + 1)
+            first += offset
+
+        def lines() -> Iterator[bytes]:
+            chunk = 256
+            for index in range(first, last, chunk):
+                stop = min(index + chunk, last)
+                batch = [generate_log_line(i, start + i * step, fmt) for i in range(index, stop)]
+                app.state.log_lines_sent += len(batch)
+                yield ("\n".join(batch) + "\n").encode()
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    return app
@@ -0,0 +1,91 @@
+"""
+Scripted stand-in chat model used by the tests.
+"""
+import asyncio
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+def echo_responder(messages: List[BaseMessage]) -> AIMessage:
+    """Default responder: answer with the last user message"""
+    return AIMessage(content=f"Echo: {messages[-1].content}")
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model returning scripted responses after a fixed latency.
+
+    ``responder`` receives the full prompt and returns the AIMessage to emit,
+    which may include tool calls. Calls made through ``bind_tools`` hit the
+    same model. When streamed, text is emitted word by word with
+    ``token_delay`` between chunks.
+    """
+
+    responder: Callable[[List[BaseMessage]], AIMessage] = echo_responder
+    latency: float = 0.0
+    token_delay: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "FakeChatModel":
+        return self
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self.calls += 1
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self.responder(messages))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self.responder(messages))])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        message = self.responder(messages)
+
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=message.content,
+                tool_call_chunks=[
+                    {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index}
+                    for index, call in enumerate(message.tool_calls)
+                ],
+            ))
+            return
+
+        for token in re.findall(r"\S+\s*", message.content):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,137 @@
+"""
+Local stand-in for the external RAG service used by the tests.
+"""
+import asyncio
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+
+
+DEFAULT_DOCUMENTS: List[Dict[str, Any]] = [
+    {
+        "id": "doc-1",
+        "content": "Pods in CrashLoopBackOff usually indicate a failing liveness probe or an OOM kill.",
+        "metadata": {"category": "documentation", "tags": ["kubernetes", "pods"]},
+        "score": 0.92,
+        "source": "runbooks/crashloop.md",
+    },
+    {
+        "id": "inc-1",
+        "content": "Checkout service restarted repeatedly after a memory limit change. Resolved by raising limits.",
+        "metadata": {"category": "incident", "severity": "high", "resolved": True, "tags": ["oom"]},
+        "score": 0.88,
+        "source": "INC-1042",
+    },
+]
+
+
+def create_fake_rag_app(
+    documents: Optional[List[Dict[str, Any]]] = None,
+    delay: float = 0.0,
+) -> FastAPI:
+    """
+    Build a FastAPI app that mimics the RAG service API
+
+    Args:
+        documents: Documents returned by every query
+        delay: Artificial latency (seconds) added to query requests
+
+    Returns:
+        FastAPI application; counters are kept on ``app.state``
+    """
+    app = FastAPI()
+    app.state.documents = list(documents or DEFAULT_DOCUMENTS)
+    app.state.delay = delay
+    app.state.query_count = 0
+    app.state.last_traceparent = None
+    app.state.batch_enabled = True
+    app.state.batch_count = 0
+    app.state.last_updated = "2024-12-01T00:00:00Z"
+
+    def _match(body: Dict[str, Any]) -> List[Dict[str, Any]]:
+        category = (body.get("filters") or {}).get("category")
+        docs = [
+            doc for doc in app.state.documents
+            if category is None or doc["metadata"].get("category") == category
+        ]
+        return docs[: body.get("top_k", 5)]
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy", "service": "fake-rag", "timestamp": "2024-12-01T00:00:00Z"}
+
+    @app.get("/api/stats")
+    async def stats():
+        return {
+            "total_documents": len(app.state.documents),
+            "namespaces": ["default"],
+            "last_updated": app.state.last_updated,
+        }
+
+    @app.post("/api/query")
+    async def query(body: Dict[str, Any], request: Request):
+        app.state.query_count += 1
+        app.state.last_traceparent = request.headers.get("traceparent")
+        if app.state.delay:
+            await asyncio.sleep(app.state.delay)
+        if body.get("query") == "fail":
+            raise HTTPException(status_code=500, detail="query failed")
+        docs = _match(body)
+        return {"documents": docs, "total_results": len(docs)}
+
+    @app.post("/api/query/batch")
+    async def query_batch(body: Dict[str, Any]):
+        if not app.state.batch_enabled:
+            raise HTTPException(status_code=404, detail="Not Found")
+        app.state.batch_count += 1
+        if app.state.delay:
+            await asyncio.sleep(app.state.delay)
+        results = []
+        for item in body.get("queries", []):
+            if item.get("query") == "fail":
+                results.append({"error": "query failed"})
+            else:
+                docs = _match(item)
+                results.append({"documents": docs, "total_results": len(docs)})
+        return {"results": results}
+
+    @app.post("/api/retrieve")
+    async def retrieve(body: Dict[str, Any]):
+        ids = set(body.get("document_ids", []))
+        docs = [doc for doc in app.state.documents if doc["id"] in ids]
+        found = {doc["id"] for doc in docs}
+        return {"documents": docs, "not_found": sorted(ids - found)}
+
+    return app
+
+
+class FakeRagServer:
+    """Runs a fake RAG app with uvicorn on a free localhost port in a background thread"""
+
+    def __init__(self, app: FastAPI):
+        self.app = app
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self._server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning")
+        )
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def start(self) -> "FakeRagServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Fake RAG server failed to start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
@@ -0,0 +1,155 @@
+"""
+Tests for chat admission control and load shedding.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from agents.supervisor import SupervisorAgent
+from main import app
+from routes import agents as agents_routes
+from services import admission as admission_module
+from services.admission import AdmissionController, AdmissionRejected
+from tests.fake_llm import FakeChatModel
+
+
+def controller(**kwargs) -> AdmissionController:
+    options = {"max_in_flight": 2, "max_queue": 1, "queue_timeout": 1.0, "priority_extra": 1, "max_loop_lag": 0}
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+async def test_queue_then_reject_when_full():
+    admission = controller()
+    first, second = await admission.acquire(), await admission.acquire()
+    queued = asyncio.create_task(admission.acquire())
+    await asyncio.sleep(0)
+    assert admission.get_stats()["queued"] == 1
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await admission.acquire()
+    assert rejected.value.status_code == 429
+    assert rejected.value.reason == "queue_full"
+    assert rejected.value.retry_after >= 1
+
+    first.release()
+    third = await asyncio.wait_for(queued, 1)
+    assert admission.in_flight == 2
+    for ticket in (second, third, third):
+        ticket.release()
+    assert admission.in_flight == 0
+    assert admission.get_stats()["rejected"]["queue_full"] == 1
+
+
+async def test_waiting_too_long_is_shed_with_503():
+    admission = controller(max_in_flight=1, queue_timeout=0.05)
+    ticket = await admission.acquire()
+    with pytest.raises(AdmissionRejected) as rejected:
+        await admission.acquire()
+    assert rejected.value.status_code == 503
+    assert rejected.value.reason == "queue_timeout"
+    assert admission.get_stats()["queued"] == 0
+    ticket.release()
+    assert admission.in_flight == 0
+
+
+async def test_priority_requests_bypass_the_queue():
+    admission = controller(max_in_flight=1, max_queue=5, priority_extra=1)
+    busy = await admission.acquire()
+    normal = asyncio.create_task(admission.acquire())
+    await asyncio.sleep(0)
+
+    # Uses the extra slot although a normal request is waiting
+    urgent = await asyncio.wait_for(admission.acquire(priority=True), 0.1)
+    assert admission.in_flight == 2
+
+    # With the extra slot taken, the next priority request queues ahead of the normal one
+    waiting_urgent = asyncio.create_task(admission.acquire(priority=True))
+    await asyncio.sleep(0)
+    urgent.release()
+    second_urgent = await asyncio.wait_for(waiting_urgent, 0.1)
+    assert not normal.done()
+
+    busy.release()
+    second_urgent.release()
+    (await asyncio.wait_for(normal, 0.1)).release()
+    assert admission.in_flight == 0
+    assert admission.get_stats()["priority_admitted"] == 2
+
+
+async def test_cancelled_waiter_does_not_leak_its_slot():
+    admission = controller(max_in_flight=1, max_queue=5)
+    ticket = await admission.acquire()
+    gone = asyncio.create_task(admission.acquire())
+    waiting = asyncio.create_task(admission.acquire())
+    await asyncio.sleep(0)
+    gone.cancel()
+    await asyncio.sleep(0)
+
+    ticket.release()
+    (await asyncio.wait_for(waiting, 0.1)).release()
+    assert admission.in_flight == 0
+    assert admission.get_stats()["queued"] == 0
+
+
+async def test_event_loop_lag_sheds_normal_requests():
+    admission = controller(max_loop_lag=0.05, lag_check_interval=0.01)
+    (await admission.acquire()).release()
+
+    # Block the loop so the monitor wakes up late
+    for _ in range(5):
+        time.sleep(0.15)
+        await asyncio.sleep(0.001)
+        if admission.loop_lag > 0.05:
+            break
+    assert admission.loop_lag > 0.05
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await admission.acquire()
+    assert rejected.value.status_code == 503
+    assert rejected.value.reason == "loop_lag"
+    (await admission.acquire(priority=True)).release()
+    await admission.aclose()
+
+
+async def test_loop_lag_shedding_is_off_by_default(monkeypatch):
+    monkeypatch.setattr(admission_module, "_admission_controller", None)
+    admission = admission_module.get_admission_controller()
+    assert admission.max_loop_lag == 0
+    (await admission.acquire()).release()
+
+    # A slow synchronous step does not shed the requests that follow it
+    time.sleep(0.3)
+    await asyncio.sleep(0.001)
+    (await admission.acquire()).release()
+    assert admission.get_stats()["rejected"]["loop_lag"] == 0
+    await admission.aclose()
+
+
+async def test_chat_endpoint_rejects_overload_with_retry_after(monkeypatch):
+    admission = controller(max_in_flight=1, max_queue=1, priority_extra=1)
+    monkeypatch.setattr(admission_module, "_admission_controller", admission)
+    agent = SupervisorAgent(model_name="fake", provider="fake", llm=FakeChatModel(latency=0.2))
+    monkeypatch.setattr(agents_routes, "get_agent", lambda *args, **kwargs: agent)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        def chat(session_id, **extra):
+            return client.post("/api/agents/chat", json={"message": "hi", "session_id": session_id, **extra})
+
+        first = asyncio.create_task(chat("admission-1"))
+        await asyncio.sleep(0.05)
+        queued = asyncio.create_task(chat("admission-2"))
+        await asyncio.sleep(0.05)
+        rejected = await chat("admission-3")
+        urgent = await chat("admission-4", active_incident=True)
+        responses = [await first, await queued]
+        streamed = await client.post("/api/agents/chat/stream", json={"message": "hi", "session_id": "admission-5"})
+
+    assert rejected.status_code == 429
+    assert int(rejected.headers["retry-after"]) >= 1
+    assert urgent.status_code == 200
+    assert [response.status_code for response in responses] == [200, 200]
+    assert streamed.status_code == 200
+    assert admission.in_flight == 0
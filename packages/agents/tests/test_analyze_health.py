@@ -0,0 +1,104 @@
+"""
+Tests for the concurrent health analysis fan-out.
+"""
+import time
+
+import pytest
+
+from services import rag_client as rag_client_module
+from services.rag_client import RagClient
+from services.deadline import Deadline, deadline_scope
+from tools import system_tools
+from tools.system_tools import AnalyzeHealthTool
+
+ARGS = {"resource_type": "kubernetes", "resource_id": "api"}
+
+
+@pytest.fixture
+def health_sources(rag_server, backend_server, settings, monkeypatch):
+    """All three sources answer after 0.2s"""
+    monkeypatch.setattr(rag_client_module, "_rag_client", RagClient(base_url=rag_server.base_url))
+    rag_server.app.state.delay = 0.2
+    backend_server.app.state.metrics_delay = 0.2
+    backend_server.app.state.log_delay = 0.2
+    return rag_server, backend_server
+
+
+async def test_sources_are_queried_concurrently(health_sources, monkeypatch):
+    spans = {}
+
+    def timed(name, build):
+        async def run(*args):
+            started = time.perf_counter()
+            try:
+                return await build(*args)
+            finally:
+                spans[name] = (started, time.perf_counter())
+        return run
+
+    for name in ("_metrics_section", "_logs_section", "_incidents_section"):
+        monkeypatch.setattr(system_tools, name, timed(name, getattr(system_tools, name)))
+    report = await AnalyzeHealthTool().ainvoke(ARGS)
+
+    # Every source starts before any of them finishes
+    assert len(spans) == 3
+    assert max(start for start, _ in spans.values()) < min(end for _, end in spans.values())
+    assert report.startswith("Health Analysis for kubernetes/api:")
+    # cpu ramps to 80% (degraded); error lines are present
+    assert "Status: DEGRADED\n" in report
+    assert "cpu: avg 50%" in report
+    assert "patterns:" in report
+    assert "[ERROR] Connection timeout to database server <*>" in report
+    assert "INC-1042" in report
+    assert "UNAVAILABLE" not in report
+    assert "cpu p95 at 77%" not in report
+    assert "Recommendations:" in report
+    assert "Sources: metrics" in report
+
+
+async def test_slow_source_is_marked_missing(health_sources, settings, monkeypatch):
+    _, backend_server = health_sources
+    monkeypatch.setattr(settings, "HEALTH_LOGS_TIMEOUT", 0.4)
+    backend_server.app.state.log_delay = 2
+
+    started = time.perf_counter()
+    report = await AnalyzeHealthTool().ainvoke(ARGS)
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 1.5
+    assert "Status: DEGRADED (partial: logs unavailable)" in report
+    assert "Recent Errors (last 1h):\n  UNAVAILABLE (no response within 0.4s)" in report
+    assert "cpu: avg 50%" in report
+    assert "INC-1042" in report
+
+
+async def test_section_cut_short_by_the_deadline_says_so(health_sources):
+    _, backend_server = health_sources
+    backend_server.app.state.log_delay = 2
+
+    with deadline_scope(Deadline(0.6)):
+        report = await AnalyzeHealthTool().ainvoke(ARGS)
+
+    # Reports the time the deadline allowed, not the configured 5s
+    assert "Recent Errors (last 1h):\n  UNAVAILABLE (request deadline reached after 0." in report
+    assert "no response within 5s" not in report
+    assert "cpu: avg 50%" in report
+
+
+async def test_failing_sources_are_marked_missing(health_sources, monkeypatch):
+    rag_server, _ = health_sources
+    monkeypatch.setattr(rag_client_module, "_rag_client", RagClient(base_url=rag_server.base_url))
+    report = await AnalyzeHealthTool().ainvoke({"resource_type": "kubernetes", "resource_id": "missing"})
+
+    assert "Status: HEALTHY (partial: metrics, logs unavailable)" in report
+    assert "Metrics (last 1h):\n  UNAVAILABLE (error:" in report
+    assert "Sources: metrics" in report
+    assert "(unavailable)" in report
+
+
+async def test_thresholds_set_status(health_sources, settings, monkeypatch):
+    monkeypatch.setattr(settings, "HEALTH_CRITICAL_PERCENT", 85)
+    report = await AnalyzeHealthTool().ainvoke(ARGS)
+    assert "Status: CRITICAL" in report
+    assert "disk p95 at 89% (trend falling)" in report
+    assert "Free disk space or expand the volume" in report
@@ -0,0 +1,77 @@
+"""
+Tests for the exact-match answer cache.
+"""
+import pytest
+
+from agents.answer_cache import answer_cache_key
+from agents.supervisor import SupervisorAgent
+from config import get_settings
+from services.cache import TTLCache
+from tests.fake_llm import FakeChatModel
+
+
+@pytest.fixture
+def cached_agent(monkeypatch):
+    monkeypatch.setattr(get_settings(), "ANSWER_CACHE_ENABLED", True)
+    agent = SupervisorAgent(model_name="fake", provider="fake", llm=FakeChatModel(latency=0.05))
+    agent.answer_cache = TTLCache(max_size=2, default_ttl=60)
+    return agent
+
+
+def test_cache_key_normalizes_message_and_context():
+    key = answer_cache_key("Why is  the pod\nrestarting?", {"pod": "api-1", "ns": "prod"}, "openai", "m")
+    assert key == answer_cache_key("why is the pod restarting?", {"ns": "prod", "pod": "api-1"}, "openai", "m")
+    assert key != answer_cache_key("why is the pod restarting?", {"ns": "prod", "pod": "api-2"}, "openai", "m")
+    assert key != answer_cache_key("why is the pod restarting?", {"ns": "prod", "pod": "api-1"}, "openai", "other")
+
+
+async def test_repeated_question_is_served_from_cache(cached_agent):
+    context = {"pod": "api-1"}
+    first = await cached_agent.chat("Why is the pod restarting?", session_id="cache-a", context=context)
+    second = await cached_agent.chat("why is the pod  restarting?", session_id="cache-b", context=context)
+
+    assert first["metadata"]["cache"]["hit"] is False
+    assert second["metadata"]["cache"]["hit"] is True
+    assert second["response"] == first["response"]
+    assert cached_agent.llm.calls == 1
+
+    # The cached exchange is recorded so follow-ups keep their context
+    state = await cached_agent.graph.aget_state({"configurable": {"thread_id": "cache-b"}})
+    assert [message.type for message in state.values["messages"]] == ["human", "ai"]
+    follow_up = await cached_agent.chat("and now?", session_id="cache-b")
+    assert follow_up["metadata"]["message_count"] == 4
+
+
+async def test_follow_up_questions_are_not_cached(cached_agent):
+    await cached_agent.chat("hello", session_id="cache-c")
+    await cached_agent.chat("status?", session_id="cache-c")
+    result = await cached_agent.chat("status?", session_id="cache-d")
+    assert result["metadata"]["cache"]["hit"] is False
+    assert cached_agent.llm.calls == 3
+
+
+async def test_bypass_refreshes_cached_answer(cached_agent):
+    await cached_agent.chat("status?", session_id="cache-e")
+    result = await cached_agent.chat("status?", session_id="cache-f", bypass_cache=True)
+    assert result["metadata"]["cache"] == {"hit": False, "bypassed": True}
+    assert cached_agent.llm.calls == 2
+
+    result = await cached_agent.chat("status?", session_id="cache-g")
+    assert result["metadata"]["cache"]["hit"] is True
+
+
+async def test_cache_evicts_by_size(cached_agent):
+    for index, question in enumerate(["a?", "b?", "c?"]):
+        await cached_agent.chat(question, session_id=f"cache-size-{index}")
+    assert cached_agent.answer_cache.get_stats()["evictions"] == 1
+
+    result = await cached_agent.chat("a?", session_id="cache-size-3")
+    assert result["metadata"]["cache"]["hit"] is False
+
+
+async def test_cache_disabled_by_default():
+    agent = SupervisorAgent(model_name="fake", provider="fake", llm=FakeChatModel())
+    await agent.chat("status?", session_id="cache-off-1")
+    result = await agent.chat("status?", session_id="cache-off-2")
+    assert "cache" not in result["metadata"]
+    assert agent.llm.calls == 2
@@ -0,0 +1,111 @@
+"""
+Tests for the tiered model cascade.
+"""
+import itertools
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+from agents.cascade import EMPTY_TOOL_RESULT, TOOL_DEPTH, UNCERTAIN
+from agents.supervisor import SupervisorAgent
+from services import rag_client as rag_client_module
+from services.rag_client import RagClient
+from tests.fake_llm import FakeChatModel
+
+_call_ids = itertools.count()
+
+
+def tool_call(name, **args):
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call-{next(_call_ids)}"}])
+
+
+def make_cascade(small_responder, large_responder=None, **small_kwargs):
+    small = FakeChatModel(responder=small_responder, **small_kwargs)
+    large = FakeChatModel(responder=large_responder or (lambda messages: AIMessage(content="large answer")))
+    return SupervisorAgent(model_name="small", provider="fake", llm=small, escalation_llm=large)
+
+
+async def test_confident_answer_stays_on_small_model():
+    agent = make_cascade(lambda messages: AIMessage(content="The pod is OOM killed."))
+    result = await agent.chat("why is the pod restarting?", session_id="cascade-1")
+
+    assert result["response"] == "The pod is OOM killed."
+    assert result["metadata"]["tier"] == "small"
+    assert result["metadata"]["escalation"] is None
+    assert agent.escalation_llm.calls == 0
+
+
+async def test_uncertain_answer_escalates_and_is_discarded():
+    agent = make_cascade(lambda messages: AIMessage(content="I'm not sure what is happening."))
+    result = await agent.chat("why is the pod restarting?", session_id="cascade-2")
+
+    assert result["response"] == "large answer"
+    assert result["metadata"]["tier"] == "large"
+    assert result["metadata"]["escalation"] == UNCERTAIN
+    state = await agent.graph.aget_state({"configurable": {"thread_id": "cascade-2"}})
+    assert [message.content for message in state.values["messages"]] == ["why is the pod restarting?", "large answer"]
+
+    # The next turn starts on the small model again
+    agent.llm.responder = lambda messages: AIMessage(content="Fixed now.")
+    result = await agent.chat("and now?", session_id="cascade-2")
+    assert result["metadata"]["tier"] == "small"
+
+
+async def test_tool_loop_depth_escalates(settings, monkeypatch):
+    monkeypatch.setattr(settings, "CASCADE_MAX_TOOL_ROUNDS", 2)
+    agent = make_cascade(lambda messages: tool_call("check_metrics", resource_type="kubernetes", resource_id="api"))
+    result = await agent.chat("check the api", session_id="cascade-3")
+
+    assert result["metadata"]["escalation"] == TOOL_DEPTH
+    assert result["metadata"]["tools_used"] == ["check_metrics", "check_metrics"]
+    assert agent.llm.calls == 3
+
+
+async def test_empty_tool_result_escalates(rag_server, settings, monkeypatch):
+    rag_server.app.state.documents = []
+    monkeypatch.setattr(rag_client_module, "_rag_client", RagClient(base_url=rag_server.base_url))
+
+    def small(messages):
+        if isinstance(messages[-1], ToolMessage):
+            return AIMessage(content="Nothing found, all good.")
+        return tool_call("search_documentation", query="crashloop")
+
+    agent = make_cascade(small)
+    result = await agent.chat("crashloop runbook?", session_id="cascade-4")
+
+    assert result["metadata"]["escalation"] == EMPTY_TOOL_RESULT
+    assert result["response"] == "large answer"
+    assert agent.llm.calls == 1
+
+
+async def test_stream_only_emits_the_answer_that_is_kept():
+    agent = make_cascade(lambda messages: AIMessage(content="I don't know, sorry."))
+    events = [event async for event in agent.stream_chat("status?", session_id="cascade-5")]
+    assert "".join(event["data"] for event in events if event["type"] == "content") == "large answer"
+
+    agent.llm.responder = lambda messages: AIMessage(content="All healthy.")
+    events = [event async for event in agent.stream_chat("status?", session_id="cascade-6")]
+    assert "".join(event["data"] for event in events if event["type"] == "content") == "All healthy."
+
+
+async def test_stats_report_tier_hit_rates_and_savings():
+    agent = make_cascade(lambda messages: AIMessage(content="ok"))
+    agent.escalation_llm.latency = 0.05
+    await agent.chat("a", session_id="cascade-7")
+    await agent.chat("b", session_id="cascade-8")
+    agent.llm.responder = lambda messages: AIMessage(content="i am not sure")
+    await agent.chat("c", session_id="cascade-9")
+
+    stats = agent.cascade_stats.get_stats()
+    assert stats["turns"] == 3
+    assert stats["tiers"]["small"]["answered"] == 2
+    assert stats["tiers"]["small"]["hit_rate"] == round(2 / 3, 4)
+    assert stats["tiers"]["large"]["answered"] == 1
+    assert stats["escalations"] == {UNCERTAIN: 1}
+    assert stats["estimated_savings_seconds"] >= 0.09
+
+
+async def test_cascade_disabled_by_default():
+    agent = SupervisorAgent(model_name="fake", provider="fake", llm=FakeChatModel())
+    result = await agent.chat("hi", session_id="cascade-10")
+    assert agent.cascade_stats is None
+    assert "tier" not in result["metadata"]
@@ -0,0 +1,49 @@
+"""
+Tests for the chat load benchmark.
+"""
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from benchmarks.chat_load import SCRIPTS, LoadResult, check, run, scripted_responder
+
+
+def test_scripted_responder_plays_tool_rounds_then_answers():
+    respond = scripted_responder(SCRIPTS["investigate"], answer_words=5)
+    messages = [HumanMessage(content="why?")]
+
+    first = respond(messages)
+    assert [call["name"] for call in first.tool_calls] == ["search_incident_logs", "check_metrics"]
+    messages += [first, ToolMessage(content="r", tool_call_id="call-0-0"), ToolMessage(content="r", tool_call_id="call-0-1")]
+    second = respond(messages)
+    assert [call["name"] for call in second.tool_calls] == ["query_logs"]
+    messages += [second, ToolMessage(content="r", tool_call_id="call-1-0")]
+    assert len(respond(messages).content.split()) == 5
+
+    # A new turn starts the script over
+    messages += [AIMessage(content="done"), HumanMessage(content="and now?")]
+    assert respond(messages).tool_calls
+
+
+def test_load_run_reports_latency_and_time_to_first_token():
+    results = run(
+        endpoints=["chat", "stream"], concurrency=[4], requests=12,
+        llm_latency=0.01, token_delay=0.002, rag_delay=0.0, script="search"
+    )
+    chat, stream = results
+    for result in results:
+        assert result.errors == 0
+        assert result.throughput_rps > 0
+        assert result.p50_ms <= result.p95_ms <= result.p99_ms
+    assert chat.ttft_p50_ms is None
+    # The first token arrives before the stream completes
+    assert 0 < stream.ttft_p50_ms < stream.p50_ms
+    assert check(results, max_p95_ms=60_000, max_memory_growth_mb=None) == []
+
+
+def test_check_reports_regressions():
+    result = LoadResult(
+        endpoint="chat", concurrency=8, requests=10, errors=1, elapsed_seconds=1.0, throughput_rps=9.0,
+        p50_ms=100.0, p95_ms=900.0, p99_ms=950.0, memory_growth_mb=80.0
+    )
+    failures = check([result], max_p95_ms=500, max_memory_growth_mb=50)
+    assert len(failures) == 3
+    assert failures[1] == "chat x8: p95 900.0ms exceeds 500ms"
@@ -0,0 +1,165 @@
+"""
+Tests for the bounded session checkpointer.
+"""
+import asyncio
+import threading
+
+from fastapi.testclient import TestClient
+
+from agents import checkpointer as checkpointer_module
+from agents.checkpointer import BoundedMemorySaver
+from agents.supervisor import SupervisorAgent
+from main import app
+from tests.fake_llm import FakeChatModel
+
+
+def make_agent(checkpointer, history):
+    def responder(messages):
+        history.append(len(messages))
+        return FakeChatModel().responder(messages)
+
+    return SupervisorAgent(
+        model_name="fake",
+        provider="fake",
+        llm=FakeChatModel(responder=responder),
+        checkpointer=checkpointer,
+    )
+
+
+async def test_lru_sessions_spill_to_disk_and_reload(tmp_path):
+    """Sessions beyond the limit are spilled and come back with their history."""
+    saver = BoundedMemorySaver(max_sessions=2, idle_ttl=0, spill_path=str(tmp_path / "sessions.db"))
+    history = []
+    agent = make_agent(saver, history)
+
+    for session in ("s1", "s2", "s3"):
+        await agent.chat("hello", session_id=session)
+
+    stats = saver.get_stats()
+    assert stats["resident_count"] == 2
+    assert stats["spilled_count"] == 1
+    assert {session["session_id"] for session in stats["sessions"]} == {"s2", "s3"}
+    assert stats["resident_bytes"] == sum(session["bytes"] for session in stats["sessions"])
+
+    # System message + first exchange + new question
+    await agent.chat("again", session_id="s1")
+    assert history[-1] == 4
+    assert saver.reloads == 1
+    assert saver.get_stats()["spilled_count"] == 1
+
+
+async def test_memory_ceiling_and_idle_ttl(tmp_path):
+    """Byte and idle limits evict sessions; without a spill file they are discarded."""
+    saver = BoundedMemorySaver(max_bytes=1, idle_ttl=0)
+    agent = make_agent(saver, [])
+    await agent.chat("hello", session_id="a")
+    await agent.chat("hello", session_id="b")
+    assert [session["session_id"] for session in saver.get_stats()["sessions"]] == ["b"]
+    assert saver.discarded == 1
+
+    saver = BoundedMemorySaver(idle_ttl=0.01, spill_path=str(tmp_path / "idle.db"))
+    agent = make_agent(saver, [])
+    await agent.chat("hello", session_id="a")
+    await asyncio.sleep(0.02)
+    await agent.chat("hello", session_id="b")
+    assert saver.get_stats()["spilled_count"] == 1
+
+
+async def test_delete_thread_clears_memory_and_disk(tmp_path):
+    """Deleting a session removes it everywhere and resets the byte count."""
+    saver = BoundedMemorySaver(max_sessions=1, idle_ttl=0, spill_path=str(tmp_path / "sessions.db"))
+    agent = make_agent(saver, [])
+    await agent.chat("hello", session_id="a")
+    await agent.chat("hello", session_id="b")
+
+    saver.delete_thread("a")
+    saver.delete_thread("b")
+    stats = saver.get_stats()
+    assert stats["resident_count"] == stats["spilled_count"] == 0
+    assert stats["resident_bytes"] == 0
+    assert saver.get_tuple({"configurable": {"thread_id": "a", "checkpoint_ns": ""}}) is None
+
+
+def test_sessions_endpoint():
+    """The sessions endpoint reports resident sessions and limits."""
+    with TestClient(app) as client:
+        response = client.get("/api/agents/sessions")
+    assert response.status_code == 200
+    data = response.json()
+    assert {"resident_count", "resident_bytes", "spilled_count", "sessions"} <= data.keys()
+
+
+def stored_bytes(saver, thread_id):
+    """Recompute a session's size from everything the saver holds for it"""
+    size = sum(
+        len(checkpoint[1]) + len(metadata[1])
+        for checkpoints in saver.storage.get(thread_id, {}).values()
+        for checkpoint, metadata, _ in checkpoints.values()
+    )
+    size += sum(len(blob[1]) for key, blob in saver.blobs.items() if key[0] == thread_id)
+    size += sum(len(write[2][1]) for key, writes in saver.writes.items() if key[0] == thread_id for write in writes.values())
+    return size
+
+
+async def test_byte_counts_track_puts_evictions_and_reloads(tmp_path):
+    """Per-session byte counts are kept up to date without rescanning the session."""
+    saver = BoundedMemorySaver(max_sessions=1, idle_ttl=0, spill_path=str(tmp_path / "sessions.db"))
+    agent = make_agent(saver, [])
+    for message in ("one", "two", "three"):
+        await agent.chat(message, session_id="a")
+    assert saver.get_stats()["sessions"][0]["bytes"] == stored_bytes(saver, "a")
+
+    await agent.chat("hello", session_id="b")
+    await agent.chat("four", session_id="a")
+    assert saver.reloads == 1
+    assert saver.get_stats()["sessions"][0]["bytes"] == stored_bytes(saver, "a")
+    assert saver.get_stats()["resident_bytes"] == stored_bytes(saver, "a")
+
+
+async def test_spill_and_reload_run_off_the_event_loop(tmp_path):
+    """Pickling and SQLite work happens on the spill thread, not the event loop."""
+    saver = BoundedMemorySaver(max_sessions=1, idle_ttl=0, spill_path=str(tmp_path / "sessions.db"))
+    threads = []
+    for name in ("_write_spill", "_reload"):
+        original = getattr(saver, name)
+
+        def record(*args, original=original):
+            threads.append(threading.get_ident())
+            return original(*args)
+
+        setattr(saver, name, record)
+
+    agent = make_agent(saver, [])
+    for session in ("a", "b", "a"):
+        await agent.chat("hello", session_id=session)
+
+    assert len(threads) >= 3
+    assert threading.get_ident() not in threads
+    saver.close()
+
+
+async def test_close_flushes_spills_for_the_next_process(tmp_path, monkeypatch):
+    """Closing waits for pending spills; the closed saver keeps working in memory."""
+    path = str(tmp_path / "sessions.db")
+    saver = BoundedMemorySaver(max_sessions=1, idle_ttl=0, spill_path=path)
+    monkeypatch.setattr(checkpointer_module, "_checkpointer", saver)
+    agent = make_agent(saver, [])
+    for session in ("a", "b"):
+        await agent.chat("hello", session_id=session)
+    await checkpointer_module.close_checkpointer()
+
+    await agent.chat("hello", session_id="c")
+    saver.delete_thread("a")
+    assert saver.get_stats()["spilled_count"] == 0
+
+    history = []
+    await make_agent(BoundedMemorySaver(spill_path=path), history).chat("again", session_id="a")
+    assert history[-1] == 4
+
+
+def test_shutdown_does_not_create_the_checkpointer(monkeypatch):
+    """Shutdown closes the checkpointer only if something created it."""
+    monkeypatch.setattr(checkpointer_module, "_checkpointer", None)
+    with TestClient(app):
+        pass
+    assert checkpointer_module._checkpointer is None
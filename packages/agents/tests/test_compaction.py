@@ -0,0 +1,117 @@
+"""
+Tests for conversation compaction.
+"""
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage
+
+from agents.compaction import SUMMARY_OMITTED, compact_messages, fit_summary, summarize_extractive
+from agents.supervisor import SupervisorAgent
+from agents.checkpointer import BoundedMemorySaver
+from services.tokens import estimate_tokens
+from tests.fake_llm import FakeChatModel
+
+
+def conversation():
+    return [
+        HumanMessage(content="why is checkout slow?", id="h1"),
+        AIMessage(content="", id="a1", tool_calls=[{"name": "query_logs", "args": {"query": "error"}, "id": "c1"}]),
+        ToolMessage(content="ERROR timeout\n" * 400, tool_call_id="c1", name="query_logs", id="t1"),
+        AIMessage(content="The database is timing out.", id="a2"),
+        HumanMessage(content="what about memory?", id="h2"),
+        AIMessage(content="", id="a3", tool_calls=[{"name": "check_metrics", "args": {"resource_id": "x"}, "id": "c2"}]),
+        ToolMessage(content="memory 85%\n" * 400, tool_call_id="c2", name="check_metrics", id="t2"),
+    ]
+
+
+def test_within_budget_is_left_alone():
+    assert compact_messages(conversation(), budget=100_000) is None
+
+
+def test_old_tool_results_are_truncated_but_unseen_ones_kept():
+    """Tool results already answered are truncated first; the latest round stays intact."""
+    result = compact_messages(conversation(), budget=1500, keep_turns=1, tool_result_chars=100)
+    assert result.truncated_tool_results == 1
+    assert result.removed == []
+    assert [message.id for message in result.updates] == ["t1"]
+    assert len(result.updates[0].content) < 200
+    assert result.tokens_after < result.tokens_before
+
+
+def test_older_turns_are_removed_at_user_boundaries():
+    """Over budget after truncation, whole older turns are removed."""
+    result = compact_messages(conversation(), budget=1150, keep_turns=1, tool_result_chars=100)
+    assert [message.id for message in result.removed] == ["h1", "a1", "t1", "a2"]
+    assert all(isinstance(update, RemoveMessage) for update in result.updates)
+    assert result.tokens_after <= 1150
+
+    summary = summarize_extractive(result.removed)
+    assert "User: why is checkout slow?" in summary
+    assert "[called query_logs]" in summary
+
+
+async def test_agent_compacts_long_sessions(settings, monkeypatch, tmp_path):
+    """The graph compacts history, reports token counts and sends the summary to the model."""
+    monkeypatch.setattr(settings, "CONTEXT_TOKEN_BUDGET", 700)
+    monkeypatch.setattr(settings, "CONTEXT_KEEP_TURNS", 1)
+    prompts = []
+
+    def responder(messages):
+        prompts.append(messages)
+        return AIMessage(content="noted " * 200)
+
+    agent = SupervisorAgent(
+        model_name="fake",
+        provider="fake",
+        llm=FakeChatModel(responder=responder),
+        checkpointer=BoundedMemorySaver(idle_ttl=0),
+    )
+    await agent.chat("first question", session_id="long")
+    await agent.chat("second question", session_id="long")
+    result = await agent.chat("third question", session_id="long")
+
+    tokens = result["metadata"]["context_tokens"]
+    assert tokens["before"] > tokens["after"]
+    assert tokens["compactions"] >= 1
+
+    system, *history = prompts[-1]
+    assert isinstance(system, SystemMessage)
+    assert "Summary of the earlier conversation" in system.content
+    assert "first question" in system.content
+    assert history[0].content == "third question"
+
+
+def test_summary_is_trimmed_to_its_budget_keeping_recent_lines():
+    summary = "\n".join(f"- User: question number {index}" for index in range(50))
+    trimmed = fit_summary(summary, 40)
+    assert estimate_tokens(trimmed) <= 40
+    assert trimmed.startswith(SUMMARY_OMITTED)
+    assert trimmed.endswith("question number 49")
+    assert "question number 0\n" not in trimmed
+    assert fit_summary("- short", 40) == "- short"
+
+
+async def test_running_summary_stays_within_its_share(settings, monkeypatch):
+    """However long the session, the summary in the system prompt keeps to its share of the budget."""
+    monkeypatch.setattr(settings, "CONTEXT_TOKEN_BUDGET", 700)
+    monkeypatch.setattr(settings, "CONTEXT_KEEP_TURNS", 1)
+    monkeypatch.setattr(settings, "CONTEXT_SUMMARY_SHARE", 0.2)
+    prompts = []
+
+    def responder(messages):
+        prompts.append(messages)
+        return AIMessage(content="noted " * 100)
+
+    agent = SupervisorAgent(
+        model_name="fake",
+        provider="fake",
+        llm=FakeChatModel(responder=responder),
+        checkpointer=BoundedMemorySaver(idle_ttl=0),
+    )
+    for index in range(12):
+        await agent.chat(f"question {index}", session_id="very-long")
+
+    state = await agent.graph.aget_state({"configurable": {"thread_id": "very-long"}})
+    summary = state.values["summary"]
+    assert estimate_tokens(summary) <= 140
+    assert summary.startswith(SUMMARY_OMITTED)
+    assert "question 10" in summary and "question 0\n" not in summary
+    assert estimate_tokens(prompts[-1][0].content) <= agent.system_tokens + 140 + 20
@@ -0,0 +1,150 @@
+"""
+Tests for request deadlines across the graph, tools and RAG client.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+from langchain_core.messages import AIMessage, SystemMessage, ToolMessage
+
+from agents.supervisor import SupervisorAgent
+from services.cache import TTLCache
+from services.deadline import Deadline, DeadlineExceeded, cap_timeout, deadline_scope, within_deadline
+from services.rag_client import RagClient, RagQueryParams
+from tests.fake_llm import FakeChatModel
+
+
+async def test_timeouts_are_capped_to_the_deadline():
+    assert cap_timeout(30) == 30
+    with deadline_scope(Deadline(0.5)):
+        assert cap_timeout(30) <= 0.5
+        assert cap_timeout(0.1) == 0.1
+        assert cap_timeout(None) <= 0.5
+    with deadline_scope(Deadline(-1)):
+        with pytest.raises(DeadlineExceeded):
+            cap_timeout(30)
+
+
+async def test_within_deadline_cancels_slow_work():
+    with deadline_scope(Deadline(0.05)):
+        started = time.perf_counter()
+        with pytest.raises(DeadlineExceeded):
+            await within_deadline(asyncio.sleep(10))
+        # Far below the 10s the work would have taken
+        assert time.perf_counter() - started < 5
+
+
+async def test_rag_requests_stop_at_the_deadline(rag_server, settings):
+    rag_server.app.state.delay = 2
+    client = RagClient(base_url=rag_server.base_url)
+    started = time.perf_counter()
+    with deadline_scope(Deadline(0.2)):
+        # Whether the httpx timeout or the deadline fires first, callers see DeadlineExceeded
+        with pytest.raises(DeadlineExceeded):
+            await client.query(RagQueryParams(query="slow"))
+    assert time.perf_counter() - started < 1.5
+    await client.aclose()
+
+
+async def test_httpx_timeout_at_the_deadline_is_reported_as_deadline_exceeded():
+    def handler(request):
+        # Blocks past the deadline, so the httpx timeout is what ends the request
+        time.sleep(0.06)
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    client = RagClient(base_url="http://rag.test", transport=httpx.MockTransport(handler))
+    with deadline_scope(Deadline(0.05)):
+        with pytest.raises(DeadlineExceeded):
+            await client.query(RagQueryParams(query="slow"))
+    # Without a deadline the timeout is an ordinary transport error
+    with pytest.raises(httpx.ReadTimeout):
+        await client.query(RagQueryParams(query="other"))
+    await client.aclose()
+
+
+def looping_responder(messages):
+    """Keeps calling tools unless told that time is up"""
+    if isinstance(messages[0], SystemMessage) and "time budget" in messages[0].content:
+        return AIMessage(content="Best effort: memory looks high.")
+    return AIMessage(content="", tool_calls=[{
+        "name": "check_metrics",
+        "args": {"resource_type": "kubernetes", "resource_id": "api"},
+        "id": f"call-{len(messages)}",
+    }])
+
+
+async def test_low_budget_produces_best_effort_answer(settings, monkeypatch):
+    # The best-effort answer takes 0.1s of the 1s reserve, leaving wide slack for slow machines
+    monkeypatch.setattr(settings, "DEADLINE_ANSWER_RESERVE_MS", 1000)
+    monkeypatch.setattr(settings, "DEADLINE_MIN_LLM_MS", 50)
+    agent = SupervisorAgent(model_name="fake", provider="fake", llm=FakeChatModel(
+        responder=looping_responder, latency=0.1
+    ))
+
+    started = time.perf_counter()
+    result = await agent.chat("why is the api slow?", session_id="deadline-1", budget_ms=1500)
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 1.5
+    assert result["response"] == "Best effort: memory looks high."
+    assert result["metadata"]["deadline"]["exceeded"] is True
+    assert result["metadata"]["deadline"]["budget_ms"] == 1500
+    assert "check_metrics" in result["metadata"]["tools_used"]
+
+
+async def test_model_call_past_the_deadline_falls_back_to_findings(settings, monkeypatch):
+    monkeypatch.setattr(settings, "DEADLINE_ANSWER_RESERVE_MS", 0)
+    # The first step fits in the budget with room to spare; a later one is cut off mid-call
+    agent = SupervisorAgent(model_name="fake", provider="fake", llm=FakeChatModel(
+        responder=looping_responder, latency=0.1
+    ))
+    result = await agent.chat("why is the api slow?", session_id="deadline-2", budget_ms=750)
+
+    assert result["response"].startswith("I ran out of time")
+    assert "check_metrics" in result["response"]
+    assert result["metadata"]["deadline"]["exceeded"] is True
+
+
+async def test_no_deadline_by_default():
+    agent = SupervisorAgent(model_name="fake", provider="fake", llm=FakeChatModel())
+    result = await agent.chat("hi", session_id="deadline-3")
+    assert "deadline" not in result["metadata"]
+
+
+async def test_deadline_answers_are_not_cached(settings, monkeypatch):
+    monkeypatch.setattr(settings, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "DEADLINE_ANSWER_RESERVE_MS", 0)
+    agent = SupervisorAgent(model_name="fake", provider="fake", llm=FakeChatModel(
+        responder=looping_responder, latency=0.1
+    ))
+    agent.answer_cache = TTLCache(max_size=2, default_ttl=60)
+    result = await agent.chat("why is the api slow?", session_id="deadline-4", budget_ms=250)
+    assert result["metadata"]["deadline"]["exceeded"] is True
+
+    agent.llm.responder = lambda messages: AIMessage(content="Fresh answer")
+    result = await agent.chat("why is the api slow?", session_id="deadline-5")
+    assert result["response"] == "Fresh answer"
+    assert result["metadata"]["cache"]["hit"] is False
+
+
+async def test_escalation_under_a_near_expired_deadline_ends_the_turn(settings, monkeypatch):
+    monkeypatch.setattr(settings, "DEADLINE_ANSWER_RESERVE_MS", 1000)
+    monkeypatch.setattr(settings, "DEADLINE_MIN_LLM_MS", 50)
+    small = FakeChatModel(responder=lambda messages: AIMessage(content="I'm not sure."), latency=0.3)
+    large = FakeChatModel(responder=lambda messages: AIMessage(content="large answer"), latency=5)
+    agent = SupervisorAgent(model_name="small", provider="fake", llm=small, escalation_llm=large)
+
+    # The escalated step starts inside the answer reserve and answers best-effort
+    result = await asyncio.wait_for(agent.chat("why?", session_id="deadline-5", budget_ms=1200), timeout=5)
+    assert result["metadata"]["deadline"]["exceeded"] is True
+    assert small.calls == 2
+    assert large.calls == 0
+
+    # The escalated call is cut off by the deadline and falls back to the findings
+    monkeypatch.setattr(settings, "DEADLINE_ANSWER_RESERVE_MS", 0)
+    result = await asyncio.wait_for(agent.chat("why?", session_id="deadline-6", budget_ms=600), timeout=5)
+    assert result["response"].startswith("I ran out of time")
+    assert large.calls == 1
+    state = await agent.graph.aget_state({"configurable": {"thread_id": "deadline-6"}})
+    assert len(state.values["messages"]) == 2
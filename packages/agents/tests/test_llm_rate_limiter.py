@@ -0,0 +1,138 @@
+"""
+Tests for the client-side LLM rate limiter.
+"""
+import asyncio
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableBinding
+
+from agents.supervisor import SupervisorAgent
+from config import get_settings
+from services import llm_rate_limiter as rate_limiter_module
+from services.llm_rate_limiter import (
+    LLM_RATE_LIMIT_WAIT, LlmRateLimiter, ModelRateLimiter, RateLimitedChatModel, parse_model_limits
+)
+from tests.fake_llm import FakeChatModel
+
+
+async def test_calls_wait_for_tokens_in_arrival_order():
+    # 6000 tokens per minute refill at 100 tokens per second
+    limiter = ModelRateLimiter("fake", "fifo", tpm=6000)
+    await limiter.acquire(6000)
+    finished = []
+
+    async def call(name, tokens):
+        await limiter.acquire(tokens)
+        finished.append(name)
+
+    started = time.monotonic()
+    large = asyncio.create_task(call("large", 20))
+    await asyncio.sleep(0)
+    small = asyncio.create_task(call("small", 1))
+    await asyncio.gather(large, small)
+
+    # The small call fits first but does not overtake the queued large one
+    assert finished == ["large", "small"]
+    assert 0.15 < time.monotonic() - started < 1.0
+    stats = limiter.get_stats()
+    assert stats["throttled"] == 2
+    assert stats["queued"] == 0
+    assert LLM_RATE_LIMIT_WAIT.labels("fake", "fifo").count == 3
+
+
+async def test_request_bucket_limits_calls_per_minute():
+    limiter = ModelRateLimiter("fake", "rpm", rpm=600)
+    for _ in range(600):
+        await limiter.acquire(0)
+    started = time.monotonic()
+    await limiter.acquire(0)
+    # 600 requests per minute refill one every 0.1s
+    assert 0.05 < time.monotonic() - started < 0.5
+
+
+async def test_cancelled_call_does_not_hold_up_the_queue():
+    limiter = ModelRateLimiter("fake", "cancel", tpm=6000)
+    await limiter.acquire(6000)
+    large = asyncio.create_task(limiter.acquire(100))
+    await asyncio.sleep(0)
+    small = asyncio.create_task(limiter.acquire(5))
+    await asyncio.sleep(0.01)
+    large.cancel()
+
+    started = time.monotonic()
+    await asyncio.wait_for(small, 0.5)
+    assert time.monotonic() - started < 0.2
+    assert limiter.get_stats()["queued"] == 0
+
+
+async def test_usage_corrects_the_estimate():
+    limiter = ModelRateLimiter("fake", "settle", tpm=6000)
+    reserved = await limiter.acquire(1000)
+    limiter.settle(reserved, 3000)
+    assert limiter.get_stats()["tokens_available"] < 3100
+
+    # Calls larger than a minute's allowance drain the bucket instead of waiting forever
+    assert await asyncio.wait_for(ModelRateLimiter("fake", "huge", tpm=600).acquire(10_000), 0.1) == 600
+
+
+def test_limits_are_resolved_per_provider_and_model():
+    assert parse_model_limits("anthropic=50, openai:gpt-4o=5000,bad") == {"anthropic": 50, "openai:gpt-4o": 5000}
+    limiter = LlmRateLimiter(
+        rpm=500, tpm=0, rpm_limits={"anthropic": 50, "openai:gpt-4o": 0}, tpm_limits={"anthropic": 40000}
+    )
+    assert limiter.for_model("anthropic", "claude").requests.capacity == 50
+    assert limiter.for_model("anthropic", "claude").tokens.capacity == 40000
+    assert limiter.for_model("openai", "gpt-4o-mini").requests.capacity == 500
+    # No limits left for this model: calls go straight to the provider
+    assert limiter.for_model("openai", "gpt-4o") is None
+    llm = FakeChatModel()
+    assert limiter.wrap(llm, "openai", "gpt-4o") is llm
+    assert isinstance(limiter.wrap(llm, "openai", "gpt-4o-mini"), RateLimitedChatModel)
+
+
+async def test_agent_calls_go_through_the_limiter():
+    limiter = LlmRateLimiter(rpm=1000, tpm=100_000)
+    reported = AIMessage(content="All good", usage_metadata={"input_tokens": 900, "output_tokens": 100, "total_tokens": 1000})
+    llm = limiter.wrap(FakeChatModel(responder=lambda messages: reported), "fake", "wrapped")
+    agent = SupervisorAgent(model_name="wrapped", provider="fake", llm=llm)
+
+    result = await agent.chat("status?", session_id="rate-limit-1")
+    assert result["response"] == "All good"
+    events = [event async for event in agent.stream_chat("status?", session_id="rate-limit-2")]
+    assert "".join(event["data"] for event in events if event["type"] == "content") == "All good"
+
+    stats = limiter.get_stats()["fake:wrapped"]
+    assert stats["calls"] == 2
+    # The first call's reported usage replaced its estimate; the stream's usage is estimated
+    assert stats["tokens_available"] < 100_000 - 1000
+
+
+def test_created_models_are_rate_limited(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(rate_limiter_module, "_llm_rate_limiter", LlmRateLimiter(rpm=500, tpm=200_000))
+    agent = SupervisorAgent(model_name="gpt-4o-mini", provider="openai")
+
+    assert isinstance(agent.llm, RateLimitedChatModel)
+    assert agent.llm.limiter is rate_limiter_module._llm_rate_limiter.for_model("openai", "gpt-4o-mini")
+    # Tools are formatted by the provider's model but calls still go through the wrapper
+    assert isinstance(agent.model_with_tools, RunnableBinding)
+    assert agent.model_with_tools.bound is agent.llm
+    assert agent.model_with_tools.kwargs["tools"]
+    assert agent.llm._get_ls_params()["ls_provider"] == "openai"
+
+
+def test_sync_calls_warn_that_they_are_not_limited(caplog):
+    llm = LlmRateLimiter(rpm=1000).wrap(FakeChatModel(), "fake", "sync")
+    with caplog.at_level("WARNING", logger="services.llm_rate_limiter"):
+        llm.invoke("status?")
+    assert "Synchronous call to fake:sync bypasses the rate limiter" in caplog.text
+
+
+def test_no_limits_by_default(monkeypatch):
+    monkeypatch.setattr(rate_limiter_module, "_llm_rate_limiter", None)
+    settings = get_settings()
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_ENABLED", True)
+    llm = FakeChatModel()
+    assert rate_limiter_module.get_llm_rate_limiter().wrap(llm, "openai", "gpt-4o-mini") is llm
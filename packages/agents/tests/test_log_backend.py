@@ -0,0 +1,166 @@
+"""
+Tests for the streaming log query path.
+"""
+import time
+import tracemalloc
+
+import pytest
+
+from services.log_backend import (
+    LogBackendClient,
+    compile_matcher,
+    decode_cursor,
+    encode_cursor,
+    LogWindow,
+    parse_line,
+    parse_time_range,
+)
+from tools.system_tools import QueryLogsTool
+
+
+def test_parse_time_range():
+    assert parse_time_range("30m") == 1800
+    assert parse_time_range("1h") == 3600
+    assert parse_time_range("7D") == 604800
+    with pytest.raises(ValueError):
+        parse_time_range("yesterday")
+
+
+def test_compiled_matchers():
+    line = "2024-12-02 07:10:15 [ERROR] Connection timeout to database server"
+    assert compile_matcher("")(line)
+    assert compile_matcher("TIMEOUT")(line)
+    assert compile_matcher("timeout database")(line)
+    assert not compile_matcher("timeout cache")(line)
+    assert compile_matcher("exception|timeout")(line)
+    assert compile_matcher('"database server"')(line)
+    assert not compile_matcher('"server database"')(line)
+    assert compile_matcher(r"/time(d )?out to \w+/")(line)
+    with pytest.raises(ValueError):
+        compile_matcher("/(unclosed/")
+
+
+def test_parse_text_and_json_lines():
+    text = parse_line("2024-12-02 07:10:15.250 [WARN] High memory usage detected: 85%")
+    assert text.level == "WARN"
+    assert text.message == "High memory usage detected: 85%"
+    assert text.timestamp == pytest.approx(1733123415.25)
+    assert text.render() == "2024-12-02 07:10:15.250 [WARN] High memory usage detected: 85%"
+
+    entry = parse_line('{"timestamp": 1733123415000, "level": "error", "message": "boom"}')
+    assert (entry.level, entry.message, entry.timestamp) == ("ERROR", "boom", 1733123415)
+
+    plain = parse_line("no timestamp here", max_chars=5)
+    assert plain.timestamp is None
+    assert plain.message == "no ti"
+
+
+def test_cursor_round_trip_and_validation():
+    cursor = encode_cursor(LogWindow(since=1.5, until=2.5, offset=40), "key")
+    assert decode_cursor(cursor, "key") == LogWindow(since=1.5, until=2.5, offset=40)
+    with pytest.raises(ValueError, match="different query"):
+        decode_cursor(cursor, "other")
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor", "key")
+
+
+async def test_time_range_is_pushed_down(log_backend, backend_server):
+    result = await log_backend.query_logs("kubernetes", "api", "timeout", time_range="1h", max_lines=1000)
+    params = backend_server.app.state.log_params
+
+    assert params["until"] - params["since"] == pytest.approx(3600)
+    # Half of the 2h window is streamed; 1 in 6 lines is a timeout
+    assert result.scanned_lines == pytest.approx(1000, abs=2)
+    assert len(result.entries) == pytest.approx(1000 / 6, abs=2)
+    assert result.next_cursor is None
+    assert all(result.since <= entry.timestamp <= result.until for entry in result.entries)
+
+
+async def test_time_range_is_enforced_without_pushdown(log_backend, backend_server):
+    backend_server.app.state.log_pushdown = False
+    result = await log_backend.query_logs("kubernetes", "api", "timeout", time_range="1h", max_lines=1000)
+
+    assert result.scanned_lines == 2000
+    assert len(result.entries) == pytest.approx(1000 / 6, abs=2)
+    assert all(result.since <= entry.timestamp <= result.until for entry in result.entries)
+
+
+async def test_json_lines_match_on_content_only(log_backend, backend_server):
+    backend_server.app.state.log_format = "json"
+    result = await log_backend.query_logs("kubernetes", "api", "error", max_lines=1000)
+    assert result.entries
+    assert all(entry.level == "ERROR" or "error" in entry.message.lower() for entry in result.entries)
+
+    # "timestamp" is a JSON key in every line but not part of any log content
+    assert (await log_backend.query_logs("kubernetes", "api", "timestamp")).entries == []
+
+
+async def test_pages_follow_cursors_without_gaps(log_backend, backend_server):
+    backend_server.app.state.log_end = time.time()
+    everything = await log_backend.query_logs("kubernetes", "api", "error", max_lines=1000)
+
+    pages, cursor = [], None
+    while True:
+        page = await log_backend.query_logs("kubernetes", "api", "error", max_lines=100, cursor=cursor)
+        pages.extend(page.entries)
+        assert len(page.entries) <= 100
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    assert [entry.render() for entry in pages] == [entry.render() for entry in everything.entries]
+    with pytest.raises(ValueError):
+        await log_backend.query_logs("kubernetes", "api", "warn", cursor=page.next_cursor or encode_cursor(
+            LogWindow(0, 1), "stale"
+        ))
+
+
+async def test_scan_stops_at_max_lines_with_flat_memory(backend_server):
+    app = backend_server.app
+    app.state.log_lines = 100_000
+    app.state.log_span = 3000.0
+    client = LogBackendClient(base_url=backend_server.base_url)
+
+    early = await client.query_logs("kubernetes", "api", "NullPointerException", max_lines=20)
+    assert len(early.entries) == 20
+    assert early.next_cursor is not None
+    # The stream was closed long before the backend produced the whole window
+    assert app.state.log_lines_sent < 10_000
+
+    tracemalloc.start()
+    try:
+        full = await client.query_logs("kubernetes", "api", "no such line", max_lines=20)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    await client.aclose()
+
+    assert full.entries == []
+    assert full.scanned_lines >= 99_990
+    assert full.scanned_bytes > 6_000_000
+    # Peak allocations stay far below the size of the streamed window
+    assert peak < 2_000_000
+
+
+async def test_query_logs_tool_pages_with_cursor(settings, monkeypatch):
+    monkeypatch.setattr(settings, "LOG_TEMPLATES_ENABLED", False)
+    tool = QueryLogsTool()
+    output = await tool.ainvoke({
+        "resource_type": "kubernetes", "resource_id": "api", "query": "timeout", "max_lines": 5,
+    })
+    assert output.startswith("Logs for kubernetes/api matching 'timeout' (last 1h):")
+    assert "Found 5 matching entries" in output
+    assert "[ERROR] Connection timeout to database server" in output
+    cursor = output.split('cursor="')[1].rstrip('"')
+
+    following = await tool.ainvoke({
+        "resource_type": "kubernetes", "resource_id": "api", "query": "timeout", "max_lines": 5, "cursor": cursor,
+    })
+    assert "(next page)" in following
+    assert "Found 5 matching entries" in following
+
+    none = await tool.ainvoke({"resource_type": "kubernetes", "resource_id": "api", "query": "segfault"})
+    assert "No logs found matching 'segfault'" in none
+
+    failed = await tool.ainvoke({"resource_type": "kubernetes", "resource_id": "missing", "query": "x"})
+    assert failed.startswith("Error querying logs:")
@@ -0,0 +1,86 @@
+"""
+Tests for log template mining.
+"""
+from benchmarks.log_templates import generate_lines, run
+from services.log_backend import parse_line
+from services.log_templates import WILDCARD, TemplateMiner, format_templates, mask_tokens
+from tools.system_tools import QueryLogsTool
+
+
+def test_masks_obvious_variables():
+    _, masked = mask_tokens("took 250ms from 10.0.0.1:8080 id=42 0xdeadbeef 3fa85f64-5717-4562-b3fc-2c963f66afa6 (3/5)")
+    assert masked == ["took", WILDCARD, "from", WILDCARD, WILDCARD, WILDCARD, WILDCARD, WILDCARD]
+
+
+def test_similar_lines_share_a_template():
+    miner = TemplateMiner()
+    miner.add("Connection timeout to database server db-0", "ERROR", 100.0)
+    miner.add("Connection timeout to database server db-1", "ERROR", 50.0)
+    template = miner.add("Connection timeout to database server db-2", "ERROR", 200.0)
+
+    assert len(miner.templates) == 1
+    assert template.template == "Connection timeout to database server <*>"
+    assert template.count == 3
+    assert (template.first_seen, template.last_seen) == (50.0, 200.0)
+    # Examples are collected from the line that created the variable slot onwards
+    assert template.examples == [("db-1",), ("db-2",)]
+
+
+def test_levels_and_lengths_do_not_mix():
+    miner = TemplateMiner()
+    miner.add("Connection timeout to database server db-0", "ERROR")
+    miner.add("Connection timeout to database server db-0", "WARN")
+    miner.add("Connection timeout to database server db-0 again", "ERROR")
+    miner.add("Disk almost full on node-1", "ERROR")
+    assert len(miner.templates) == 4
+
+
+def test_examples_are_distinct_and_bounded():
+    miner = TemplateMiner(max_examples=2)
+    for value in [1, 1, 2, 3]:
+        template = miner.add(f"retry attempt {value}")
+    assert template.examples == [("1",), ("2",)]
+    assert template.count == 4
+
+
+def test_format_lists_top_templates_and_omitted_rest():
+    miner = TemplateMiner()
+    for line in generate_lines(2000):
+        miner.add_entry(parse_line(line))
+    text = format_templates(miner, limit=5)
+    lines = text.splitlines()
+
+    assert len(lines) == 6
+    assert lines[0].strip().startswith(f"{miner.top(1)[0].count}x [")
+    assert "first 07:00:" in lines[0]
+    assert " e.g. " in lines[0]
+    assert lines[-1].strip().startswith(f"... {len(miner.templates) - 5} rarer patterns")
+
+
+def test_mining_compresses_output():
+    result = run(lines=5000, repeat=1)
+    assert result["output_chars"] * 50 < result["input_chars"]
+
+
+async def test_query_logs_tool_groups_large_results(backend_server):
+    backend_server.app.state.log_lines = 10_000
+    output = await QueryLogsTool().ainvoke({
+        "resource_type": "kubernetes", "resource_id": "api", "query": "*", "max_lines": 20,
+    })
+    lines = output.splitlines()
+
+    assert "Found 5000 matching entries (scanned 5000 lines), grouped into 6 patterns" in output
+    assert len(lines) < 20
+    assert any("[ERROR] Connection timeout to database server <*>" in line for line in lines)
+    assert any(line.strip().startswith("833x [INFO] GET <*>") for line in lines)
+    # The scan stopped at LOG_TEMPLATE_SCAN_LINES; the rest of the window is one cursor away
+    assert 'cursor="' in output
+
+
+async def test_query_logs_tool_keeps_small_results_verbatim():
+    output = await QueryLogsTool().ainvoke({
+        "resource_type": "kubernetes", "resource_id": "api", "query": "NullPointerException", "time_range": "5m",
+    })
+    assert "grouped into" not in output
+    assert "1. " in output
+    assert "[ERROR] Failed to process message" in output
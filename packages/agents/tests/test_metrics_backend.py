@@ -0,0 +1,138 @@
+"""
+Tests for the metrics backend client and time-series summaries.
+"""
+import time
+import warnings
+
+import numpy as np
+import pytest
+import httpx
+
+from services.metrics_backend import (
+    MetricSeries,
+    MetricsBackendClient,
+    format_summary,
+    parse_series,
+    summarize_series,
+)
+from tools.system_tools import CheckMetricsTool
+
+
+def series(values, step=60.0, name="cpu"):
+    values = np.asarray(values, dtype=np.float64)
+    return MetricSeries(name=name, unit="%", timestamps=np.arange(values.size) * step, values=values)
+
+
+def test_summary_statistics_and_trend():
+    summary = summarize_series(series(np.linspace(20, 80, 61)), points=6)
+
+    assert summary.count == 61
+    assert summary.avg == pytest.approx(50)
+    assert (summary.min, summary.max, summary.last) == (20, 80, 80)
+    assert summary.p95 == pytest.approx(77)
+    # 1 unit per minute
+    assert summary.slope_per_hour == pytest.approx(60)
+    assert summary.trend == "rising"
+    assert len(summary.series) == 6
+    assert summary.series == sorted(summary.series)
+    assert summary.bucket_seconds == pytest.approx(600)
+
+
+def test_flat_and_falling_trends():
+    assert summarize_series(series(60 + np.sin(np.arange(200)))).trend == "flat"
+    assert summarize_series(series(np.linspace(90, 70, 50))).trend == "falling"
+    assert summarize_series(series([42.0])).trend == "flat"
+
+
+def test_invalid_samples_are_dropped_and_order_restored():
+    data = MetricSeries(
+        name="cpu",
+        unit="%",
+        timestamps=np.array([3.0, 1.0, 2.0, 4.0]),
+        values=np.array([30.0, 10.0, 20.0, np.nan]),
+    )
+    summary = summarize_series(data)
+    assert summary.count == 3
+    assert summary.last == 30
+    assert summary.series == [10, 20, 30]
+    assert summarize_series(series([np.nan, np.nan])) is None
+
+
+def test_parse_series_accepts_points_and_iso_timestamps():
+    parsed = parse_series({"name": "memory", "unit": "MB", "points": [
+        ["2024-12-01T00:00:00Z", 10], ["2024-12-01T00:01:00Z", 12],
+    ]})
+    assert parsed.name == "memory"
+    assert parsed.timestamps[1] - parsed.timestamps[0] == 60
+    assert parsed.values.tolist() == [10, 12]
+
+
+def test_iso_timestamps_with_offsets_are_normalized_to_utc():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        parsed = parse_series({"timestamps": [
+            "2024-12-01T00:00:00Z", "2024-12-01T02:01:00+02:00", "2024-11-30T19:02:00-05:00", "2024-12-01T00:03:00",
+        ], "values": [1, 2, 3, 4]})
+    assert parsed.timestamps.tolist() == [1733011200 + 60 * minute for minute in range(4)]
+
+
+def test_format_summary_is_compact():
+    text = format_summary(summarize_series(series(np.linspace(20, 80, 5000), step=1), points=12))
+    lines = text.splitlines()
+    assert len(lines) == 2
+    assert "trend rising" in lines[0]
+    assert "[5000 samples]" in lines[0]
+    assert lines[1].strip().startswith("per ")
+    assert len(lines[1].split(":")[1].split()) == 12
+
+
+def test_thousands_of_points_summarize_in_milliseconds():
+    rng = np.random.default_rng(0)
+    data = series(rng.normal(50, 10, 10_000), step=1)
+    summarize_series(data)
+
+    runs = 50
+    started = time.perf_counter()
+    for _ in range(runs):
+        summarize_series(data)
+    per_call = (time.perf_counter() - started) / runs
+    assert per_call < 0.005
+
+
+async def test_client_fetches_and_summarizes(backend_server, settings):
+    client = MetricsBackendClient(base_url=backend_server.base_url)
+    summaries = await client.summarize("kubernetes", "api", ["cpu", "memory"], "6h")
+    await client.aclose()
+
+    assert backend_server.app.state.last_params == {
+        "resource_type": "kubernetes", "resource_id": "api", "metric_type": "cpu,memory", "time_range": "6h",
+    }
+    assert [summary.name for summary in summaries] == ["cpu", "memory"]
+    assert summaries[0].count == 360
+    assert summaries[0].trend == "rising"
+    assert summaries[1].trend == "flat"
+
+
+async def test_client_raises_on_backend_errors(backend_server, settings):
+    client = MetricsBackendClient(base_url=backend_server.base_url)
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get_metrics("kubernetes", "missing", ["cpu"])
+    await client.aclose()
+
+
+async def test_check_metrics_tool_returns_summaries(settings):
+    tool = CheckMetricsTool()
+
+    output = await tool.ainvoke({"resource_type": "kubernetes", "resource_id": "api", "metric_type": "cpu, disk"})
+    assert output.startswith("Metrics for kubernetes/api (last 1h):")
+    assert "cpu: avg 50%" in output
+    assert "trend rising" in output
+    assert "trend falling" in output
+    # A compact summary rather than the raw samples
+    assert len(output) < 1000
+
+    missing = await tool.ainvoke({"resource_type": "kubernetes", "resource_id": "api", "metric_type": "unknown"})
+    assert "No metric data found for unknown" in missing
+
+    failed = await tool.ainvoke({"resource_type": "kubernetes", "resource_id": "missing"})
+    assert failed.startswith("Error checking metrics:")
@@ -0,0 +1,92 @@
+"""
+Tests for speculative RAG prefetch.
+"""
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+
+from agents.prefetch import query_similarity
+from agents.supervisor import SupervisorAgent
+from services import rag_client as rag_client_module
+from services.rag_client import RagClient
+from tests.fake_llm import FakeChatModel
+
+QUESTION = "checkout pods keep restarting after deploy"
+
+
+@pytest.fixture
+def prefetch_settings(rag_server, settings, monkeypatch):
+    monkeypatch.setattr(settings, "PREFETCH_ENABLED", True)
+    monkeypatch.setattr(rag_client_module, "_rag_client", RagClient(base_url=rag_server.base_url))
+    rag_server.app.state.delay = 0.15
+    return settings
+
+
+def incident_search(**args):
+    def responder(messages):
+        if isinstance(messages[-1], ToolMessage):
+            return AIMessage(content=f"Answer based on: {messages[-1].content[:40]}")
+        return AIMessage(content="", tool_calls=[
+            {"name": "search_incident_logs", "args": {"query": QUESTION, **args}, "id": "call-1"}
+        ])
+    return responder
+
+
+def test_query_similarity():
+    assert query_similarity("Pods keep restarting", "pods keep restarting!") == 1.0
+    assert query_similarity("pods restarting", "disk full") == 0.0
+    assert query_similarity("", "disk") == 0.0
+
+
+async def test_matching_tool_call_uses_prefetched_result(prefetch_settings, rag_server):
+    agent = SupervisorAgent(model_name="fake", provider="fake", llm=FakeChatModel(
+        responder=incident_search(), latency=0.15
+    ))
+
+    started = time.perf_counter()
+    result = await agent.chat(QUESTION, session_id="prefetch-1")
+    elapsed = time.perf_counter() - started
+
+    assert result["response"].startswith("Answer based on: Found 1 similar past incidents")
+    # The incident search overlapped the first model call instead of following it
+    assert elapsed < 0.15 * 3
+    assert rag_server.app.state.query_count == 2
+
+    stats = agent.prefetcher.get_stats()
+    assert stats["used"] == 1
+    assert stats["wasted"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["saved_seconds"] >= 0.1
+    assert stats["active_turns"] == 0
+
+
+async def test_different_arguments_run_the_tool_normally(prefetch_settings, rag_server):
+    agent = SupervisorAgent(model_name="fake", provider="fake", llm=FakeChatModel(
+        responder=incident_search(top_k=5)
+    ))
+    await agent.chat(QUESTION, session_id="prefetch-2")
+
+    assert agent.prefetcher.get_stats()["used"] == 0
+    assert agent.prefetcher.get_stats()["wasted"] == 2
+    assert rag_server.app.state.query_count == 3
+
+
+async def test_prefetch_searches_question_without_context(prefetch_settings):
+    agent = SupervisorAgent(model_name="fake", provider="fake", llm=FakeChatModel(responder=incident_search()))
+    await agent.chat(QUESTION, session_id="prefetch-3", context={"namespace": "shop", "cluster": "eu-1"})
+    assert agent.prefetcher.get_stats()["used"] == 1
+
+
+async def test_concurrent_turns_of_a_session_keep_their_own_prefetches(prefetch_settings):
+    agent = SupervisorAgent(model_name="fake", provider="fake", llm=FakeChatModel(
+        responder=incident_search(), latency=0.05
+    ))
+    results = await asyncio.gather(*[agent.chat(QUESTION, session_id="prefetch-4") for _ in range(2)])
+
+    # A later turn does not cancel the prefetches of one still running
+    assert all(result["response"].startswith("Answer based on: Found 1") for result in results)
+    stats = agent.prefetcher.get_stats()
+    assert stats["used"] == 2
+    assert stats["active_turns"] == 0
@@ -0,0 +1,149 @@
+"""
+Tests for the Prometheus metrics registry and service instrumentation.
+"""
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage, ToolMessage
+
+from agents.supervisor import SupervisorAgent
+from main import app
+from routes import agents as agents_routes
+from services import rag_client as rag_client_module
+from services.prometheus import (
+    GRAPH_STEPS, HTTP_REQUEST_DURATION, LLM_REQUEST_DURATION, LLM_TOKENS, RAG_REQUEST_DURATION,
+    TOOL_CALLS, TOOL_DURATION, MetricsRegistry, route_template, get_metrics_registry
+)
+from services.rag_client import RagClient
+from services.streaming import get_stream_stats
+from tests.fake_llm import FakeChatModel
+
+
+def tool_then_answer(messages):
+    """Call check_metrics once, then answer"""
+    if isinstance(messages[-1], ToolMessage):
+        return AIMessage(content="All good")
+    return AIMessage(content="", tool_calls=[{
+        "name": "check_metrics", "args": {"resource_type": "kubernetes", "resource_id": "api"}, "id": "call-1"
+    }])
+
+
+def test_render_text_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("path",))
+    requests.labels('/a"b').inc()
+    requests.labels('/a"b').inc(2)
+    registry.gauge("queue_depth", "Queued items").set(3)
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        latency.observe(value)
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{path="/a\\"b"} 3' in text
+    assert "queue_depth 3" in text
+    assert "# TYPE latency_seconds histogram" in text
+    # Buckets are cumulative and upper bounds are inclusive
+    assert 'latency_seconds_bucket{le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{le="1"} 3' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+    assert "latency_seconds_sum 5.65" in text
+    assert "latency_seconds_count 4" in text
+    assert text.endswith("\n")
+
+
+def test_registry_rejects_invalid_use():
+    registry = MetricsRegistry()
+    counter = registry.counter("calls_total", "Calls", ("tool", "status"))
+    with pytest.raises(ValueError):
+        registry.counter("calls_total", "Calls again")
+    with pytest.raises(ValueError):
+        counter.labels("only-tool")
+
+
+def test_gauge_function_is_read_at_render_time():
+    registry = MetricsRegistry()
+    value = {"current": 1}
+    registry.gauge("open_things", "Open things").set_function(lambda: value["current"])
+    value["current"] = 7
+    assert "open_things 7" in registry.render()
+
+
+def test_observation_overhead_is_below_a_microsecond():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("overhead_seconds", "Overhead", ("route",))
+    counter = registry.counter("overhead_total", "Overhead", ("route",))
+    n = 100_000
+
+    def per_call(fn):
+        best = float("inf")
+        for _ in range(5):
+            started = time.perf_counter()
+            for _ in range(n):
+                fn()
+            best = min(best, (time.perf_counter() - started) / n)
+        return best
+
+    # Including the label lookup, as the instrumented code paths do it
+    assert per_call(lambda: histogram.labels("/api/agents/chat").observe(0.042)) < 1e-6
+    assert per_call(lambda: counter.labels("/api/agents/chat").inc()) < 1e-6
+
+
+async def test_agent_turn_records_graph_tool_and_llm_metrics():
+    agent = SupervisorAgent(model_name="prom-model", provider="fake", llm=FakeChatModel(responder=tool_then_answer))
+    agent_steps = GRAPH_STEPS.labels("agent").value
+    tool_steps = GRAPH_STEPS.labels("tools").value
+    ok_calls = TOOL_CALLS.labels("check_metrics", "ok").value
+    tool_count = TOOL_DURATION.labels("check_metrics").count
+
+    result = await agent.chat("How is the api doing?", session_id="prometheus-1")
+    assert result["response"] == "All good"
+
+    assert GRAPH_STEPS.labels("agent").value == agent_steps + 2
+    assert GRAPH_STEPS.labels("tools").value == tool_steps + 1
+    assert TOOL_CALLS.labels("check_metrics", "ok").value == ok_calls + 1
+    assert TOOL_DURATION.labels("check_metrics").count == tool_count + 1
+    assert LLM_REQUEST_DURATION.labels("fake", "prom-model").count == 2
+    # The fake model reports no usage, so tokens are estimated
+    assert LLM_TOKENS.labels("fake", "prom-model", "input").value > 0
+    assert LLM_TOKENS.labels("fake", "prom-model", "output").value > 0
+
+
+async def test_rag_requests_are_timed(rag_server, settings, monkeypatch):
+    client = RagClient(base_url=rag_server.base_url)
+    monkeypatch.setattr(rag_client_module, "_rag_client", client)
+    before = RAG_REQUEST_DURATION.labels("GET", "/health", 200).count
+    try:
+        await client.check_health()
+    finally:
+        await client.aclose()
+    assert RAG_REQUEST_DURATION.labels("GET", "/health", 200).count == before + 1
+
+
+def test_metrics_endpoint(monkeypatch):
+    agent = SupervisorAgent(model_name="prom-http", provider="fake", llm=FakeChatModel())
+    monkeypatch.setattr(agents_routes, "get_agent", lambda *args, **kwargs: agent)
+    before = HTTP_REQUEST_DURATION.labels("POST", "/api/agents/chat", 200).count
+
+    with TestClient(app) as client:
+        client.post("/api/agents/chat", json={"message": "hello", "session_id": "prometheus-2"})
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert HTTP_REQUEST_DURATION.labels("POST", "/api/agents/chat", 200).count == before + 1
+    # Routes are labelled by template, so the series count stays bounded
+    assert 'route="/api/agents/chat",status="200"' in response.text
+    assert 'agents_llm_request_duration_seconds_count{provider="fake",model="prom-http"} 1' in response.text
+    assert f"agents_stream_active_connections {get_stream_stats().active}" in response.text
+
+
+def test_route_template_hides_path_parameters():
+    scope = {"endpoint": object(), "path": "/api/agents/sessions/abc-123", "path_params": {"session_id": "abc-123"}}
+    assert route_template(scope) == "/api/agents/sessions/{session_id}"
+    assert route_template({"path": "/random/scan"}) == "<unmatched>"
+
+
+def test_global_registry_is_shared():
+    assert get_metrics_registry().get("agents_tool_calls_total") is TOOL_CALLS
@@ -0,0 +1,293 @@
+"""
+Tests for the RAG client.
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from services.cache import SingleFlight, TTLCache
+from services import tracing as tracing_module
+from services.deadline import Deadline, DeadlineExceeded, deadline_scope
+from services.rag_client import RagClient, RagQueryParams
+from services.tracing import Tracer
+
+
+async def test_requests_reuse_pooled_connection(rag_server, settings):
+    """Sequential calls should share one keep-alive connection."""
+    client = RagClient(base_url=rag_server.base_url)
+    await client.start()
+    try:
+        await client.query(RagQueryParams(query="pod restarting"))
+        await client.search("pod restarting", filters={"category": "incident"})
+        await client.check_health()
+        await client.get_index_stats()
+
+        stats = client.get_pool_stats()
+        assert stats["open"] is True
+        assert stats["requests_total"] == 4
+        assert stats["requests_in_flight"] == 0
+        assert stats["connections_opened"] == 1
+    finally:
+        await client.aclose()
+
+    assert client.get_pool_stats()["open"] is False
+
+
+async def test_concurrent_requests_are_bounded_by_pool(rag_server, settings):
+    """Concurrent calls open at most max_connections connections."""
+    rag_server.app.state.delay = 0.05
+    client = RagClient(base_url=rag_server.base_url)
+    client.limits = httpx.Limits(max_connections=2, max_keepalive_connections=2)
+    try:
+        await asyncio.gather(*[
+            client.query(RagQueryParams(query=f"query {i}")) for i in range(6)
+        ])
+        assert client.get_pool_stats()["connections_opened"] == 2
+    finally:
+        await client.aclose()
+
+
+async def test_client_reopens_after_close(rag_server):
+    """A closed client transparently reopens its pool on the next call."""
+    client = RagClient(base_url=rag_server.base_url)
+    await client.aclose()
+    health = await client.check_health()
+    assert health.status == "healthy"
+    await client.aclose()
+
+
+def test_ttl_cache_expires_and_evicts():
+    """Entries expire after their TTL and the least recently used entry is evicted."""
+    now = [0.0]
+    cache = TTLCache(max_size=2, default_ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=1)
+    assert cache.get("a") == 1
+
+    now[0] = 2.0
+    assert cache.get("b") is None
+    assert cache.expirations == 1
+
+    cache.set("c", 3)
+    cache.set("d", 4)
+    assert cache.get("a") is None
+    assert cache.evictions == 1
+    assert cache.get_stats()["size"] == 2
+
+
+async def test_repeated_queries_are_served_from_cache(rag_server, settings):
+    """Equivalent queries hit the cache instead of the RAG service."""
+    client = RagClient(base_url=rag_server.base_url)
+    try:
+        first = await client.search("Pod  restarting", filters={"category": "incident", "env": "prod"})
+        second = await client.search("pod restarting ", filters={"env": "prod", "category": "incident"})
+        assert first == second
+        assert rag_server.app.state.query_count == 1
+
+        await client.search("pod restarting", top_k=3)
+        assert rag_server.app.state.query_count == 2
+
+        stats = client.get_stats()["cache"]
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+    finally:
+        await client.aclose()
+
+
+async def test_namespace_ttl_override(rag_server, settings, monkeypatch):
+    """A zero TTL for a namespace disables caching for it."""
+    monkeypatch.setattr(settings, "RAG_CACHE_NAMESPACE_TTLS", "live=0,docs=600")
+    client = RagClient(base_url=rag_server.base_url)
+    try:
+        await client.search("pod restarting", namespace="live")
+        await client.search("pod restarting", namespace="live")
+        assert rag_server.app.state.query_count == 2
+
+        await client.search("pod restarting", namespace="docs")
+        await client.search("pod restarting", namespace="docs")
+        assert rag_server.app.state.query_count == 3
+    finally:
+        await client.aclose()
+
+
+async def test_index_update_invalidates_cache(rag_server, settings):
+    """A new last_updated value from the index stats clears cached results."""
+    client = RagClient(base_url=rag_server.base_url)
+    try:
+        await client.get_index_stats()
+        await client.search("pod restarting")
+        await client.search("pod restarting")
+        assert rag_server.app.state.query_count == 1
+
+        rag_server.app.state.last_updated = "2024-12-02T00:00:00Z"
+        await client.get_index_stats()
+        await client.search("pod restarting")
+        assert rag_server.app.state.query_count == 2
+        assert client.get_stats()["cache"]["invalidations"] == 1
+    finally:
+        await client.aclose()
+
+
+async def test_concurrent_identical_queries_are_coalesced(rag_server, settings, monkeypatch):
+    """Concurrent identical queries share one upstream request."""
+    monkeypatch.setattr(settings, "RAG_CACHE_ENABLED", False)
+    rag_server.app.state.delay = 0.1
+    client = RagClient(base_url=rag_server.base_url)
+    try:
+        results = await asyncio.gather(*[
+            client.search("pod restarting", filters={"category": "incident"}) for _ in range(20)
+        ])
+        assert all(result == results[0] for result in results)
+        assert rag_server.app.state.query_count == 1
+
+        stats = client.get_stats()["coalescing"]
+        assert stats["executions"] == 1
+        assert stats["coalesced"] == 19
+        assert stats["in_flight"] == 0
+    finally:
+        await client.aclose()
+
+
+async def test_coalesced_callers_wait_within_their_own_deadlines(rag_server, settings, monkeypatch):
+    """A short deadline of the first caller does not fail callers that joined its query."""
+    monkeypatch.setattr(settings, "RAG_CACHE_ENABLED", False)
+    rag_server.app.state.delay = 0.3
+    client = RagClient(base_url=rag_server.base_url)
+    tracer = Tracer()
+    monkeypatch.setattr(tracing_module, "_tracer", tracer)
+
+    async def query(budget, name):
+        with tracer.span(name) as span:
+            with deadline_scope(Deadline(budget)):
+                await client.query(RagQueryParams(query="pod restarting"))
+            return span.trace_id
+
+    try:
+        first = asyncio.create_task(query(0.1, "impatient"))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(query(5, "patient"))
+        with pytest.raises(DeadlineExceeded):
+            await first
+        second_trace = await second
+        assert rag_server.app.state.query_count == 1
+
+        # The upstream request is traced under the caller that started it, the wait under the other
+        second_spans = [span["name"] for span in tracer.get_trace(second_trace)]
+        assert "rag coalesced query" in second_spans
+        assert "rag POST /api/query" not in second_spans
+    finally:
+        await client.aclose()
+
+
+async def test_single_flight_shares_errors_and_cancels_when_abandoned():
+    """Waiters share failures, and the call is cancelled once every waiter leaves."""
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    results = await asyncio.gather(flights.do("k", fail), flights.do("k", fail), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+
+    cancelled = asyncio.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    waiter = asyncio.create_task(flights.do("slow", slow))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    assert flights.get_stats()["in_flight"] == 0
+
+
+BATCH_QUERIES = [
+    RagQueryParams(query="pod restarting", filters={"category": "documentation"}),
+    RagQueryParams(query="fail"),
+    RagQueryParams(query="pod restarting", filters={"category": "incident"}),
+    RagQueryParams(query="Pod restarting", filters={"category": "documentation"}),
+]
+
+
+def _assert_batch_results(items):
+    assert [item.query for item in items] == [params.query for params in BATCH_QUERIES]
+    assert items[0].ok and items[0].response.documents[0].id == "doc-1"
+    assert not items[1].ok and items[1].error
+    assert items[2].ok and items[2].response.documents[0].id == "inc-1"
+    assert items[3].ok and items[3].response.documents == items[0].response.documents
+
+
+async def test_query_many_uses_batch_endpoint(rag_server, settings):
+    """Distinct queries are sent in a single batch request."""
+    client = RagClient(base_url=rag_server.base_url)
+    try:
+        items = await client.query_many(BATCH_QUERIES)
+        _assert_batch_results(items)
+        assert rag_server.app.state.batch_count == 1
+        assert rag_server.app.state.query_count == 0
+
+        # Successful results are cached for later single queries
+        await client.search("pod restarting", filters={"category": "incident"})
+        assert rag_server.app.state.query_count == 0
+    finally:
+        await client.aclose()
+
+
+async def test_query_many_falls_back_to_parallel_queries(rag_server, settings):
+    """Without a batch endpoint, queries run in parallel with per-item errors."""
+    rag_server.app.state.batch_enabled = False
+    client = RagClient(base_url=rag_server.base_url)
+    try:
+        items = await client.query_many(BATCH_QUERIES)
+        _assert_batch_results(items)
+        assert rag_server.app.state.query_count == 3
+
+        stats = client.get_stats()["batching"]
+        assert stats["supported"] is False
+        assert stats["fallbacks"] == 1
+    finally:
+        await client.aclose()
+
+
+async def test_query_many_reports_malformed_responses_per_item(settings):
+    """Bad payloads and deadlines fail individual queries, not the whole batch."""
+    batch_bodies = iter([b"not json", b'{"results": "nope"}', b'{"results": [["x"], {"documents": 7}]}'])
+
+    def handler(request):
+        if request.url.path == "/api/query/batch":
+            return httpx.Response(200, content=next(batch_bodies))
+        if b"bad" in request.content:
+            return httpx.Response(200, content=b"<html>oops</html>")
+        if b"slow" in request.content:
+            raise DeadlineExceeded("Request deadline exceeded")
+        return httpx.Response(200, json={"documents": [{"id": "doc-1", "content": "ok"}]})
+
+    client = RagClient(base_url="http://rag.test", transport=httpx.MockTransport(handler))
+    queries = [RagQueryParams(query="first"), RagQueryParams(query="second")]
+    try:
+        for _ in range(2):
+            items = await client.query_many(queries)
+            assert all(not item.ok and "Invalid batch response" in item.error for item in items)
+        items = await client.query_many(queries)
+        assert [item.error for item in items] == [
+            "Invalid result in batch response", items[1].error
+        ]
+        assert items[1].error.startswith("Invalid result in batch response:")
+
+        client._batch_supported = False
+        items = await client.query_many([
+            RagQueryParams(query="good"), RagQueryParams(query="bad"), RagQueryParams(query="slow")
+        ])
+        assert items[0].ok and items[0].response.documents[0].id == "doc-1"
+        assert not items[1].ok and items[1].error
+        assert items[2].error == "Request deadline exceeded"
+    finally:
+        await client.aclose()
@@ -0,0 +1,123 @@
+"""
+Tests for the per-model agent registry.
+"""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import agents.registry as registry_module
+import routes.agents as agents_routes
+from agents.registry import AgentRegistry, parse_allowed_models
+from agents.supervisor import SupervisorAgent
+from main import app
+from tests.fake_llm import FakeChatModel
+
+
+def fake_factory(model_name: str, provider: str) -> SupervisorAgent:
+    return SupervisorAgent(model_name=model_name, provider=provider, llm=FakeChatModel())
+
+
+def make_registry(**kwargs) -> AgentRegistry:
+    kwargs.setdefault("allowed_models", {("fake", "large"), ("fake", "a"), ("fake", "b")})
+    return AgentRegistry(default_provider="fake", default_model="small", factory=fake_factory, **kwargs)
+
+
+def test_parse_allowed_models():
+    assert parse_allowed_models("openai:gpt-4o, anthropic:claude-x,bad,") == {
+        ("openai", "gpt-4o"), ("anthropic", "claude-x")
+    }
+    assert parse_allowed_models("") == set()
+
+
+def test_agents_are_built_once_per_model():
+    registry = make_registry()
+    default = registry.get()
+    assert registry.get("fake", "small") is default
+    large = registry.get("fake", "large")
+    assert large is not default
+    assert large.model_name == "large"
+    assert registry.get("fake", "large") is large
+    assert registry.created == 2
+
+
+def test_allow_list_rejects_unknown_models():
+    registry = make_registry(allowed_models={("fake", "large")})
+    registry.get("fake", "large")
+    registry.get()
+    with pytest.raises(ValueError):
+        registry.get("fake", "other")
+    # Without an allow-list only the default model can be selected
+    registry = make_registry(allowed_models=None)
+    registry.get("fake", "small")
+    with pytest.raises(ValueError):
+        registry.get("fake", "large")
+    assert registry.created == 1
+
+
+def test_least_recently_used_agent_is_evicted_but_default_kept():
+    registry = make_registry(max_agents=2)
+    default = registry.get()
+    first = registry.get("fake", "a")
+    registry.get("fake", "b")
+    assert registry.evictions == 1
+    assert registry.get() is default
+    assert registry.get("fake", "a") is not first
+
+
+def test_idle_agents_are_evicted(monkeypatch):
+    registry = make_registry(idle_ttl=10)
+    registry.get()
+    registry.get("fake", "a")
+
+    now = registry_module.time.monotonic()
+    monkeypatch.setattr(registry_module.time, "monotonic", lambda: now + 60)
+    registry.evict_idle()
+    stats = registry.get_stats()
+    assert stats["resident_count"] == 1
+    assert stats["evictions"] == 1
+
+
+async def test_idle_agents_are_swept_without_traffic():
+    registry = make_registry(idle_ttl=0.05)
+    registry.get()
+    registry.get("fake", "a")
+    await registry.start()
+    try:
+        await asyncio.sleep(0.3)
+        assert registry.get_stats()["resident_count"] == 1
+    finally:
+        await registry.aclose()
+
+
+async def test_latency_is_tracked_per_model_across_eviction():
+    registry = make_registry(max_agents=1)
+    await registry.get("fake", "a").chat("hi", session_id="registry-1")
+    registry.get("fake", "b")
+    await registry.get("fake", "a").chat("hi", session_id="registry-2")
+
+    models = {entry["model"]: entry for entry in registry.get_stats()["models"]}
+    assert models["a"]["latency"]["count"] == 2
+    assert models["b"]["latency"]["count"] == 0
+
+
+def test_chat_request_selects_model(monkeypatch):
+    registry = make_registry(allowed_models={("fake", "large")})
+    monkeypatch.setattr(agents_routes, "get_agent_registry", lambda: registry)
+    monkeypatch.setattr(agents_routes, "get_agent", lambda model_name=None, provider=None: registry.get(provider, model_name))
+
+    client = TestClient(app)
+    response = client.post("/api/agents/chat", json={"message": "hi", "session_id": "registry-3", "model": "large"})
+    assert response.status_code == 200
+    assert response.json()["metadata"]["model"] == "large"
+
+    response = client.post("/api/agents/chat", json={"message": "hi", "model": "huge"})
+    assert response.status_code == 400
+
+    # An allowed model whose provider cannot be built is still a client error
+    monkeypatch.setattr(agents_routes, "get_agent", lambda model_name=None, provider=None: AgentRegistry(
+        default_provider="fake", default_model="small", allowed_models={("unknown", "x")}
+    ).get(provider, model_name))
+    response = client.post("/api/agents/chat", json={"message": "hi", "provider": "unknown", "model": "x"})
+    assert response.status_code == 400
+    assert "Unsupported provider" in response.json()["detail"]
@@ -0,0 +1,116 @@
+"""
+Tests for token-budgeted packing of RAG tool output.
+"""
+import pytest
+
+from services import rag_client as rag_client_module
+from services import result_packer as result_packer_module
+from services.rag_client import RagClient
+from services.result_packer import PackItem, ResultPacker, parse_token_budgets, truncate_to_tokens
+from services.tokens import estimate_tokens
+from tools.rag_tools import SearchDocumentationTool, SearchIncidentLogsTool
+
+RUNBOOK = (
+    "Pods in CrashLoopBackOff usually indicate a failing liveness probe or an OOM kill. "
+    "Check the previous container logs with kubectl logs --previous, inspect the exit code "
+    "and compare the memory limit with the working set reported by the metrics server. "
+)
+
+
+def heading(count):
+    return f"Found {count} results:\n"
+
+
+def item(content, score, title="doc"):
+    return PackItem(title=title, content=content, score=score, after=["Tags: k8s"])
+
+
+def test_parse_token_budgets():
+    assert parse_token_budgets("search_documentation=800, retrieve_context=600,bad,x=y") == {
+        "search_documentation": 800, "retrieve_context": 600,
+    }
+
+
+def test_truncate_to_tokens_cuts_at_word_boundary():
+    text = truncate_to_tokens(RUNBOOK, 10)
+    assert text.endswith("...")
+    assert estimate_tokens(text) <= 10
+    assert RUNBOOK.startswith(text[:-3])
+    assert truncate_to_tokens("short", 10) == "short"
+
+
+def test_results_fit_the_budget_in_score_order():
+    packer = ResultPacker(default_budget=200)
+    items = [item(RUNBOOK * 2, 0.7, "low"), item(RUNBOOK * 2, 0.9, "high")]
+    items[0].content = "Disk pressure evictions happen when node filesystem usage crosses the threshold. " * 4
+
+    result = packer.pack("search_documentation", heading, items)
+    assert result.tokens_out <= 200
+    assert result.text.startswith("Found 2 results:")
+    assert result.text.index("1. high") < result.text.index("2. low")
+    assert result.truncated == 1
+    assert result.tokens_saved > 0
+
+
+def test_near_duplicates_are_dropped():
+    packer = ResultPacker(default_budget=2000)
+    overlapping = RUNBOOK + "Raise the limit if the working set is close to it."
+    result = packer.pack("search_documentation", heading, [
+        item(RUNBOOK, 0.9, "chunk-1"),
+        item(overlapping, 0.85, "chunk-2"),
+        item("Node disk pressure: clean up images with crictl rmi --prune.", 0.8, "disk"),
+    ])
+    assert result.duplicates == 1
+    assert result.kept == 2
+    assert "chunk-2" not in result.text
+    assert result.text.startswith("Found 2 results:")
+
+
+def test_results_that_do_not_fit_are_omitted_and_counted():
+    packer = ResultPacker(default_budget=120, min_content_tokens=40)
+    result = packer.pack("search_documentation", heading, [
+        item(RUNBOOK, 0.9, "first"),
+        item("Completely different text about certificates expiring on ingress controllers. " * 3, 0.8, "second"),
+    ])
+    assert result.kept == 1
+    assert result.omitted == 1
+    assert "1 lower-ranked results omitted" in result.text
+
+    stats = packer.get_stats()["search_documentation"]
+    assert stats["calls"] == 1
+    assert stats["omitted"] == 1
+    assert stats["tokens_saved"] == result.tokens_saved
+
+
+@pytest.fixture
+def rag_documents(rag_server, monkeypatch):
+    monkeypatch.setattr(rag_client_module, "_rag_client", RagClient(base_url=rag_server.base_url))
+    monkeypatch.setattr(result_packer_module, "_result_packer", ResultPacker(
+        default_budget=400, budgets={"search_incident_logs": 150}
+    ))
+    rag_server.app.state.documents = [
+        {"id": f"doc-{i}", "content": RUNBOOK * 3 + f"Variant {i}.", "score": 0.9 - i / 100,
+         "metadata": {"category": "documentation", "tags": ["kubernetes"]}, "source": f"runbooks/crash-{i}.md"}
+        for i in range(4)
+    ] + [
+        {"id": f"inc-{i}", "content": f"Incident {i}: " + RUNBOOK * 2, "score": 0.8,
+         "metadata": {"category": "incident", "severity": "high", "resolved": True}, "source": f"INC-{i}"}
+        for i in range(3)
+    ]
+
+
+async def test_rag_tools_pack_into_their_budgets(rag_documents, settings):
+    docs = await SearchDocumentationTool().ainvoke({"query": "crashloop", "top_k": 4, "threshold": 0.5})
+    assert docs.startswith("Found 1 relevant documentation articles:")
+    assert "runbooks/crash-0.md" in docs
+    assert estimate_tokens(docs) <= 400
+
+    incidents = await SearchIncidentLogsTool().ainvoke({"query": "crashloop"})
+    assert incidents.startswith("Found 1 similar past incidents:")
+    assert "Severity: high | Resolved: Yes" in incidents
+    assert estimate_tokens(incidents) <= 150
+
+    stats = result_packer_module.get_result_packer().get_stats()
+    assert stats["search_documentation"]["duplicates_dropped"] == 3
+    assert stats["search_incident_logs"]["tokens_saved"] > 0
+    assert stats["search_incident_logs"]["budget"] == 150
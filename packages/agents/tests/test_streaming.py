@@ -0,0 +1,159 @@
+"""
+Tests for SSE streaming helpers.
+"""
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage, ToolMessage
+
+from agents.supervisor import SupervisorAgent
+from main import app
+from routes import agents as agents_routes
+from services import rag_client as rag_client_module
+from services.rag_client import RagClient
+from services.streaming import StreamOptions, coalesce_events, encode_event, get_stream_stats, stream_sse
+from tests.fake_llm import FakeChatModel
+
+
+async def token_stream(tokens, delay=0.0, pause_after=None, pause=0.0):
+    for index, token in enumerate(tokens):
+        if delay:
+            await asyncio.sleep(delay)
+        yield {"type": "content", "data": token}
+        if index == pause_after:
+            yield {"type": "tool_start", "data": {"tool": "query_logs"}}
+            await asyncio.sleep(pause)
+            yield {"type": "tool_end", "data": {"tool": "query_logs"}}
+
+
+async def collect(events, **options):
+    return [event async for event in coalesce_events(events, StreamOptions(**options))]
+
+
+async def test_tokens_are_coalesced_after_first_chunk():
+    """The first token is sent alone; later tokens are merged into few frames."""
+    tokens = [f"t{i} " for i in range(200)]
+    frames = await collect(token_stream(tokens), flush_interval_ms=50, max_buffer_chars=10_000, heartbeat_interval_ms=0)
+
+    assert frames[0] == {"type": "content", "data": "t0 "}
+    assert len(frames) <= 3
+    assert "".join(frame["data"] for frame in frames) == "".join(tokens)
+
+
+async def test_buffer_size_and_interval_force_flushes():
+    """Frames are flushed by size, and by time while tokens trickle in."""
+    tokens = ["x" * 10] * 20
+    frames = await collect(token_stream(tokens), flush_interval_ms=1000, max_buffer_chars=50, heartbeat_interval_ms=0)
+    assert [len(frame["data"]) for frame in frames] == [10, 50, 50, 50, 40]
+
+    frames = await collect(token_stream(["a"] * 10, delay=0.02), flush_interval_ms=30, heartbeat_interval_ms=0)
+    assert 3 <= len(frames) < 10
+
+
+async def test_non_content_events_flush_and_heartbeats_fill_idle_gaps():
+    """Tool events flush buffered text in order, and idle periods emit heartbeats."""
+    events = token_stream(["a", "b", "c"], pause_after=1, pause=0.12)
+    frames = await collect(events, flush_interval_ms=1000, heartbeat_interval_ms=50)
+
+    types = [frame["type"] for frame in frames]
+    assert types[:3] == ["content", "content", "tool_start"]
+    assert frames[1]["data"] == "b"
+    assert types.count("heartbeat") >= 1
+    assert types[-2:] == ["tool_end", "content"]
+
+
+async def test_zero_flush_interval_disables_coalescing():
+    """Per-request options can turn coalescing off."""
+    frames = await collect(token_stream(["a", "b", "c"]), flush_interval_ms=0, heartbeat_interval_ms=0)
+    assert [frame["data"] for frame in frames] == ["a", "b", "c"]
+
+
+def test_encode_event():
+    """Events become SSE data frames; heartbeats become comments."""
+    frame = encode_event({"type": "content", "data": "héllo"})
+    assert frame.startswith(b"data: ") and frame.endswith(b"\n\n")
+    assert json.loads(frame[6:]) == {"type": "content", "data": "héllo"}
+    assert encode_event({"type": "heartbeat"}) == b": keep-alive\n\n"
+
+
+def test_chat_stream_endpoint(monkeypatch):
+    """The stream endpoint emits data frames followed by [DONE]."""
+    agent = SupervisorAgent(model_name="fake", provider="fake", llm=FakeChatModel())
+    monkeypatch.setattr(agents_routes, "get_agent", lambda *args, **kwargs: agent)
+
+    with TestClient(app) as client:
+        response = client.post("/api/agents/chat/stream", json={
+            "message": "hello",
+            "session_id": "stream-1",
+            "stream_options": {"flush_interval_ms": 10},
+        })
+
+    assert response.status_code == 200
+    frames = [line[6:] for line in response.text.split("\n") if line.startswith("data: ")]
+    assert frames[-1] == "[DONE]"
+    content = "".join(json.loads(frame)["data"] for frame in frames[:-1] if json.loads(frame)["type"] == "content")
+    assert content == "Echo: hello"
+
+
+async def test_disconnect_cancels_agent_run():
+    """A client disconnect cancels the producer and is counted as abandoned work."""
+    stats = get_stream_stats()
+    cancelled_before = stats.cancelled
+    producer_cancelled = asyncio.Event()
+    disconnected = False
+
+    async def events():
+        yield {"type": "content", "data": "Looking into it"}
+        yield {"type": "tool_start", "data": {"tool": "query_logs"}}
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            producer_cancelled.set()
+            raise
+
+    async def is_disconnected():
+        return disconnected
+
+    frames = []
+    async for frame in stream_sse(events(), is_disconnected, StreamOptions(heartbeat_interval_ms=0), poll_interval=0.01):
+        frames.append(frame)
+        if len(frames) == 2:
+            disconnected = True
+
+    assert producer_cancelled.is_set()
+    assert b"[DONE]" not in b"".join(frames)
+    assert stats.cancelled == cancelled_before + 1
+    assert stats.abandoned_tool_calls >= 1
+
+
+async def test_disconnect_cancels_pending_rag_request(rag_server, settings, monkeypatch):
+    """Disconnecting mid tool call cancels the graph, the tool and its RAG request."""
+    rag_server.app.state.delay = 1
+    client = RagClient(base_url=rag_server.base_url)
+    monkeypatch.setattr(rag_client_module, "_rag_client", client)
+
+    def responder(messages):
+        if isinstance(messages[-1], ToolMessage):
+            return AIMessage(content="done")
+        return AIMessage(content="", tool_calls=[
+            {"name": "search_incident_logs", "args": {"query": "pod restarting"}, "id": "call-1"}
+        ])
+
+    agent = SupervisorAgent(model_name="fake", provider="fake", llm=FakeChatModel(responder=responder))
+    disconnected = False
+
+    async def is_disconnected():
+        return disconnected
+
+    events = agent.stream_chat("why is the pod restarting?", session_id="disconnect-1")
+    async for frame in stream_sse(events, is_disconnected, poll_interval=0.01):
+        if b"tool_start" in frame:
+            await asyncio.sleep(0.1)
+            disconnected = True
+
+    try:
+        assert client.get_pool_stats()["requests_in_flight"] == 0
+        assert client.get_stats()["coalescing"]["in_flight"] == 0
+    finally:
+        await client.aclose()
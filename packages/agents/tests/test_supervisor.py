@@ -0,0 +1,64 @@
+"""
+Tests for the LangGraph supervisor agent.
+"""
+import asyncio
+
+from langchain_core.messages import SystemMessage
+
+from agents.supervisor import SupervisorAgent
+from tests.fake_llm import FakeChatModel
+
+
+def make_agent(**kwargs) -> SupervisorAgent:
+    return SupervisorAgent(model_name="fake", provider="fake", llm=FakeChatModel(**kwargs))
+
+
+async def test_chat_returns_model_response():
+    """A plain answer ends the graph after one model step."""
+    agent = make_agent()
+    result = await agent.chat("why is the pod restarting?", session_id="s1")
+    assert result["response"] == "Echo: why is the pod restarting?"
+    assert result["metadata"]["model"] == "fake"
+    assert result["metadata"]["tools_used"] == []
+
+
+async def test_model_step_uses_prebuilt_system_message():
+    """The system message is built once and sent first on every step."""
+    seen = []
+
+    def responder(messages):
+        seen.append(messages[0])
+        return FakeChatModel().responder(messages)
+
+    agent = make_agent(responder=responder)
+    await agent.chat("first", session_id="s1")
+    await agent.chat("second", session_id="s1")
+    assert len(seen) == 2
+    assert all(message is agent.system_message for message in seen)
+    assert isinstance(agent.system_message, SystemMessage)
+
+
+class BarrierChatModel(FakeChatModel):
+    """Answers only once ``sessions`` calls are waiting at the same time"""
+
+    sessions: int = 1
+    waiting: int = 0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.waiting += 1
+        while self.waiting < self.sessions:
+            await asyncio.sleep(0.001)
+        return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+async def test_concurrent_sessions_overlap_model_calls():
+    """Model calls of concurrent sessions are in flight together instead of serializing."""
+    llm = BarrierChatModel(sessions=50)
+    agent = SupervisorAgent(model_name="fake", provider="fake", llm=llm)
+
+    # A serialized agent would never get all 50 calls waiting at once
+    results = await asyncio.wait_for(asyncio.gather(*[
+        agent.chat("status?", session_id=f"overlap-{i}") for i in range(50)
+    ]), timeout=10)
+    assert llm.calls == 50
+    assert all(result["response"] == "Echo: status?" for result in results)
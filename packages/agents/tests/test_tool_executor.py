@@ -0,0 +1,130 @@
+"""
+Tests for per-tool timeouts and concurrency limits.
+"""
+import asyncio
+import json
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from langgraph.graph import END, MessagesState, StateGraph
+from langgraph.prebuilt import ToolNode
+
+from agents.tool_executor import ToolExecutor, parse_tool_limits
+from services.deadline import Deadline
+
+running = {"slow_tool": 0, "peak": 0}
+
+
+@tool
+async def fast_tool(query: str) -> str:
+    """Return immediately."""
+    return f"fast: {query}"
+
+
+@tool
+async def slow_tool(query: str) -> str:
+    """Take a while."""
+    running["slow_tool"] += 1
+    running["peak"] = max(running["peak"], running["slow_tool"])
+    try:
+        await asyncio.sleep(0.1)
+    finally:
+        running["slow_tool"] -= 1
+    return f"slow: {query}"
+
+
+@tool
+async def hanging_tool(query: str) -> str:
+    """Never finishes in time."""
+    await asyncio.sleep(10)
+    return "too late"
+
+
+def calls(*names):
+    return {"messages": [AIMessage(content="", tool_calls=[
+        {"name": name, "args": {"query": str(index)}, "id": f"call-{index}"} for index, name in enumerate(names)
+    ])]}
+
+
+def tool_graph(tools, executor):
+    """Run a ToolNode on its own; it needs a graph runtime"""
+    workflow = StateGraph(MessagesState)
+    workflow.add_node("tools", ToolNode(tools, awrap_tool_call=executor))
+    workflow.set_entry_point("tools")
+    workflow.add_edge("tools", END)
+    return workflow.compile()
+
+
+async def run_tools(graph, state):
+    result = await graph.ainvoke(state)
+    return result["messages"][1:]
+
+
+def test_parse_tool_limits():
+    assert parse_tool_limits("query_logs=20, check_metrics=2.5,bad,x=y") == {"query_logs": 20.0, "check_metrics": 2.5}
+
+
+async def test_tool_calls_run_concurrently_within_limits():
+    executor = ToolExecutor(default_timeout=5, default_concurrency=8, concurrency={"slow_tool": 2})
+    graph = tool_graph([fast_tool, slow_tool], executor)
+    running["peak"] = 0
+
+    started = time.perf_counter()
+    messages = await run_tools(graph, calls("slow_tool", "slow_tool", "slow_tool", "slow_tool", "fast_tool"))
+    elapsed = time.perf_counter() - started
+
+    contents = [message.content for message in messages]
+    assert contents == ["slow: 0", "slow: 1", "slow: 2", "slow: 3", "fast: 4"]
+    assert running["peak"] == 2
+    # Four 0.1s calls, two at a time
+    assert 0.2 <= elapsed < 0.39
+
+    stats = executor.get_stats()
+    assert stats["slow_tool"]["calls"] == 4
+    assert stats["slow_tool"]["max_concurrency"] == 2
+    assert stats["fast_tool"]["latency"]["max_ms"] < 50
+
+
+async def test_timeout_returns_structured_result_without_blocking_others():
+    executor = ToolExecutor(default_timeout=5, timeouts={"hanging_tool": 0.1})
+    graph = tool_graph([fast_tool, hanging_tool], executor)
+
+    started = time.perf_counter()
+    messages = await run_tools(graph, calls("hanging_tool", "fast_tool"))
+    assert time.perf_counter() - started < 1
+
+    timed_out, fast = messages
+    assert timed_out.status == "error"
+    assert timed_out.tool_call_id == "call-0"
+    payload = json.loads(timed_out.content)
+    assert payload["status"] == "timeout"
+    assert payload["tool"] == "hanging_tool"
+    assert fast.content == "fast: 1"
+    assert executor.get_stats()["hanging_tool"]["timeouts"] == 1
+
+
+async def test_calls_timing_out_in_the_queue_leave_it():
+    executor = ToolExecutor(default_timeout=5, timeouts={"hanging_tool": 0.1}, concurrency={"hanging_tool": 1})
+    graph = tool_graph([hanging_tool], executor)
+
+    # The second call never gets the semaphore before both time out
+    messages = await run_tools(graph, calls("hanging_tool", "hanging_tool"))
+    assert [json.loads(message.content)["status"] for message in messages] == ["timeout", "timeout"]
+    stats = executor.get_stats()["hanging_tool"]
+    assert stats["queued"] == 0
+    assert stats["in_flight"] == 0
+    assert stats["timeouts"] == 2
+
+
+async def test_request_deadline_is_not_reported_as_a_tool_timeout():
+    executor = ToolExecutor(default_timeout=5)
+    graph = tool_graph([hanging_tool], executor)
+
+    result = await graph.ainvoke(calls("hanging_tool"), config={"configurable": {"deadline": Deadline(0.1)}})
+    payload = json.loads(result["messages"][1].content)
+    assert payload["status"] == "deadline_exceeded"
+    assert "request deadline" in payload["message"]
+    stats = executor.get_stats()["hanging_tool"]
+    assert stats["deadline_exceeded"] == 1
+    assert stats["timeouts"] == 0
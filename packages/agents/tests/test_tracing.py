@@ -0,0 +1,173 @@
+"""
+Tests for request tracing and span waterfalls.
+"""
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage, ToolMessage
+
+from agents.supervisor import SupervisorAgent
+from main import app
+from routes import agents as agents_routes
+from services import rag_client as rag_client_module
+from services import tracing as tracing_module
+from services.rag_client import RagClient
+from services.tracing import (
+    JsonLinesExporter, SpanExporter, Tracer, build_waterfall, load_exporter, parse_traceparent
+)
+from tests.fake_llm import FakeChatModel
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+class RecordingExporter(SpanExporter):
+    def __init__(self):
+        self.batches = []
+
+    def export(self, spans):
+        self.batches.append([span.name for span in spans])
+
+
+def search_then_answer(messages):
+    """Search the docs once, then answer"""
+    if isinstance(messages[-1], ToolMessage):
+        return AIMessage(content="Found it")
+    return AIMessage(content="", tool_calls=[
+        {"name": "search_documentation", "args": {"query": "kubernetes"}, "id": "call-1"}
+    ])
+
+
+@pytest.fixture
+def tracer(monkeypatch):
+    """Fresh global tracer per test"""
+    tracer = Tracer(exporters=[RecordingExporter()])
+    monkeypatch.setattr(tracing_module, "_tracer", tracer)
+    return tracer
+
+
+def test_parse_traceparent():
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID)
+    assert parse_traceparent(f" 00-{TRACE_ID.upper()}-{PARENT_ID}-00 ") == (TRACE_ID, PARENT_ID)
+    assert parse_traceparent(None) is None
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent(f"00-{'0' * 32}-{PARENT_ID}-01") is None
+    assert parse_traceparent(f"ff-{TRACE_ID}-{PARENT_ID}-01") is None
+
+
+async def test_spans_nest_across_tasks_and_export_with_the_root(tracer):
+    async def child(name):
+        with tracer.span(name):
+            await asyncio.sleep(0.01)
+
+    with tracer.span("root") as root:
+        await asyncio.gather(child("a"), child("b"))
+
+    spans = {span["name"]: span for span in tracer.get_trace(root.trace_id)}
+    assert spans["a"]["parent_id"] == spans["b"]["parent_id"] == root.span_id
+    assert spans["root"]["parent_id"] is None
+    # The whole trace is exported in one batch when the root ends
+    assert tracer.exporters[0].batches == [["a", "b", "root"]]
+
+
+def test_errors_are_recorded_and_remote_parent_is_continued(tracer):
+    with pytest.raises(ValueError):
+        with tracer.span("failing", parent=parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01")):
+            raise ValueError("boom")
+
+    [span] = tracer.get_trace(TRACE_ID)
+    assert span["parent_id"] == PARENT_ID
+    assert span["status"] == "error"
+    assert span["error"] == "ValueError: boom"
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer(enabled=False)
+    with tracer.span("ignored") as span:
+        assert span is None
+
+
+def test_jsonl_exporter_serves_evicted_traces(tmp_path):
+    exporter = JsonLinesExporter(str(tmp_path / "traces.jsonl"))
+    tracer = Tracer(exporters=[exporter], max_traces=1)
+    with tracer.span("first", {"step": 1}) as first:
+        with tracer.span("inner"):
+            pass
+    with tracer.span("second"):
+        pass
+    tracer.shutdown()
+
+    # Evicted from memory, read back from the file
+    spans = tracer.get_trace(first.trace_id)
+    assert sorted(span["name"] for span in spans) == ["first", "inner"]
+    waterfall = build_waterfall(first.trace_id, spans)
+    assert [(row["name"], row["depth"]) for row in waterfall["spans"]] == [("first", 0), ("inner", 1)]
+    assert waterfall["spans"][0]["attributes"] == {"step": 1}
+    assert tracer.get_trace("0" * 32) == []
+
+
+def test_jsonl_exporter_writes_off_the_caller_thread_and_rotates(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = JsonLinesExporter(str(path), max_bytes=600)
+    writers = []
+    write = exporter._write
+    exporter._write = lambda spans: (writers.append(threading.current_thread().name), write(spans))
+    tracer = Tracer(exporters=[exporter], max_traces=1)
+    trace_ids = []
+    for index in range(6):
+        with tracer.span(f"request {index}", {"padding": "x" * 100}) as span:
+            trace_ids.append(span.trace_id)
+    tracer.shutdown()
+
+    assert writers and all(name.startswith("span-export") for name in writers)
+    # Rotated once the file passed max_bytes; the oldest traces were dropped with the previous file
+    assert (tmp_path / "traces.jsonl.1").exists()
+    assert (tmp_path / "traces.jsonl.1").stat().st_size < 1200
+    assert [span["name"] for span in tracer.get_trace(trace_ids[-1])] == ["request 5"]
+    assert tracer.get_trace(trace_ids[0]) == []
+
+
+def test_load_exporter(tmp_path, settings, monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_JSONL_PATH", str(tmp_path / "spans.jsonl"))
+    assert isinstance(load_exporter("jsonl"), JsonLinesExporter)
+    assert isinstance(load_exporter("tests.test_tracing:RecordingExporter"), RecordingExporter)
+    with pytest.raises(ValueError):
+        load_exporter("zipkin")
+    with pytest.raises(ValueError):
+        load_exporter("tests.test_tracing:Missing")
+
+
+def test_chat_request_waterfall(tracer, rag_server, settings, monkeypatch):
+    client = RagClient(base_url=rag_server.base_url)
+    monkeypatch.setattr(rag_client_module, "_rag_client", client)
+    agent = SupervisorAgent(model_name="fake", provider="fake", llm=FakeChatModel(responder=search_then_answer))
+    monkeypatch.setattr(agents_routes, "get_agent", lambda *args, **kwargs: agent)
+
+    with TestClient(app) as http:
+        response = http.post(
+            "/api/agents/chat",
+            json={"message": "How do I scale pods?", "session_id": "tracing-1"},
+            headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"}
+        )
+        assert response.status_code == 200
+        assert response.headers["x-trace-id"] == TRACE_ID
+        waterfall = http.get(f"/api/agents/traces/{TRACE_ID}").json()
+        assert http.get(f"/api/agents/traces/{'1' * 32}").status_code == 404
+
+    rows = {row["name"]: row for row in waterfall["spans"]}
+    root = rows["POST /api/agents/chat"]
+    assert root["parent_id"] == PARENT_ID
+    assert root["attributes"]["http.status_code"] == 200
+    assert waterfall["spans"][0]["name"] == "POST /api/agents/chat"
+    assert rows["node agent"]["parent_id"] == root["span_id"]
+    assert rows["node compact"]["depth"] == 1
+    # Tool calls nest under the request, RAG requests under the tool call
+    assert rows["tool search_documentation"]["parent_id"] == root["span_id"]
+    assert rows["tool search_documentation"]["attributes"]["tool.status"] == "ok"
+    rag = rows["rag POST /api/query"]
+    assert rag["parent_id"] == rows["tool search_documentation"]["span_id"]
+    assert rag["depth"] == 2
+    assert rag_server.app.state.last_traceparent == f"00-{TRACE_ID}-{rag['span_id']}-01"
+    assert waterfall["duration_ms"] >= root["duration_ms"]
@@ -8,6 +8,7 @@ from typing import Optional, Dict, Any
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 from services.rag_client import get_rag_client, RagQueryParams
+from services.result_packer import PackItem, get_result_packer
 
 
 class SearchDocumentationInput(BaseModel):
@@ -83,18 +84,20 @@ class SearchDocumentationTool(BaseTool):
             if not documents:
                 return f"No relevant documentation found for query: {query}"
             
-            # Format results
-            results = [f"Found {len(documents)} relevant documentation articles:\n"]
+            # Pack the best results into the tool's token budget
+            items = []
+            for doc in documents:
+                tags = doc.metadata.get("tags", []) if doc.metadata else []
+                items.append(PackItem(
+                    title=f"{doc.source or 'Unknown source'} (relevance: {doc.score:.2f})",
+                    content=doc.content,
+                    score=doc.score,
+                    after=[f"Tags: {', '.join(tags)}"] if tags else []
+                ))
             
-            for i, doc in enumerate(documents, 1):
-                results.append(f"\n{i}. {doc.source or 'Unknown source'} (relevance: {doc.score:.2f})")
-                results.append(f"   {doc.content[:500]}...")  # Truncate long content
-                if doc.metadata:
-                    tags = doc.metadata.get("tags", [])
-                    if tags:
-                        results.append(f"   Tags: {', '.join(tags)}")
-            
-            return "\n".join(results)
+            return get_result_packer().pack(
+                self.name, lambda count: f"Found {count} relevant documentation articles:\n", items
+            ).text
             
         except Exception as e:
             return f"Error searching documentation: {str(e)}"
@@ -177,27 +180,33 @@ class RetrieveContextTool(BaseTool):
             if not documents:
                 return f"No relevant context found for: {query}"
             
-            # Format results by category
-            results = [f"Retrieved {len(documents)} relevant context items:\n"]
-            
-            for i, doc in enumerate(documents, 1):
+            # Pack the best results, labelled by category, into the tool's token budget
+            items = []
+            for doc in documents:
                 category = doc.metadata.get("category", "unknown")
                 source = doc.source or "Unknown source"
                 
-                results.append(f"\n{i}. [{category.upper()}] {source}")
-                results.append(f"   Relevance: {doc.score:.2f}")
-                results.append(f"   {doc.content[:400]}...")  # Truncate content
-                
                 # Add metadata if available
+                details = []
                 if doc.metadata:
                     if "severity" in doc.metadata:
-                        results.append(f"   Severity: {doc.metadata['severity']}")
+                        details.append(f"Severity: {doc.metadata['severity']}")
                     if "resolved" in doc.metadata:
-                        results.append(f"   Resolved: {doc.metadata['resolved']}")
+                        details.append(f"Resolved: {doc.metadata['resolved']}")
                     if "tags" in doc.metadata:
-                        results.append(f"   Tags: {', '.join(doc.metadata['tags'][:3])}")
+                        details.append(f"Tags: {', '.join(doc.metadata['tags'][:3])}")
+                
+                items.append(PackItem(
+                    title=f"[{category.upper()}] {source}",
+                    content=doc.content,
+                    score=doc.score,
+                    before=[f"Relevance: {doc.score:.2f}"],
+                    after=details
+                ))
             
-            return "\n".join(results)
+            return get_result_packer().pack(
+                self.name, lambda count: f"Retrieved {count} relevant context items:\n", items
+            ).text
             
         except Exception as e:
             return f"Error retrieving context: {str(e)}"
@@ -271,23 +280,26 @@ class SearchIncidentLogsTool(BaseTool):
             if not documents:
                 return f"No similar past incidents found for: {query}"
             
-            # Format results
-            results = [f"Found {len(documents)} similar past incidents:\n"]
-            
-            for i, doc in enumerate(documents, 1):
-                source = doc.source or "Unknown incident"
+            # Pack the best results into the tool's token budget
+            items = []
+            for doc in documents:
                 severity = doc.metadata.get("severity", "unknown")
                 resolved = doc.metadata.get("resolved", False)
-                
-                results.append(f"\n{i}. {source}")
-                results.append(f"   Severity: {severity} | Resolved: {'Yes' if resolved else 'No'}")
-                results.append(f"   Similarity: {doc.score:.2f}")
-                results.append(f"   {doc.content}")
-                
-                if doc.metadata.get("tags"):
-                    results.append(f"   Related: {', '.join(doc.metadata['tags'][:5])}")
+                tags = doc.metadata.get("tags")
+                items.append(PackItem(
+                    title=doc.source or "Unknown incident",
+                    content=doc.content,
+                    score=doc.score,
+                    before=[
+                        f"Severity: {severity} | Resolved: {'Yes' if resolved else 'No'}",
+                        f"Similarity: {doc.score:.2f}"
+                    ],
+                    after=[f"Related: {', '.join(tags[:5])}"] if tags else []
+                ))
             
-            return "\n".join(results)
+            return get_result_packer().pack(
+                self.name, lambda count: f"Found {count} similar past incidents:\n", items
+            ).text
             
         except Exception as e:
             return f"Error searching incident logs: {str(e)}"
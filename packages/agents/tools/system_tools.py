@@ -4,11 +4,18 @@ System Tools for LangChain Agents
 This module provides tools for agents to interact with system metrics and logs.
 """
 
-from typing import Optional, Dict, Any, List
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Awaitable, Callable
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
-import httpx
 from config import get_settings
+from services.deadline import DeadlineExceeded, cap_timeout
+from services.log_backend import LogEntry, get_log_backend
+from services.log_templates import TemplateMiner, format_templates
+from services.metrics_backend import format_summary, get_metrics_backend
+from services.rag_client import get_rag_client
 import logging
 
 logger = logging.getLogger(__name__)
@@ -74,41 +81,14 @@ class CheckMetricsTool(BaseTool):
             Formatted metrics as a string
         """
         try:
-            # This would call the Node.js backend to get metrics
-            # For now, return mock data
-            settings = get_settings()
-            
-            # In production, this would call the backend API
-            # backend_url = os.getenv("BACKEND_URL", "http://localhost:3000")
-            # async with httpx.AsyncClient() as client:
-            #     response = await client.get(
-            #         f"{backend_url}/api/metrics",
-            #         params={
-            #             "resource_type": resource_type,
-            #             "resource_id": resource_id,
-            #             "metric_type": metric_type,
-            #             "time_range": time_range
-            #         }
-            #     )
-            #     response.raise_for_status()
-            #     data = response.json()
+            metrics = [metric.strip() for metric in metric_type.split(",") if metric.strip()]
+            summaries = await get_metrics_backend().summarize(resource_type, resource_id, metrics, time_range)
             
-            # Mock response for now
-            metrics = metric_type.split(",")
             result = [f"Metrics for {resource_type}/{resource_id} (last {time_range}):\n"]
-            
-            for metric in metrics:
-                metric = metric.strip()
-                if metric == "cpu":
-                    result.append(f"  CPU Usage: 45% (avg), 78% (max)")
-                elif metric == "memory":
-                    result.append(f"  Memory Usage: 62% (avg), 85% (max)")
-                elif metric == "disk":
-                    result.append(f"  Disk Usage: 71% (avg), 73% (max)")
-                elif metric == "network":
-                    result.append(f"  Network I/O: 125 MB/s in, 89 MB/s out")
-            
-            result.append(f"\nNote: Metrics are averaged over {time_range}")
+            if not summaries:
+                result.append(f"No metric data found for {', '.join(metrics)}")
+            for summary in summaries:
+                result.append(format_summary(summary))
             
             return "\n".join(result)
             
@@ -124,6 +104,7 @@ class QueryLogsInput(BaseModel):
     query: str = Field(description="Search query or filter (e.g., 'error', 'exception', 'timeout')")
     time_range: str = Field(default="1h", description="Time range (e.g., 1h, 6h, 24h)")
     max_lines: int = Field(default=50, description="Maximum number of log lines to return")
+    cursor: Optional[str] = Field(default=None, description="Cursor from a previous query_logs result, to get the next page")
 
 
 class QueryLogsTool(BaseTool):
@@ -149,13 +130,14 @@ class QueryLogsTool(BaseTool):
         query: str,
         time_range: str = "1h",
         max_lines: int = 50,
+        cursor: Optional[str] = None,
         run_manager: Optional[Any] = None
     ) -> str:
         """
         Execute the log query synchronously (not recommended for async agents)
         """
         import asyncio
-        return asyncio.run(self._arun(resource_type, resource_id, query, time_range, max_lines, run_manager))
+        return asyncio.run(self._arun(resource_type, resource_id, query, time_range, max_lines, cursor, run_manager))
     
     async def _arun(
         self,
@@ -164,6 +146,7 @@ class QueryLogsTool(BaseTool):
         query: str,
         time_range: str = "1h",
         max_lines: int = 50,
+        cursor: Optional[str] = None,
         run_manager: Optional[Any] = None
     ) -> str:
         """
@@ -175,53 +158,52 @@ class QueryLogsTool(BaseTool):
             query: Search query
             time_range: Time range for logs
             max_lines: Maximum lines to return
+            cursor: Cursor from a previous page
             run_manager: Optional callback manager
             
         Returns:
             Formatted log entries as a string
         """
         try:
-            # This would call the Node.js backend to get logs
-            # For now, return mock data
             settings = get_settings()
+            miner: Optional[TemplateMiner] = None
+            scan_lines = max_lines
+            sample: List[LogEntry] = []
+            collect = None
+            if settings.LOG_TEMPLATES_ENABLED and settings.LOG_TEMPLATE_SCAN_LINES > max_lines:
+                # Read a larger window into the template miner; keep the first
+                # max_lines entries verbatim in case the result is small anyway
+                miner = TemplateMiner(similarity_threshold=settings.LOG_TEMPLATE_SIMILARITY)
+                scan_lines = settings.LOG_TEMPLATE_SCAN_LINES
+                
+                def collect(entry: LogEntry) -> None:
+                    miner.add_entry(entry)
+                    if len(sample) < max_lines:
+                        sample.append(entry)
             
-            # In production, this would call the backend API
-            # backend_url = os.getenv("BACKEND_URL", "http://localhost:3000")
-            # async with httpx.AsyncClient() as client:
-            #     response = await client.get(
-            #         f"{backend_url}/api/logs",
-            #         params={
-            #             "resource_type": resource_type,
-            #             "resource_id": resource_id,
-            #             "query": query,
-            #             "time_range": time_range,
-            #             "max_lines": max_lines
-            #         }
-            #     )
-            #     response.raise_for_status()
-            #     data = response.json()
+            logs = await get_log_backend().query_logs(
+                resource_type, resource_id, query, time_range, scan_lines, cursor, on_entry=collect
+            )
+            entries = sample if miner is not None else logs.entries
             
-            # Mock response for now
-            result = [f"Logs for {resource_type}/{resource_id} matching '{query}' (last {time_range}):\n"]
+            window = "next page" if cursor else f"last {time_range}"
+            result = [f"Logs for {resource_type}/{resource_id} matching '{query}' ({window}):\n"]
             
-            # Simulate some log entries
-            mock_logs = [
-                "2024-12-02 07:10:15 [ERROR] Connection timeout to database server",
-                "2024-12-02 07:08:42 [WARN] High memory usage detected: 85%",
-                "2024-12-02 07:05:33 [ERROR] Failed to process message: NullPointerException",
-                "2024-12-02 07:02:11 [INFO] Retrying failed operation (attempt 3/5)",
-                "2024-12-02 07:00:05 [ERROR] API request failed with status 503"
-            ]
-            
-            # Filter logs based on query
-            filtered_logs = [log for log in mock_logs if query.lower() in log.lower()]
-            
-            if not filtered_logs:
-                result.append(f"No logs found matching '{query}'")
+            if not logs.matched_lines:
+                result.append(f"No logs found matching '{query}' (scanned {logs.scanned_lines} lines)")
+            elif miner is not None and logs.matched_lines > max_lines:
+                result.append(
+                    f"Found {logs.matched_lines} matching entries (scanned {logs.scanned_lines} lines), "
+                    f"grouped into {len(miner.templates)} patterns (<*> marks variable parts):\n"
+                )
+                result.append(format_templates(miner, settings.LOG_TEMPLATE_MAX_TEMPLATES))
             else:
-                result.append(f"Found {len(filtered_logs)} matching entries:\n")
-                for i, log in enumerate(filtered_logs[:max_lines], 1):
-                    result.append(f"{i}. {log}")
+                result.append(f"Found {len(entries)} matching entries (scanned {logs.scanned_lines} lines):\n")
+                for i, entry in enumerate(entries, 1):
+                    result.append(f"{i}. {entry.render()}")
+            
+            if logs.next_cursor:
+                result.append(f"\nMore entries may match. To continue, call query_logs again with cursor=\"{logs.next_cursor}\"")
             
             return "\n".join(result)
             
@@ -273,6 +255,10 @@ class AnalyzeHealthTool(BaseTool):
         """
         Execute the health analysis asynchronously
         
+        Metrics, recent error logs and similar past incidents are fetched
+        concurrently, each with its own timeout. Sources that fail or time
+        out are reported as unavailable and the rest of the report is kept.
+        
         Args:
             resource_type: Type of resource
             resource_id: Resource identifier
@@ -282,25 +268,48 @@ class AnalyzeHealthTool(BaseTool):
             Formatted health analysis as a string
         """
         try:
-            # This would call the Node.js backend to get health info
-            # For now, return mock data
+            settings = get_settings()
+            sections = await asyncio.gather(
+                _run_section("metrics", "Metrics (last 1h)", settings.HEALTH_METRICS_TIMEOUT,
+                             lambda: _metrics_section(resource_type, resource_id)),
+                _run_section("logs", "Recent Errors (last 1h)", settings.HEALTH_LOGS_TIMEOUT,
+                             lambda: _logs_section(resource_type, resource_id)),
+                _run_section("incidents", "Similar Past Incidents", settings.HEALTH_INCIDENTS_TIMEOUT,
+                             lambda: _incidents_section(resource_type, resource_id)),
+            )
+            
+            available = [section for section in sections if section.error is None]
+            missing = [section for section in sections if section.error is not None]
+            if not available:
+                status = "UNKNOWN"
+            else:
+                status = _STATUS[max(section.severity for section in available)]
+            if missing and available:
+                status += f" (partial: {', '.join(section.name for section in missing)} unavailable)"
             
             result = [f"Health Analysis for {resource_type}/{resource_id}:\n"]
+            result.append(f"Status: {status}")
+            for section in sections:
+                result.append(f"\n{section.title}:")
+                if section.error is not None:
+                    result.append(f"  UNAVAILABLE ({section.error})")
+                else:
+                    result.extend(section.lines)
             
-            # Mock health data
-            result.append("Status: DEGRADED")
-            result.append("\nMetrics (last 1h):")
-            result.append("  CPU: 45% avg, 78% max")
-            result.append("  Memory: 62% avg, 85% max (WARNING: High usage)")
-            result.append("  Disk: 71% avg")
-            result.append("\nRecent Issues:")
-            result.append("  - 3 connection timeouts in last hour")
-            result.append("  - 2 failed API requests (503 errors)")
-            result.append("  - Memory usage exceeded 80% threshold")
-            result.append("\nRecommendations:")
-            result.append("  1. Investigate memory leak or increase memory allocation")
-            result.append("  2. Check database connection pool settings")
-            result.append("  3. Review API endpoint health")
+            issues = [issue for section in available for issue in section.issues]
+            if issues:
+                result.append("\nIssues:")
+                result.extend(f"  - {issue}" for issue in issues)
+            recommendations = [item for section in available for item in section.recommendations]
+            if recommendations:
+                result.append("\nRecommendations:")
+                result.extend(f"  {i}. {item}" for i, item in enumerate(recommendations, 1))
+            
+            timings = ", ".join(
+                f"{section.name} {section.elapsed * 1000:.0f}ms" + (" (unavailable)" if section.error else "")
+                for section in sections
+            )
+            result.append(f"\nSources: {timings}")
             
             return "\n".join(result)
             
@@ -309,6 +318,126 @@ class AnalyzeHealthTool(BaseTool):
             return f"Error analyzing health: {str(e)}"
 
 
+_STATUS = ["HEALTHY", "DEGRADED", "CRITICAL"]
+_HEALTH_METRICS = ["cpu", "memory", "disk"]
+_ERROR_QUERY = "error|exception|fatal|panic|timeout|fail"
+_METRIC_ADVICE = {
+    "cpu": "Check for CPU-heavy workloads or scale out the resource",
+    "memory": "Investigate a possible memory leak or raise the memory allocation",
+    "disk": "Free disk space or expand the volume",
+}
+
+
+@dataclass
+class _HealthSection:
+    """One source of a health report"""
+    name: str = ""
+    title: str = ""
+    lines: List[str] = field(default_factory=list)
+    issues: List[str] = field(default_factory=list)
+    recommendations: List[str] = field(default_factory=list)
+    # Index into _STATUS
+    severity: int = 0
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+
+async def _run_section(
+    name: str,
+    title: str,
+    timeout: float,
+    build: Callable[[], Awaitable[_HealthSection]]
+) -> _HealthSection:
+    """Build a report section within its timeout, marking it unavailable on failure"""
+    started = time.perf_counter()
+    applied = timeout
+    try:
+        applied = cap_timeout(timeout)
+        section = await asyncio.wait_for(build(), timeout=applied)
+    except DeadlineExceeded:
+        section = _HealthSection(error="request deadline reached")
+    except asyncio.TimeoutError:
+        # The request deadline may have cut the section's own timeout short
+        if applied != timeout:
+            section = _HealthSection(error=f"request deadline reached after {applied:.1f}s")
+        else:
+            section = _HealthSection(error=f"no response within {timeout:g}s")
+    except Exception as e:
+        logger.warning(f"Health source '{name}' failed: {e}")
+        section = _HealthSection(error=f"error: {e}")
+    section.name, section.title = name, title
+    section.elapsed = time.perf_counter() - started
+    return section
+
+
+async def _metrics_section(resource_type: str, resource_id: str) -> _HealthSection:
+    """Summarize CPU, memory and disk and flag high utilization"""
+    settings = get_settings()
+    section = _HealthSection()
+    summaries = await get_metrics_backend().summarize(resource_type, resource_id, _HEALTH_METRICS, "1h")
+    if not summaries:
+        section.lines.append("  No metric data")
+    for summary in summaries:
+        section.lines.append(format_summary(summary))
+        if summary.unit != "%":
+            continue
+        if summary.p95 >= settings.HEALTH_CRITICAL_PERCENT:
+            severity = 2
+        elif summary.p95 >= settings.HEALTH_WARNING_PERCENT:
+            severity = 1
+        else:
+            continue
+        section.severity = max(section.severity, severity)
+        section.issues.append(f"{summary.name} p95 at {summary.p95:.0f}% (trend {summary.trend})")
+        if summary.name in _METRIC_ADVICE:
+            section.recommendations.append(_METRIC_ADVICE[summary.name])
+    return section
+
+
+async def _logs_section(resource_type: str, resource_id: str) -> _HealthSection:
+    """Group recent error lines into templates"""
+    settings = get_settings()
+    section = _HealthSection()
+    miner = TemplateMiner(similarity_threshold=settings.LOG_TEMPLATE_SIMILARITY)
+    logs = await get_log_backend().query_logs(
+        resource_type, resource_id, _ERROR_QUERY, "1h", settings.LOG_TEMPLATE_SCAN_LINES, on_entry=miner.add_entry
+    )
+    if not logs.matched_lines:
+        section.lines.append(f"  No errors (scanned {logs.scanned_lines} lines)")
+        return section
+    
+    more = "+" if logs.next_cursor else ""
+    section.lines.append(f"  {logs.matched_lines}{more} matching lines in {len(miner.templates)} patterns:")
+    section.lines.append(format_templates(miner, limit=5))
+    errors = sum(template.count for template in miner.templates if template.level in ("ERROR", "FATAL", "CRITICAL"))
+    if errors:
+        section.severity = 1
+        top = next(template for template in miner.top() if template.level in ("ERROR", "FATAL", "CRITICAL"))
+        section.issues.append(f"{errors}{more} error lines; most frequent: {top.template} ({top.count}x)")
+    return section
+
+
+async def _incidents_section(resource_type: str, resource_id: str) -> _HealthSection:
+    """Find past incidents on the same resource"""
+    section = _HealthSection()
+    documents = await get_rag_client().search(
+        query=f"{resource_type} {resource_id} errors degraded",
+        top_k=3,
+        threshold=0.65,
+        filters={"category": "incident"}
+    )
+    if not documents:
+        section.lines.append("  None found")
+        return section
+    for i, doc in enumerate(documents, 1):
+        resolved = "resolved" if doc.metadata.get("resolved") else "unresolved"
+        severity = doc.metadata.get("severity", "unknown")
+        content = doc.content if len(doc.content) <= 200 else doc.content[:200] + "..."
+        section.lines.append(f"  {i}. {doc.source or 'Unknown incident'} ({severity}, {resolved}, score {doc.score:.2f}): {content}")
+    section.recommendations.append("Check the similar past incidents above for known causes and fixes")
+    return section
+
+
 # Export all tools
 def get_system_tools() -> List[BaseTool]:
     """